@@ -0,0 +1,192 @@
+"""
+ai_cache.py - Cache persistant des reponses de Claude.
+
+Une reponse (briefing, suggestions) ne change pas tant que la requete
+envoyee a Claude ne change pas : meme fonction, meme contact dans la meme
+version, meme modele, meme version des prompts et meme contenu. La cle est
+une empreinte de tout cela ; une note ajoutee ou un profil master modifie
+change donc la cle, sans invalidation a gerer.
+
+Les reponses sont gardees dans une base SQLite a part (AI_CACHE_PATH), que
+l'on peut supprimer sans risque, et partagees par les workers. Chaque entree
+expire apres AI_CACHE_TTL secondes ; au-dela de AI_CACHE_MAX_ENTRIES entrees
+ou AI_CACHE_MAX_BYTES octets, les moins recemment lues sont retirees.
+
+Une erreur du cache n'empeche jamais un appel : elle est traitee comme un
+defaut de cache.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reponses (
+    cle TEXT PRIMARY KEY,
+    fonction TEXT NOT NULL,
+    sujet TEXT,
+    valeur TEXT NOT NULL,
+    taille INTEGER NOT NULL,
+    date_creation REAL NOT NULL,
+    date_acces REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reponses_acces ON reponses(date_acces);
+"""
+
+# Une lecture ne remet a jour date_acces que si elle date de plus de N s :
+# l'ordre LRU reste bon sans une ecriture par lecture
+PRECISION_ACCES = 60
+
+
+def cle(*elements):
+    """Empreinte (sha256) d'elements serialisables en JSON."""
+    texte = json.dumps(elements, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+class CacheReponses:
+    """
+    Cache de textes dans une base SQLite, avec duree de vie et eviction LRU.
+
+    Une connexion par thread, recreee apres un fork (workers gunicorn).
+    """
+
+    def __init__(self, chemin, duree_vie=86400, max_entrees=1000,
+                 max_octets=10 * 1024 * 1024):
+        self.chemin = chemin
+        self.duree_vie = duree_vie
+        self.max_entrees = max_entrees
+        self.max_octets = max_octets
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.erreurs = 0
+
+    def _connexion(self):
+        """Connexion du thread courant (schema cree a l'ouverture)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        dossier = os.path.dirname(self.chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        conn = sqlite3.connect(self.chemin, isolation_level=None, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _compter(self, nom):
+        with self._lock:
+            setattr(self, nom, getattr(self, nom) + 1)
+
+    def lire(self, cle):
+        """Texte en cache pour cette cle, ou None (absent ou expire)."""
+        maintenant = time.time()
+        try:
+            conn = self._connexion()
+            row = conn.execute(
+                "SELECT valeur, date_acces FROM reponses WHERE cle = ? AND date_creation > ?",
+                (cle, maintenant - self.duree_vie)
+            ).fetchone()
+            if row is not None and row[1] < maintenant - PRECISION_ACCES:
+                conn.execute(
+                    "UPDATE reponses SET date_acces = ? WHERE cle = ?", (maintenant, cle)
+                )
+        except sqlite3.Error as e:
+            print(f"[IA] Cache illisible : {e}")
+            self._compter("erreurs")
+            row = None
+        self._compter("hits" if row is not None else "misses")
+        return row[0] if row is not None else None
+
+    def contient(self, cle):
+        """Indique si la cle a une entree valide (sans compter de hit/miss)."""
+        try:
+            row = self._connexion().execute(
+                "SELECT 1 FROM reponses WHERE cle = ? AND date_creation > ?",
+                (cle, time.time() - self.duree_vie)
+            ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None
+
+    def ecrire(self, cle, fonction, sujet, valeur):
+        """Enregistre un texte puis retire les entrees expirees ou en trop."""
+        maintenant = time.time()
+        try:
+            conn = self._connexion()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO reponses "
+                    "(cle, fonction, sujet, valeur, taille, date_creation, date_acces) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cle, fonction, None if sujet is None else str(sujet), valeur,
+                     len(valeur.encode("utf-8")), maintenant, maintenant)
+                )
+                self._evincer(conn, maintenant)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"[IA] Ecriture du cache impossible : {e}")
+            self._compter("erreurs")
+
+    def _evincer(self, conn, maintenant):
+        """Retire les entrees expirees puis les moins recemment lues en trop."""
+        conn.execute(
+            "DELETE FROM reponses WHERE date_creation <= ?", (maintenant - self.duree_vie,)
+        )
+        conn.execute(
+            """
+            DELETE FROM reponses WHERE cle IN (
+                SELECT cle FROM (
+                    SELECT cle,
+                           ROW_NUMBER() OVER (ORDER BY date_acces DESC) AS rang,
+                           SUM(taille) OVER (ORDER BY date_acces DESC
+                                             ROWS UNBOUNDED PRECEDING) AS cumul
+                    FROM reponses
+                ) WHERE rang > ? OR cumul > ?
+            )
+            """,
+            (self.max_entrees, self.max_octets)
+        )
+
+    def vider(self, fonction=None):
+        """Supprime toutes les entrees (ou celles d'une fonction)."""
+        conn = self._connexion()
+        if fonction is None:
+            conn.execute("DELETE FROM reponses")
+        else:
+            conn.execute("DELETE FROM reponses WHERE fonction = ?", (fonction,))
+
+    def stats(self):
+        """Contenu de la base et compteurs du processus."""
+        try:
+            entrees, octets = self._connexion().execute(
+                "SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM reponses"
+            ).fetchone()
+        except sqlite3.Error:
+            entrees = octets = None
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entrees": entrees,
+                "octets": octets,
+                "max_entrees": self.max_entrees,
+                "max_octets": self.max_octets,
+                "duree_vie": self.duree_vie,
+                "hits": self.hits,
+                "misses": self.misses,
+                "erreurs": self.erreurs,
+                "taux_hits": round(self.hits / total, 3) if total else None,
+            }
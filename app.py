@@ -2,66 +2,118 @@
 app.py - API REST Flask pour le CRM personnel.
 
 Ce fichier cree un serveur web (API) qui permet de gerer les contacts
-via des requetes HTTP. C'est le point d'entree principal du backend.
+via des requetes HTTP. C'est le point d'entree principal du backend :
+create_app() construit l'application, 'app' est celle servie par gunicorn.
 
 Routes disponibles :
-- GET    /api/contacts          -> Liste tous les contacts
+- GET    /api/contacts          -> Liste les contacts (?limit=&cursor=&fields=)
 - POST   /api/contacts          -> Cree un nouveau contact
+- POST   /api/contacts/bulk     -> Cree plusieurs contacts (import)
 - GET    /api/contacts/<id>     -> Recupere un contact par ID
 - PUT    /api/contacts/<id>     -> Met a jour un contact
 - DELETE /api/contacts/<id>     -> Supprime un contact
 - POST   /api/contacts/<id>/notes -> Ajoute une note a un contact
-- GET    /api/search?q=...&categorie=... -> Recherche des contacts
+- GET    /api/search?q=...&categorie=...&ville=... -> Recherche des contacts (memes options)
+- GET    /api/export?format=ndjson|csv&since=... -> Export en streaming
+- GET    /api/changes?since=<token>&limit=... -> Contacts modifies/supprimes depuis un jeton
+- GET    /api/metrics           -> Metriques de performance (format Prometheus)
+- GET    /api/claude/briefing/<id>/stream, POST /api/claude/assistant/stream
+                                -> Reponses IA en server-sent events
+- POST   /admin/briefings/prefetch -> Pre-genere des briefings en arriere-plan
 """
 
 import os
-from datetime import datetime
+import io
+import re
+import csv
+import json
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 
-from flask import Flask, request, jsonify, send_from_directory, render_template, redirect, flash
+from flask import (
+    Blueprint, Flask, Response, current_app, request, jsonify,
+    send_from_directory, render_template, redirect, flash, stream_with_context
+)
 from flask_cors import CORS
 from config import config as app_config
 from database import (
     init_db,
+    release_connection,
     create_contact,
+    create_contacts_bulk,
     get_contact,
+    get_contact_validateurs,
+    compteur_modifications,
     update_contact,
     delete_contact,
-    search_contacts,
-    get_all_contacts,
+    list_contacts,
+    contacts_pertinents,
+    iter_contacts_export,
+    get_changes,
+    get_notes_promesses,
     add_note,
+    stats_cache,
+    CHAMPS_CONTACT,
+    ConflitVersion,
+)
+from models import valider_contact, valider_modification, valider_note, ValidationError
+from crm_briefing import (
+    get_contact_briefing, format_briefing_text, NOTES_BRIEFING_MAX, MOTS_PROMESSES,
+    PROMESSES_MAX
 )
-from models import valider_contact, valider_note, ValidationError
-from crm_briefing import get_contact_briefing, format_briefing_text
 from onboarding import onboarding_bp, is_first_time_user, get_master_profile
 from update import UpdateManager
-from claude_integration import ClaudeIntegration
+from claude_integration import ClaudeIntegration, NOTES_BRIEFING_IA
+from briefings_batch import PregenerationBriefings, selectionner
+from json_provider import choisir_provider
+from compression import init_compression
+import metrics
+import slow_queries
+
+# Routes du CRM, enregistrees sur l'application par create_app()
+bp = Blueprint('crm', __name__)
+
+_lock_sous_systemes = threading.Lock()
+
+
+def _sous_systeme(nom, fabrique):
+    """
+    Objet partage de l'application courante, cree au premier usage.
+
+    L'integration Claude et le gestionnaire de mises a jour ne servent qu'a
+    quelques routes : les construire a la demande evite d'importer anthropic
+    et requests (et de creer data/backups) au demarrage de chaque worker.
+    """
+    extensions = current_app.extensions
+    if nom not in extensions:
+        with _lock_sous_systemes:
+            if nom not in extensions:
+                extensions[nom] = fabrique()
+    return extensions[nom]
 
-# Creation de l'application Flask
-app = Flask(__name__, static_folder='static', static_url_path='/static')
 
-# Charger la config
-env = os.environ.get('FLASK_ENV', 'development')
-app.config.from_object(app_config.get(env, app_config['default']))
-app_config.get(env, app_config['default']).init_app(app)
+def get_claude():
+    """Integration Claude API de l'application."""
+    return _sous_systeme('crm_claude', ClaudeIntegration)
 
-# Cle secrete pour les sessions
-app.secret_key = app.config['SECRET_KEY']
 
-# CORS : permet a l'interface web d'appeler l'API depuis un navigateur
-CORS(app)
+def get_pregeneration():
+    """Pre-generation des briefings de l'application."""
+    claude = get_claude()
+    return _sous_systeme('crm_pregeneration', lambda: PregenerationBriefings(claude))
 
-# Enregistrement du blueprint onboarding
-app.register_blueprint(onboarding_bp)
 
-# Gestionnaire de mises a jour
-update_manager = UpdateManager()
+def get_update_manager():
+    """Gestionnaire de mises a jour de l'application."""
+    return _sous_systeme('crm_updates', UpdateManager)
 
-# Integration Claude API
-claude = ClaudeIntegration()
+
+def liberer_connexion(exc):
+    """Remet la connexion SQLite du thread dans un etat propre apres la requete."""
+    release_connection()
 
 
-@app.before_request
 def check_onboarding():
     """
     Redirige vers l'onboarding si aucun profil master n'existe.
@@ -86,14 +138,139 @@ def check_onboarding():
 # --- Routes de l'API ---
 
 
-@app.route("/api/contacts", methods=["GET"])
+def _etag_contact(contact):
+    """ETag d'un contact : change a chaque modification (colonne version)."""
+    return f"{contact['id']}-{contact['version']}"
+
+
+def _date_http(date_iso):
+    """date_modification (ISO, heure locale du serveur) -> datetime UTC."""
+    try:
+        date = datetime.fromisoformat(date_iso)
+    except (TypeError, ValueError):
+        return None
+    return date.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _non_modifie(etag, derniere_modification=None):
+    """
+    Indique si la copie du client est a jour.
+
+    If-None-Match est prioritaire (comparaison faible, RFC 9110) ;
+    If-Modified-Since n'est consulte qu'en son absence.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if derniere_modification is not None and request.if_modified_since:
+        return derniere_modification <= request.if_modified_since
+    return False
+
+
+def _avec_validateurs(response, etag, derniere_modification=None):
+    """
+    Ajoute ETag, Last-Modified et Cache-Control a une reponse.
+
+    no-cache : le navigateur garde la reponse mais la revalide a chaque
+    appel, ce qui coute un 304 sans corps tant que rien n'a change.
+    """
+    response.set_etag(etag)
+    if derniere_modification is not None:
+        response.last_modified = derniere_modification
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _reponse_conditionnelle(etag, derniere_modification, construire):
+    """
+    Repond 304 si le client a deja cette version, sinon appelle construire()
+    et ajoute les validateurs a la reponse obtenue.
+    """
+    if _non_modifie(etag, derniere_modification):
+        return _avec_validateurs(Response(status=304), etag, derniere_modification)
+    response = current_app.make_response(construire())
+    if response.status_code == 200:
+        _avec_validateurs(response, etag, derniere_modification)
+    return response
+
+
+def _version_if_match(contact_id):
+    """
+    Version attendue d'apres l'en-tete If-Match.
+
+    Retourne None si l'en-tete est absent ou vaut '*'. Leve ValueError si
+    l'ETag ne designe pas ce contact (la precondition echoue alors).
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    for etag in if_match.as_set(include_weak=True):
+        # Une reponse compressee porte l'ETag faible W/"12-3" : il est accepte
+        m = re.fullmatch(r"(\d+)-(\d+)", etag)
+        if m and int(m.group(1)) == contact_id:
+            return int(m.group(2))
+    raise ValueError("ETag ne correspondant pas a ce contact")
+
+# Taille de page quand un curseur est fourni sans limite
+TAILLE_PAGE_DEFAUT = 50
+
+
+def _lister_contacts(query=None, categorie=None):
+    """
+    Reponse commune a /api/contacts et /api/search.
+
+    Parametres optionnels : limit et cursor (pagination), fields (liste de
+    champs separes par des virgules), et un filtre par cle d'informations
+    indexee (?ville=Lyon&societe=...). Sans limit ni cursor, tous les
+    contacts sont retournes avec leur total.
+
+    La reponse porte un ETag tire du compteur global de modifications :
+    tant qu'aucune ecriture n'a eu lieu, un client qui le renvoie recoit 304.
+    """
+    etag = f"contacts-{compteur_modifications()}-{current_app.config['APP_VERSION']}"
+    if _non_modifie(etag):
+        return _avec_validateurs(Response(status=304), etag)
+
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    fields = request.args.get("fields")
+    filtres = {
+        cle: request.args[cle]
+        for cle in current_app.config['CHAMPS_INFORMATIONS_INDEXES']
+        if request.args.get(cle)
+    }
+
+    try:
+        if limit is not None:
+            if not limit.isdigit():
+                raise ValueError("La limite doit etre un nombre entier.")
+            limit = int(limit)
+        elif cursor:
+            limit = TAILLE_PAGE_DEFAUT
+        if fields is not None:
+            fields = [f.strip() for f in fields.split(",") if f.strip()]
+
+        contacts, next_cursor = list_contacts(
+            query=query, categorie=categorie,
+            limit=limit, cursor=cursor, fields=fields, filtres=filtres
+        )
+    except ValueError as e:
+        return jsonify({"erreur": str(e)}), 400
+
+    if limit is None:
+        response = jsonify({"contacts": contacts, "total": len(contacts)})
+    else:
+        response = jsonify({"contacts": contacts, "next_cursor": next_cursor})
+    return _avec_validateurs(response, etag)
+
+
+@bp.route("/api/contacts", methods=["GET"])
 def route_get_all_contacts():
-    """Liste tous les contacts."""
-    contacts = get_all_contacts()
-    return jsonify({"contacts": contacts, "total": len(contacts)})
+    """Liste les contacts (tous, ou par page avec ?limit=&cursor=)."""
+    return _lister_contacts()
 
 
-@app.route("/api/contacts", methods=["POST"])
+@bp.route("/api/contacts", methods=["POST"])
 def route_create_contact():
     """Cree un nouveau contact."""
     data = request.get_json()
@@ -122,13 +299,37 @@ def route_create_contact():
         return jsonify({"erreur": str(e)}), 400
 
 
-@app.route('/')
+@bp.route("/api/contacts/bulk", methods=["POST"])
+def route_create_contacts_bulk():
+    """
+    Cree plusieurs contacts en une requete.
+
+    Corps : {"contacts": [{nom, prenom, categorie, informations}, ...]}.
+    Les contacts invalides sont ignores et listes dans 'erreurs' avec leur
+    position dans la liste envoyee.
+    """
+    data = request.get_json()
+
+    if not data or not isinstance(data.get("contacts"), list):
+        return jsonify({"erreur": "Liste 'contacts' requise"}), 400
+
+    resultat = create_contacts_bulk(data["contacts"])
+    code = 201 if resultat["ids"] else 400
+    return jsonify({
+        "ids": resultat["ids"],
+        "crees": len(resultat["ids"]),
+        "erreurs": resultat["erreurs"],
+        "message": f"{len(resultat['ids'])} contact(s) cree(s)"
+    }), code
+
+
+@bp.route('/')
 def index():
     """Sert la page principale du frontend."""
     return send_from_directory('static', 'index.html')
 
 
-@app.route('/api/master-profile')
+@bp.route('/api/master-profile')
 def api_master_profile():
     """Retourne le profil master de l'utilisateur."""
     profile = get_master_profile()
@@ -140,84 +341,140 @@ def api_master_profile():
 # --- Routes Briefing ---
 
 
-@app.route('/briefing/<int:contact_id>')
+def _etag_briefing(contact, format_briefing):
+    """ETag d'un briefing : version du contact, format et version de l'application."""
+    return f"briefing-{format_briefing}-{_etag_contact(contact)}-{current_app.config['APP_VERSION']}"
+
+
+def _repondre_briefing(contact_id, format_briefing, rendre, non_trouve):
+    """
+    Reponse commune aux routes de briefing.
+
+    Le briefing n'est construit que si le client n'a pas deja la version
+    courante (sinon 304). rendre(briefing) produit la reponse,
+    non_trouve() la reponse 404.
+    """
+    validateurs = get_contact_validateurs(contact_id)
+    if validateurs is None:
+        return non_trouve()
+
+    def construire():
+        contact = get_contact(contact_id, notes_limit=NOTES_BRIEFING_MAX)
+        if contact is None:
+            return non_trouve()
+        # Promesses cherchees dans tout l'historique, pas seulement les notes recentes
+        promesses = get_notes_promesses(contact_id, MOTS_PROMESSES, limit=PROMESSES_MAX)
+        return rendre(get_contact_briefing(contact, promesses=promesses))
+
+    return _reponse_conditionnelle(
+        _etag_briefing(validateurs, format_briefing),
+        _date_http(validateurs["date_modification"]),
+        construire
+    )
+
+
+@bp.route('/briefing/<int:contact_id>')
 def route_briefing(contact_id):
     """Affiche le briefing HTML pour un contact."""
-    contact = get_contact(contact_id)
-    if contact is None:
-        return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
-    briefing = get_contact_briefing(contact)
-    return render_template('briefing.html', briefing=briefing)
+    return _repondre_briefing(
+        contact_id, "html",
+        lambda briefing: render_template('briefing.html', briefing=briefing),
+        lambda: (jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404)
+    )
 
 
-@app.route('/api/briefing/<int:contact_id>')
+@bp.route('/api/briefing/<int:contact_id>')
 def route_api_briefing(contact_id):
     """API JSON pour le briefing d'un contact."""
-    contact = get_contact(contact_id)
-    if contact is None:
-        return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
-    briefing = get_contact_briefing(contact)
-    return jsonify(briefing)
+    return _repondre_briefing(
+        contact_id, "json",
+        jsonify,
+        lambda: (jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404)
+    )
 
 
-@app.route('/briefing-text/<int:contact_id>')
+@bp.route('/briefing-text/<int:contact_id>')
 def route_briefing_text(contact_id):
     """Version texte brut du briefing."""
-    contact = get_contact(contact_id)
-    if contact is None:
-        return f"Contact {contact_id} non trouve", 404
-    briefing = get_contact_briefing(contact)
-    return format_briefing_text(briefing), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return _repondre_briefing(
+        contact_id, "texte",
+        lambda briefing: (
+            format_briefing_text(briefing), 200,
+            {'Content-Type': 'text/plain; charset=utf-8'}
+        ),
+        lambda: (f"Contact {contact_id} non trouve", 404)
+    )
 
 
-@app.route('/<path:path>')
+@bp.route('/<path:path>')
 def serve_static(path):
     """Sert les fichiers statiques du frontend."""
     if path.startswith(('onboarding', 'api/', 'briefing', 'static/', 'admin', 'settings', 'assistant')):
         return jsonify({"erreur": "Non trouve"}), 404
-    file_path = os.path.join(app.static_folder, path)
+    file_path = os.path.join(current_app.static_folder, path)
     if os.path.isfile(file_path):
         return send_from_directory('static', path)
     return send_from_directory('static', 'index.html')
 
 
-@app.route("/api/contacts/<int:contact_id>", methods=["GET"])
+@bp.route("/api/contacts/<int:contact_id>", methods=["GET"])
 def route_get_contact(contact_id):
-    """Recupere un contact par son ID."""
+    """
+    Recupere un contact par son ID.
+
+    Repond 304 sans lire le contact si If-None-Match / If-Modified-Since
+    correspond a sa version actuelle.
+    """
+    validateurs = get_contact_validateurs(contact_id)
+    if validateurs is None:
+        return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
+    etag = _etag_contact(validateurs)
+    derniere_modification = _date_http(validateurs["date_modification"])
+    if _non_modifie(etag, derniere_modification):
+        return _avec_validateurs(Response(status=304), etag, derniere_modification)
+
     contact = get_contact(contact_id)
     if contact is None:
         return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
-    return jsonify({"contact": contact})
+    # Le contact peut etre plus recent que les validateurs lus juste avant
+    return _avec_validateurs(
+        jsonify({"contact": contact}),
+        _etag_contact(contact),
+        _date_http(contact["date_modification"])
+    )
 
 
-@app.route("/api/contacts/<int:contact_id>", methods=["PUT"])
+@bp.route("/api/contacts/<int:contact_id>", methods=["PUT"])
 def route_update_contact(contact_id):
-    """Met a jour un contact existant."""
+    """
+    Met a jour un contact existant (seuls les champs envoyes changent).
+
+    Avec l'en-tete If-Match (ETag recu sur GET), la mise a jour est refusee
+    en 412 si le contact a ete modifie entre-temps.
+    """
     data = request.get_json()
 
     if not data:
         return jsonify({"erreur": "Donnees JSON requises"}), 400
 
-    existing = get_contact(contact_id)
-    if existing is None:
-        return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
-
     try:
-        valide = valider_contact(
-            nom=data.get("nom", existing["nom"]),
-            prenom=data.get("prenom", existing["prenom"]),
-            categorie=data.get("categorie", existing["categorie"]),
-            informations=data.get("informations", existing["informations"])
-        )
-
-        contact = update_contact(contact_id, **valide)
-        return jsonify({"contact": contact, "message": "Contact mis a jour"})
-
+        version = _version_if_match(contact_id)
+        valide = valider_modification(data)
+        contact = update_contact(contact_id, version_attendue=version, **valide)
     except ValidationError as e:
         return jsonify({"erreur": str(e)}), 400
+    except (ValueError, ConflitVersion) as e:
+        return jsonify({"erreur": str(e)}), 412
+
+    if contact is None:
+        return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
+
+    response = jsonify({"contact": contact, "message": "Contact mis a jour"})
+    response.set_etag(_etag_contact(contact))
+    return response
 
 
-@app.route("/api/contacts/<int:contact_id>", methods=["DELETE"])
+@bp.route("/api/contacts/<int:contact_id>", methods=["DELETE"])
 def route_delete_contact(contact_id):
     """Supprime un contact."""
     if delete_contact(contact_id):
@@ -226,7 +483,7 @@ def route_delete_contact(contact_id):
         return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
 
 
-@app.route("/api/contacts/<int:contact_id>/notes", methods=["POST"])
+@bp.route("/api/contacts/<int:contact_id>/notes", methods=["POST"])
 def route_add_note(contact_id):
     """Ajoute une note a un contact."""
     data = request.get_json()
@@ -249,16 +506,126 @@ def route_add_note(contact_id):
         return jsonify({"erreur": str(e)}), 400
 
 
-@app.route("/api/search", methods=["GET"])
+@bp.route("/api/search", methods=["GET"])
 def route_search_contacts():
     """Recherche des contacts."""
     query = request.args.get("q")
     categorie = request.args.get("categorie")
-    contacts = search_contacts(query=query, categorie=categorie)
-    return jsonify({"contacts": contacts, "total": len(contacts)})
+    return _lister_contacts(query=query, categorie=categorie)
 
 
-@app.route("/api/health", methods=["GET"])
+# Nombre de contacts regroupes par morceau envoye lors d'un export
+CONTACTS_PAR_MORCEAU_EXPORT = 200
+
+
+def _export_ndjson(contacts):
+    """Une ligne JSON par contact."""
+    for contact in contacts:
+        yield json.dumps(contact, ensure_ascii=False) + "\n"
+
+
+def _valeur_csv(contact, champ):
+    """Valeur d'une cellule CSV ; informations et notes en texte JSON."""
+    if champ == "informations":
+        # Texte brut de la base s'il n'a pas ete decode
+        return contact.json_brut(champ) or json.dumps(contact[champ], ensure_ascii=False)
+    if champ == "notes":
+        return json.dumps(contact[champ], ensure_ascii=False)
+    return contact[champ]
+
+
+def _export_csv(contacts):
+    """Une ligne CSV par contact."""
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+    writer.writerow(CHAMPS_CONTACT)
+    for contact in contacts:
+        writer.writerow([_valeur_csv(contact, champ) for champ in CHAMPS_CONTACT])
+        yield tampon.getvalue()
+        tampon.seek(0)
+        tampon.truncate()
+
+
+def _par_morceaux(lignes, taille=CONTACTS_PAR_MORCEAU_EXPORT):
+    """Regroupe les lignes pour limiter le nombre d'ecritures reseau."""
+    morceau = []
+    for ligne in lignes:
+        morceau.append(ligne)
+        if len(morceau) >= taille:
+            yield "".join(morceau)
+            morceau = []
+    if morceau:
+        yield "".join(morceau)
+
+
+@bp.route("/api/export", methods=["GET"])
+def route_export():
+    """
+    Exporte tous les contacts (avec leurs notes) en streaming.
+
+    format=ndjson (defaut) ou csv ; since=<date ISO> pour n'exporter que les
+    contacts modifies depuis (export incremental).
+    """
+    format_export = request.args.get("format", "ndjson")
+    since = request.args.get("since")
+
+    if format_export not in ("ndjson", "csv"):
+        return jsonify({"erreur": "Format invalide (ndjson ou csv)"}), 400
+
+    if since:
+        try:
+            since = datetime.fromisoformat(since).isoformat()
+        except ValueError:
+            return jsonify({"erreur": "Parametre 'since' invalide (date ISO attendue)"}), 400
+
+    contacts = iter_contacts_export(since=since)
+    if format_export == "csv":
+        lignes, mimetype = _export_csv(contacts), "text/csv"
+    else:
+        lignes, mimetype = _export_ndjson(contacts), "application/x-ndjson"
+
+    return Response(
+        stream_with_context(_par_morceaux(lignes)),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=contacts.{format_export}"
+        }
+    )
+
+
+@bp.route("/api/changes", methods=["GET"])
+def route_changes():
+    """
+    Synchronisation incrementale : contacts modifies et ids supprimes depuis
+    le jeton 'since' (absent : tout). Le 'token' de la reponse sert de
+    'since' au prochain appel ; 'complet' vaut false s'il reste des
+    changements (avec ?limit=), 'reinitialise' true si le jeton est inconnu.
+    """
+    since = request.args.get("since") or "0"
+    limit = request.args.get("limit")
+    try:
+        if limit is not None:
+            if not limit.isdigit():
+                raise ValueError("La limite doit etre un nombre entier.")
+            limit = int(limit)
+        changements = get_changes(since=since, limit=limit)
+    except ValueError as e:
+        return jsonify({"erreur": str(e)}), 400
+    return jsonify(changements)
+
+
+@bp.route("/api/metrics", methods=["GET"])
+def route_metrics():
+    """Metriques du worker qui repond, au format texte Prometheus."""
+    if not metrics.ACTIVE:
+        return jsonify({"erreur": "Metriques desactivees (ENABLE_METRICS)"}), 404
+    return Response(
+        metrics.exposition(),
+        mimetype="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@bp.route("/api/health", methods=["GET"])
 def health_check():
     """Verifie que le serveur fonctionne."""
     return jsonify({"status": "ok", "message": "CRM Personnel operationnel"})
@@ -267,80 +634,181 @@ def health_check():
 # --- Routes Admin / Mises a jour ---
 
 
-@app.route('/admin/updates')
+@bp.route('/admin/updates')
 def updates_page():
     """Page de gestion des mises a jour."""
-    return render_template('admin/updates.html', config=app.config)
+    return render_template('admin/updates.html', config=current_app.config)
 
 
-@app.route('/admin/updates/check')
+@bp.route('/admin/updates/check')
 def check_updates():
     """Verifie si une mise a jour est disponible."""
-    result = update_manager.check_for_updates()
+    result = get_update_manager().check_for_updates()
     return jsonify(result)
 
 
-@app.route('/admin/updates/apply', methods=['POST'])
+@bp.route('/admin/updates/apply', methods=['POST'])
 def apply_update():
     """Applique la mise a jour depuis GitHub."""
-    result = update_manager.update_from_github()
+    result = get_update_manager().update_from_github()
     return jsonify(result)
 
 
-@app.route('/admin/updates/changelog')
+@bp.route('/admin/updates/changelog')
 def get_changelog():
     """Recupere le changelog."""
-    changelog = update_manager.get_changelog()
+    changelog = get_update_manager().get_changelog()
     return jsonify({'changelog': changelog})
 
 
-@app.route('/admin/backups')
+@bp.route('/admin/backups')
 def list_backups():
     """Liste les backups disponibles."""
-    backups = update_manager.list_backups()
+    backups = get_update_manager().list_backups()
     return jsonify({'backups': backups})
 
 
-@app.route('/admin/backups/create', methods=['POST'])
+@bp.route('/admin/backups/create', methods=['POST'])
 def create_backup():
     """Cree un backup manuel de la base de donnees."""
-    result = update_manager.backup_database()
+    result = get_update_manager().backup_database()
     return jsonify(result)
 
 
+@bp.route('/admin/cache')
+def cache_stats():
+    """Compteurs des caches (contacts, reponses IA) du worker qui repond."""
+    stats = stats_cache()
+    cache_ia = get_claude().cache
+    stats['ia'] = cache_ia.stats() if cache_ia is not None else None
+    return jsonify(stats)
+
+
+@bp.route('/admin/cache/ai/clear', methods=['POST'])
+def clear_ai_cache():
+    """Vide le cache des reponses IA (partage par tous les workers)."""
+    cache_ia = get_claude().cache
+    if cache_ia is not None:
+        cache_ia.vider()
+    return jsonify({'success': True})
+
+
+@bp.route('/admin/slow-queries')
+def slow_queries_list():
+    """Requetes SQL lentes du worker qui repond (?limit=&tri=total_ms|max_ms|nombre)."""
+    if not slow_queries.ACTIF:
+        return jsonify({'erreur': 'Journal desactive (SLOW_QUERY_LOG_ENABLED)'}), 404
+    limit = request.args.get('limit', '20')
+    if not limit.isdigit():
+        return jsonify({'erreur': 'La limite doit etre un nombre entier.'}), 400
+    try:
+        requetes = slow_queries.top(int(limit), request.args.get('tri', 'total_ms'))
+    except ValueError as e:
+        return jsonify({'erreur': str(e)}), 400
+    return jsonify({
+        'seuil_ms': slow_queries.SEUIL * 1000,
+        'requetes': requetes,
+    })
+
+
+@bp.route('/admin/slow-queries/reset', methods=['POST'])
+def slow_queries_reset():
+    """Remet a zero le journal des requetes lentes du worker."""
+    slow_queries.reinitialiser()
+    return jsonify({'success': True})
+
+
+@bp.route('/admin/briefings/prefetch')
+def pregeneration_etat():
+    """Avancement de la pre-generation des briefings (worker qui repond)."""
+    return jsonify(get_pregeneration().etat())
+
+
+@bp.route('/admin/briefings/prefetch', methods=['POST'])
+def pregeneration_lancer():
+    """
+    Lance la pre-generation des briefings en arriere-plan.
+
+    Corps : {"contact_ids": [...]} ou {"selection": "recents"|"suivis" (ou
+    une liste), "limit": N}, et "mode": "pool"|"batch" en option.
+    """
+    data = request.get_json(silent=True) or {}
+    contact_ids = data.get('contact_ids')
+    limite = data.get('limit')
+    if contact_ids is not None and (
+            not isinstance(contact_ids, list)
+            or not all(isinstance(i, int) and not isinstance(i, bool)
+                       for i in contact_ids)):
+        return jsonify({'success': False,
+                        'message': "'contact_ids' doit etre une liste d'entiers."}), 400
+    if limite is not None and (not isinstance(limite, int) or isinstance(limite, bool)
+                               or limite < 1):
+        return jsonify({'success': False,
+                        'message': "'limit' doit etre un entier positif."}), 400
+
+    pregeneration = get_pregeneration()
+    try:
+        if contact_ids is None:
+            contact_ids = selectionner(data.get('selection', 'recents'), limite)
+        lance = pregeneration.lancer(contact_ids, mode=data.get('mode'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not lance:
+        return jsonify({'success': False, 'message': 'Pre-generation deja en cours',
+                        'etat': pregeneration.etat()}), 409
+    return jsonify({'success': True, 'contact_ids': contact_ids}), 202
+
+
 # --- Routes Claude API ---
 
 
-@app.route('/settings')
+def _reponse_ia(result):
+    """
+    Reponse JSON d'un appel Claude : 503 avec Retry-After si le worker a
+    deja trop d'appels IA en cours (le client peut reessayer).
+    """
+    if result.get("occupe"):
+        return jsonify(result), 503, {"Retry-After": "5"}
+    return jsonify(result)
+
+
+def _rafraichir():
+    """?refresh=1 : regenerer la reponse IA au lieu de la lire dans le cache."""
+    return request.args.get('refresh', '').lower() in ('1', 'true', 'oui')
+
+
+@bp.route('/settings')
 def settings_page():
     """Page de parametres."""
+    claude = get_claude()
     return render_template('settings.html',
                            claude_configured=claude.is_configured(),
                            model=claude.model,
                            max_tokens=claude.max_tokens)
 
 
-@app.route('/assistant')
+@bp.route('/assistant')
 def assistant_page():
     """Page de l'assistant IA."""
     return render_template('assistant.html',
-                           claude_configured=claude.is_configured())
+                           claude_configured=get_claude().is_configured())
 
 
-@app.route('/api/claude/test')
+@bp.route('/api/claude/test')
 def claude_test():
     """Teste la connexion a l'API Claude."""
-    result = claude.test_connection()
-    return jsonify(result)
+    result = get_claude().test_connection()
+    return _reponse_ia(result)
 
 
-@app.route('/api/claude/settings', methods=['POST'])
+@bp.route('/api/claude/settings', methods=['POST'])
 def claude_settings():
     """Met a jour les parametres Claude."""
     data = request.get_json()
     if not data:
         return jsonify({"success": False, "message": "Donnees requises"}), 400
 
+    claude = get_claude()
     if 'api_key' in data:
         claude.update_api_key(data['api_key'])
 
@@ -357,62 +825,199 @@ def claude_settings():
     })
 
 
-@app.route('/api/claude/briefing/<int:contact_id>')
+def _evenement_sse(evenement):
+    """Evenement SSE : 'event: <type>' et les donnees en JSON sur une ligne."""
+    donnees = json.dumps(evenement, ensure_ascii=False)
+    return f"event: {evenement['type']}\ndata: {donnees}\n\n"
+
+
+def _reponse_sse(evenements):
+    """
+    Relaie des evenements Claude (texte, fin, erreur) en server-sent events.
+
+    Le premier evenement est attendu avant de repondre : si l'appel est
+    refuse (limiteur plein), la reponse est un 503 JSON. Quand le client se
+    deconnecte, le generateur est ferme, ce qui interrompt l'appel a l'API.
+    """
+    premier = next(evenements, None)
+    if premier is not None and premier.get("occupe"):
+        evenements.close()
+        return _reponse_ia(dict(premier, success=False))
+
+    def generer():
+        try:
+            if premier is not None:
+                yield _evenement_sse(premier)
+            for evenement in evenements:
+                yield _evenement_sse(evenement)
+        finally:
+            evenements.close()
+
+    return Response(
+        stream_with_context(generer()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@bp.route('/api/claude/briefing/<int:contact_id>')
 def claude_briefing(contact_id):
-    """Genere un briefing IA pour un contact."""
-    contact = get_contact(contact_id)
+    """Genere un briefing IA pour un contact (?refresh=1 : ignorer le cache)."""
+    contact = get_contact(contact_id, notes_limit=NOTES_BRIEFING_IA)
     if contact is None:
         return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
 
     master = get_master_profile()
-    result = claude.generate_briefing(contact, master_profile=master)
-    return jsonify(result)
+    result = get_claude().generate_briefing(contact, master_profile=master,
+                                            rafraichir=_rafraichir())
+    return _reponse_ia(result)
+
+
+@bp.route('/api/claude/briefing/<int:contact_id>/stream')
+def claude_briefing_stream(contact_id):
+    """Briefing IA en server-sent events, au fil de la generation."""
+    contact = get_contact(contact_id, notes_limit=NOTES_BRIEFING_IA)
+    if contact is None:
+        return jsonify({"erreur": f"Contact {contact_id} non trouve"}), 404
+
+    master = get_master_profile()
+    return _reponse_sse(get_claude().stream_briefing(
+        contact, master_profile=master, rafraichir=_rafraichir()
+    ))
+
+
+# Estimation du budget de contexte de l'assistant
+CARACTERES_PAR_TOKEN = 4
+# Notes recentes par contact dans le contexte, et longueur gardee de chacune
+NOTES_CONTEXTE_ASSISTANT = 3
+LONGUEUR_NOTE_CONTEXTE = 150
+
+
+def _resume_contact_assistant(contact):
+    """Une ligne par contact : identite, informations, notes recentes."""
+    infos = contact.get("informations", {}) or {}
+    ligne = f"- {contact.get('prenom', '')} {contact.get('nom', '')} ({contact.get('categorie', '')})"
+    if infos:
+        ligne += " - " + ", ".join(f"{cle}: {str(valeur)[:60]}" for cle, valeur in infos.items())
+    notes = contact.get("notes", []) or []
+    if notes:
+        ligne += " - Notes: " + " | ".join(
+            f"[{n.get('date', '')[:10]}] {n.get('contenu', '')[:LONGUEUR_NOTE_CONTEXTE]}"
+            for n in reversed(notes)
+        )
+    return ligne
 
 
-@app.route('/api/claude/assistant', methods=['POST'])
+def _contexte_assistant(question):
+    """
+    Resume des contacts les plus pertinents pour la question (bm25 sur noms,
+    informations et notes), du plus au moins pertinent, dans la limite de
+    ASSISTANT_CONTEXT_TOKENS tokens.
+    """
+    budget = current_app.config['ASSISTANT_CONTEXT_TOKENS'] * CARACTERES_PAR_TOKEN
+    contacts = contacts_pertinents(question, current_app.config['ASSISTANT_CONTEXT_MAX_CONTACTS'],
+                                   notes_limit=NOTES_CONTEXTE_ASSISTANT)
+    lignes = []
+    for contact in contacts:
+        ligne = _resume_contact_assistant(contact)
+        # Un contact trop long est saute : un suivant plus court peut tenir
+        if len(ligne) + 1 > budget:
+            continue
+        lignes.append(ligne)
+        budget -= len(ligne) + 1
+    return "\n".join(lignes)
+
+
+@bp.route('/api/claude/assistant', methods=['POST'])
 def claude_assistant():
     """Assistant conversationnel."""
     data = request.get_json()
     if not data or not data.get('question'):
         return jsonify({"success": False, "message": "Question requise"}), 400
 
-    # Construire le contexte des contacts
-    contacts = get_all_contacts()
-    contacts_context = ""
-    if contacts:
-        summaries = []
-        for c in contacts[:20]:
-            infos = c.get("informations", {}) or {}
-            notes = c.get("notes", []) or []
-            last_note = notes[-1].get("contenu", "") if notes else ""
-            summaries.append(
-                f"- {c.get('prenom', '')} {c.get('nom', '')} ({c.get('categorie', '')}) "
-                f"- {infos.get('societe', '')} {infos.get('ville', '')} - "
-                f"Derniere note: {last_note[:80]}"
-            )
-        contacts_context = "\n".join(summaries)
+    question = data['question']
+    master = get_master_profile()
+    result = get_claude().ask_assistant(question,
+                                        contacts_context=_contexte_assistant(question),
+                                        master_profile=master)
+    return _reponse_ia(result)
+
 
+@bp.route('/api/claude/assistant/stream', methods=['POST'])
+def claude_assistant_stream():
+    """Assistant conversationnel en server-sent events."""
+    data = request.get_json(silent=True)
+    if not data or not data.get('question'):
+        return jsonify({"success": False, "message": "Question requise"}), 400
+
+    question = data['question']
     master = get_master_profile()
-    result = claude.ask_assistant(data['question'],
-                                  contacts_context=contacts_context,
-                                  master_profile=master)
-    return jsonify(result)
+    return _reponse_sse(get_claude().stream_assistant(
+        question, contacts_context=_contexte_assistant(question), master_profile=master
+    ))
 
 
-@app.route('/api/claude/suggestions')
+@bp.route('/api/claude/suggestions')
 def claude_suggestions():
-    """Genere des suggestions pour le dashboard."""
-    contacts = get_all_contacts()
+    """Genere des suggestions pour le dashboard (?refresh=1 : ignorer le cache)."""
+    # Seuls les 20 premiers contacts sont resumes pour Claude
+    contacts, _ = list_contacts(limit=20)
     master = get_master_profile()
-    result = claude.generate_dashboard_suggestions(contacts, master_profile=master)
-    return jsonify(result)
+    result = get_claude().generate_dashboard_suggestions(contacts, master_profile=master,
+                                                         rafraichir=_rafraichir())
+    return _reponse_ia(result)
 
 
-# --- Demarrage du serveur ---
+# --- Application ---
 
-if __name__ == "__main__":
+
+def create_app(nom_config=None):
+    """
+    Cree et configure l'application Flask.
+
+    nom_config : cle de config.config (defaut : FLASK_ENV, sinon development).
+    Claude et les mises a jour ne sont construits qu'a leur premier usage.
+    """
+    app = Flask(__name__, static_folder='static', static_url_path='/static')
+
+    # Charger la config
+    classe_config = app_config.get(
+        nom_config or os.environ.get('FLASK_ENV', 'development'), app_config['default']
+    )
+    app.config.from_object(classe_config)
+    classe_config.init_app(app)
+
+    # Metriques par route (avant les autres hooks, pour mesurer toute la requete)
+    metrics.init_metrics(app)
+
+    # Serialisation JSON (orjson si disponible) et compression des reponses
+    app.json = choisir_provider(app.config['JSON_PROVIDER'])(app)
+    init_compression(app)
+
+    # Schema et migrations (idempotent, necessaire aussi sous gunicorn)
     init_db()
 
+    # Cle secrete pour les sessions
+    app.secret_key = app.config['SECRET_KEY']
+
+    # CORS : permet a l'interface web d'appeler l'API depuis un navigateur
+    CORS(app)
+
+    app.teardown_appcontext(liberer_connexion)
+    app.before_request(check_onboarding)
+
+    app.register_blueprint(onboarding_bp)
+    app.register_blueprint(bp)
+    return app
+
+
+# Application utilisee par gunicorn (app:app) et par python app.py
+app = create_app()
+
+
+# --- Demarrage du serveur ---
+
+if __name__ == "__main__":
     host = app.config.get('HOST', '0.0.0.0')
     port = app.config.get('PORT', 5000)
     debug = app.config.get('DEBUG', False)
@@ -0,0 +1,229 @@
+"""
+briefings_batch.py - Pre-generation des briefings IA en arriere-plan.
+
+Les briefings se preparent par series (avant une journee de rendez-vous) :
+les generer a l'avance evite d'attendre Claude au moment de les lire. Ils
+sont ecrits dans le cache des reponses (ai_cache.py) sous la cle que
+generate_briefing() calcule pour la version courante du contact ; un contact
+modifie depuis a une autre cle et sera regenere a la demande.
+
+Selection des contacts : 'recents' (derniers modifies), 'suivis' (notes qui
+mentionnent une promesse ou une relance) ou une liste d'IDs. Les contacts
+dont le briefing est deja en cache sont ignores.
+
+Deux modes (BRIEFING_PREFETCH_MODE) :
+- 'pool' : appels normaux par BRIEFING_PREFETCH_WORKERS threads, dans la
+  limite du LimiteurAppels du worker (un appel refuse est retente) ;
+- 'batch' : un lot de l'API Message Batches (moitie prix, traite en
+  quelques minutes a quelques heures), suivi jusqu'a sa fin.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import database
+from claude_integration import NOTES_BRIEFING_IA
+from config import Config
+
+SELECTIONS = ("recents", "suivis")
+MODES = ("pool", "batch")
+
+# Debuts de mots (prefixes) qui signalent un suivi en attente dans une note
+MOTS_SUIVI = ("promis", "promes", "promet", "rappel", "relanc", "envoy", "a faire")
+
+# Un appel refuse par le limiteur (requetes interactives prioritaires) est
+# retente apres DELAI_REPRISE secondes, REPRISES_OCCUPE fois au plus
+REPRISES_OCCUPE = 5
+DELAI_REPRISE = 2
+
+
+def selectionner(selections, limite=None):
+    """
+    IDs des contacts a preparer, sans doublon, pour une ou plusieurs
+    selections ('recents', 'suivis'), 'limite' contacts par selection.
+
+    Leve ValueError pour une selection inconnue ou qui n'est ni un texte ni
+    une liste de textes.
+    """
+    if isinstance(selections, str):
+        selections = [selections]
+    if not isinstance(selections, list) or not all(isinstance(s, str) for s in selections):
+        raise ValueError(
+            "La selection doit etre un texte ou une liste de textes "
+            f"parmi : {', '.join(SELECTIONS)}"
+        )
+    limite = limite or Config.BRIEFING_PREFETCH_LIMIT
+    ids = []
+    for selection in selections:
+        if selection == "recents":
+            ids.extend(database.ids_contacts_recents(limite))
+        elif selection == "suivis":
+            ids.extend(database.ids_contacts_avec_suivi(MOTS_SUIVI, limite))
+        else:
+            raise ValueError(
+                f"Selection inconnue : '{selection}'. "
+                f"Selections disponibles : {', '.join(SELECTIONS)}"
+            )
+    return list(dict.fromkeys(ids))
+
+
+class PregenerationBriefings:
+    """
+    Pre-genere les briefings d'une liste de contacts.
+
+    executer() travaille dans le thread appelant (script, cron) ; lancer()
+    le fait dans un thread de fond, une seule pre-generation a la fois, dont
+    etat() donne l'avancement.
+    """
+
+    def __init__(self, claude, workers=None, mode=None):
+        self.claude = claude
+        self.workers = workers or Config.BRIEFING_PREFETCH_WORKERS
+        self.mode = mode or Config.BRIEFING_PREFETCH_MODE
+        self._lock = threading.Lock()
+        self._thread = None
+        self._etat = {"en_cours": False}
+
+    def verifier(self, mode=None):
+        """Leve ValueError si la pre-generation n'est pas possible."""
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Mode inconnu : '{mode}'. Modes disponibles : {', '.join(MODES)}")
+        if not self.claude.is_configured():
+            raise ValueError("API Claude non configuree")
+        if self.claude.cache is None:
+            raise ValueError("Cache des reponses IA desactive (AI_CACHE_ENABLED)")
+
+    def etat(self):
+        """Avancement de la derniere pre-generation (compteurs, dates, erreur)."""
+        with self._lock:
+            return dict(self._etat)
+
+    def _compter(self, nom, n=1):
+        with self._lock:
+            self._etat[nom] += n
+
+    def lancer(self, contact_ids, mode=None):
+        """
+        Demarre la pre-generation dans un thread de fond.
+
+        Retourne False si une pre-generation est deja en cours.
+        """
+        self.verifier(mode)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(
+                target=self._executer_fond, args=(list(contact_ids), mode),
+                name="pregeneration-briefings", daemon=True
+            )
+            self._etat = {"en_cours": True}
+            self._thread.start()
+        return True
+
+    def _executer_fond(self, contact_ids, mode):
+        try:
+            self.executer(contact_ids, mode)
+        except Exception as e:
+            print(f"[IA] Pre-generation interrompue : {e}")
+            with self._lock:
+                self._etat["erreur"] = str(e)
+        finally:
+            with self._lock:
+                self._etat["en_cours"] = False
+            database.close_connection()
+
+    def executer(self, contact_ids, mode=None):
+        """Pre-genere les briefings des contacts ; retourne les compteurs."""
+        mode = mode or self.mode
+        self.verifier(mode)
+        with self._lock:
+            self._etat = {
+                "en_cours": True,
+                "mode": mode,
+                "debut": datetime.now().isoformat(),
+                "fin": None,
+                "demandes": len(contact_ids),
+                "introuvables": 0,
+                "deja_en_cache": 0,
+                "generes": 0,
+                "erreurs": 0,
+                "lot": None,
+            }
+
+        # Lectures en base dans ce thread : les threads du pool n'appellent que Claude
+        master = database.get_master_profile()
+        a_generer = []
+        for contact_id in contact_ids:
+            contact = database.get_contact(contact_id, notes_limit=NOTES_BRIEFING_IA)
+            if contact is None:
+                self._compter("introuvables")
+                continue
+            cle, parametres = self.claude.requete_briefing(contact, master)
+            if self.claude.cache.contient(cle):
+                self._compter("deja_en_cache")
+                continue
+            a_generer.append((contact, cle, parametres))
+
+        if a_generer:
+            lots = getattr(self.claude.client.messages, "batches", None)
+            if mode == "batch" and lots is not None:
+                self._par_lot(lots, a_generer)
+            else:
+                self._par_pool(master, a_generer)
+
+        with self._lock:
+            self._etat["fin"] = datetime.now().isoformat()
+            resume = dict(self._etat, en_cours=False)
+        print(f"[IA] Pre-generation ({mode}) : {resume['generes']} briefing(s) genere(s), "
+              f"{resume['deja_en_cache']} deja en cache, {resume['erreurs']} erreur(s)")
+        return resume
+
+    def _generer(self, master, contact):
+        """Un briefing par un appel normal, retente tant que Claude est occupe."""
+        for _ in range(REPRISES_OCCUPE + 1):
+            resultat = self.claude.generate_briefing(contact, master_profile=master)
+            if not resultat.get("occupe"):
+                break
+            time.sleep(DELAI_REPRISE)
+        if resultat.get("success"):
+            self._compter("generes")
+        else:
+            self._compter("erreurs")
+            print(f"[IA] Briefing du contact {contact.get('id')} non genere : "
+                  f"{resultat.get('message')}")
+
+    def _par_pool(self, master, a_generer):
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="briefing") as pool:
+            for contact, _, _ in a_generer:
+                pool.submit(self._generer, master, contact)
+
+    def _par_lot(self, lots, a_generer):
+        """Un lot Message Batches, suivi toutes les BRIEFING_BATCH_POLL_INTERVAL s."""
+        cles = {}
+        requetes = []
+        for contact, cle, parametres in a_generer:
+            custom_id = f"contact-{contact['id']}"
+            cles[custom_id] = (cle, contact["id"])
+            requetes.append({"custom_id": custom_id, "params": parametres})
+
+        lot = lots.create(requests=requetes)
+        with self._lock:
+            self._etat["lot"] = lot.id
+        print(f"[IA] Lot {lot.id} : {len(requetes)} briefing(s) soumis")
+        while lot.processing_status != "ended":
+            time.sleep(Config.BRIEFING_BATCH_POLL_INTERVAL)
+            lot = lots.retrieve(lot.id)
+
+        for resultat in lots.results(lot.id):
+            cle, contact_id = cles[resultat.custom_id]
+            if resultat.result.type == "succeeded":
+                self.claude.enregistrer_briefing(cle, contact_id, resultat.result.message)
+                self._compter("generes")
+            else:
+                self._compter("erreurs")
+                print(f"[IA] Briefing du contact {contact_id} non genere : "
+                      f"{resultat.result.type}")
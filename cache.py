@@ -0,0 +1,95 @@
+"""
+cache.py - Cache LRU en memoire, borne en entrees et en octets.
+
+Les valeurs sont associees a un jeton (numero de modification de la base) :
+des que le jeton change, tout le cache est vide. Il n'y a donc jamais a
+invalider une entree precise, et plusieurs processus (workers gunicorn)
+restent coherents tant qu'ils lisent le meme jeton.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Cache LRU partage par les threads du processus.
+
+    max_entrees / max_octets : au-dela, les entrees les moins recemment lues
+    sont retirees. La taille en octets est fournie par l'appelant (estimation).
+    """
+
+    def __init__(self, max_entrees=1000, max_octets=8 * 1024 * 1024):
+        self.max_entrees = max_entrees
+        self.max_octets = max_octets
+        self._entrees = OrderedDict()
+        self._octets = 0
+        self._jeton = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _valider(self, jeton):
+        """Vide le cache si le jeton a change (appele sous le verrou)."""
+        if jeton != self._jeton:
+            if self._entrees:
+                self.invalidations += 1
+            self._entrees.clear()
+            self._octets = 0
+            self._jeton = jeton
+
+    def lire(self, cle, jeton):
+        """Retourne (True, valeur) si la cle est en cache pour ce jeton, sinon (False, None)."""
+        with self._lock:
+            self._valider(jeton)
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.misses += 1
+                return False, None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return True, entree[0]
+
+    def ecrire(self, cle, valeur, taille, jeton):
+        """
+        Ajoute une valeur lue pour ce jeton.
+
+        Ignoree si le jeton a change entre-temps (la valeur peut etre
+        perimee) ou si elle est plus grosse que le cache entier.
+        """
+        if taille > self.max_octets or self.max_entrees <= 0:
+            return
+        with self._lock:
+            if jeton != self._jeton:
+                return
+            ancienne = self._entrees.pop(cle, None)
+            if ancienne is not None:
+                self._octets -= ancienne[1]
+            self._entrees[cle] = (valeur, taille)
+            self._octets += taille
+            while len(self._entrees) > self.max_entrees or self._octets > self.max_octets:
+                _, (_, taille_retiree) = self._entrees.popitem(last=False)
+                self._octets -= taille_retiree
+
+    def vider(self):
+        """Vide le cache (les compteurs sont conserves)."""
+        with self._lock:
+            self._entrees.clear()
+            self._octets = 0
+            self._jeton = None
+
+    def stats(self):
+        """Compteurs du cache, pour la supervision."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entrees": len(self._entrees),
+                "octets": self._octets,
+                "max_entrees": self.max_entrees,
+                "max_octets": self.max_octets,
+                "hits": self.hits,
+                "misses": self.misses,
+                "taux_hits": round(self.hits / total, 3) if total else None,
+                "invalidations": self.invalidations,
+            }
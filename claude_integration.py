@@ -6,16 +6,145 @@ Fournit des fonctionnalites IA :
 - Generation de briefings contextuels
 - Assistant conversationnel
 - Suggestions intelligentes pour le dashboard
+
+Les appels a l'API sont bornes par worker (LimiteurAppels) : un afflux de
+requetes IA ne peut pas occuper tous les threads gunicorn.
 """
 
+import importlib.util
 import json
+import threading
+import time
+from contextlib import contextmanager
+
+import ai_cache
+import claude_stub
+import metrics
 from config import Config
 
-try:
+# anthropic est long a importer (plus d'une seconde) : il n'est charge qu'au
+# premier appel a l'API, pas au demarrage de l'application
+ANTHROPIC_AVAILABLE = importlib.util.find_spec("anthropic") is not None
+
+
+def _anthropic():
+    """Module anthropic, importe a la demande."""
     import anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
+    return anthropic
+
+
+# Nombre de notes recentes envoyees a Claude pour un briefing
+NOTES_BRIEFING_IA = 10
+
+# A incrementer a chaque modification des prompts : les reponses en cache
+# generees avec les anciens prompts ne sont plus servies
+VERSION_PROMPTS = 2
+
+# Consignes fixes, envoyees en prompt systeme avec le profil master
+PROMPT_BRIEFING = """Tu es un assistant CRM personnel. Genere un briefing concis et utile pour preparer une rencontre avec le contact decrit par l'utilisateur.
+
+Genere un briefing structure avec :
+1. **Resume du contact** (qui est cette personne, relation)
+2. **Points cles a aborder** (sujets de conversation pertinents)
+3. **Promesses ou suivis en attente** (extraits des notes)
+4. **Suggestions** (comment renforcer la relation)
+
+Sois concis, pratique et bienveillant. Reponds en francais."""
+
+PROMPT_ASSISTANT = """Tu es un assistant CRM personnel intelligent. Tu aides l'utilisateur a gerer ses contacts et relations.
+Tu peux :
+- Repondre aux questions sur les contacts
+- Donner des conseils relationnels
+- Suggerer des actions (appeler, envoyer un message, planifier un meeting)
+- Aider a rediger des messages
+
+Sois concis, pratique et bienveillant. Reponds en francais."""
+
+
+def _bloc(texte):
+    """Bloc de texte de l'API Messages."""
+    return {"type": "text", "text": texte}
+
+
+def _usage(response):
+    """Tokens consommes par un appel, dont ceux lus ou ecrits dans le cache."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return {
+        "input_tokens": usage.input_tokens or 0,
+        "output_tokens": usage.output_tokens or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+    }
+
+
+class ClaudeOccupe(Exception):
+    """Trop d'appels Claude en cours ou en attente dans ce worker."""
+
+
+class LimiteurAppels:
+    """
+    Borne les appels Claude simultanes d'un worker.
+
+    Au plus max_actifs appels a la fois ; au-dela, max_attente requetes
+    attendent une place (au plus delai_attente secondes) et les suivantes
+    sont refusees tout de suite (ClaudeOccupe). Les appels IA n'occupent
+    ainsi jamais plus de max_actifs + max_attente threads.
+    """
+
+    def __init__(self, max_actifs=2, max_attente=2, delai_attente=10):
+        self.max_actifs = max(max_actifs, 1)
+        self.max_attente = max(max_attente, 0)
+        self.delai_attente = delai_attente
+        self._places = threading.BoundedSemaphore(self.max_actifs)
+        self._lock = threading.Lock()
+        self.actifs = 0
+        self.en_attente = 0
+        self.refuses = 0
+
+    def _refuser(self, message):
+        with self._lock:
+            self.refuses += 1
+        raise ClaudeOccupe(message)
+
+    @contextmanager
+    def place(self):
+        """Reserve une place pour un appel (leve ClaudeOccupe sinon)."""
+        if not self._places.acquire(blocking=False):
+            with self._lock:
+                accepte = self.en_attente < self.max_attente
+                if accepte:
+                    self.en_attente += 1
+            if not accepte:
+                self._refuser("Assistant IA occupe, reessayez dans quelques instants.")
+            try:
+                obtenue = self._places.acquire(timeout=self.delai_attente)
+            finally:
+                with self._lock:
+                    self.en_attente -= 1
+            if not obtenue:
+                self._refuser("Assistant IA occupe (attente trop longue).")
+
+        with self._lock:
+            self.actifs += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.actifs -= 1
+            self._places.release()
+
+    def stats(self):
+        """Etat courant du limiteur."""
+        with self._lock:
+            return {
+                "actifs": self.actifs,
+                "en_attente": self.en_attente,
+                "refuses": self.refuses,
+                "max_actifs": self.max_actifs,
+                "max_attente": self.max_attente,
+            }
 
 
 class ClaudeIntegration:
@@ -25,24 +154,197 @@ class ClaudeIntegration:
         self.api_key = api_key or Config.CLAUDE_API_KEY
         self.model = Config.CLAUDE_MODEL
         self.max_tokens = Config.CLAUDE_MAX_TOKENS
-        self.client = None
-        if self.api_key and ANTHROPIC_AVAILABLE:
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+        # 'anthropic' (API reelle) ou 'stub' (claude_stub.py, hors ligne)
+        self.fournisseur = Config.CLAUDE_PROVIDER
+        self._client = None
+        self.limiteur = LimiteurAppels(
+            Config.CLAUDE_MAX_CONCURRENT, Config.CLAUDE_MAX_QUEUE,
+            Config.CLAUDE_QUEUE_TIMEOUT
+        )
+        self.cache = None
+        if Config.AI_CACHE_ENABLED:
+            self.cache = ai_cache.CacheReponses(
+                Config.AI_CACHE_PATH, Config.AI_CACHE_TTL,
+                Config.AI_CACHE_MAX_ENTRIES, Config.AI_CACHE_MAX_BYTES
+            )
+
+    @property
+    def client(self):
+        """Client Anthropic, cree au premier usage (None si non configure)."""
+        if self._client is None and self.fournisseur == "stub":
+            self._client = claude_stub.ClientSimule(Config.CLAUDE_STUB_LATENCY)
+        elif self._client is None and self.is_configured():
+            self._client = _anthropic().Anthropic(
+                api_key=self.api_key,
+                base_url=Config.CLAUDE_BASE_URL,
+                timeout=Config.CLAUDE_TIMEOUT,
+                max_retries=Config.CLAUDE_MAX_RETRIES,
+            )
+        return self._client
+
+    @contextmanager
+    def _appel_borne(self):
+        """
+        Encadre un appel a l'API : place dans le limiteur (ClaudeOccupe sinon)
+        et mesure de sa duree et de son resultat.
+        """
+        debut = time.perf_counter()
+        resultat = "erreur"
+        try:
+            with self.limiteur.place():
+                yield
+            resultat = "ok"
+        except ClaudeOccupe:
+            resultat = "refuse"
+            raise
+        except GeneratorExit:
+            # Flux ferme avant la fin (client deconnecte)
+            resultat = "annule"
+            raise
+        finally:
+            if metrics.ACTIVE:
+                metrics.appels_ia.inc(resultat)
+                metrics.duree_ia.observe(time.perf_counter() - debut)
+
+    def _appeler(self, **parametres):
+        """
+        Appelle l'API Messages dans la limite de concurrence du worker.
+
+        Leve ClaudeOccupe si aucune place ne se libere a temps.
+        """
+        with self._appel_borne():
+            response = self.client.messages.create(model=self.model, **parametres)
+        self._compter_tokens(_usage(response))
+        return response
+
+    @staticmethod
+    def _compter_tokens(usage):
+        """Ajoute les tokens d'un appel aux metriques (crm_ai_tokens_total)."""
+        if usage is None or not metrics.ACTIVE:
+            return
+        metrics.tokens_ia.inc("input", n=usage["input_tokens"])
+        metrics.tokens_ia.inc("output", n=usage["output_tokens"])
+        metrics.tokens_ia.inc("cache_read", n=usage["cache_read_input_tokens"])
+        metrics.tokens_ia.inc("cache_write", n=usage["cache_creation_input_tokens"])
+
+    @staticmethod
+    def _systeme(consignes, master_profile=None):
+        """
+        Prompt systeme : consignes puis profil master.
+
+        Pas de point de cache (cache_control) : ce prefixe fait environ 200
+        tokens, sous le minimum de 1024 tokens que l'API met en cache.
+        """
+        blocs = [_bloc(consignes)]
+        if master_profile:
+            master_infos = master_profile.get("informations", {}) or {}
+            blocs.append(_bloc(
+                f"Profil de l'utilisateur (vous) :\n"
+                f"- Nom: {master_profile.get('prenom', '')} {master_profile.get('nom', '')}\n"
+                f"- Informations: {json.dumps(master_infos, ensure_ascii=False)}"
+            ))
+        return blocs
+
+    def _cle(self, fonction, sujet, version, parametres):
+        """Cle du cache pour une requete (None si le cache est desactive)."""
+        if self.cache is None:
+            return None
+        return ai_cache.cle(fonction, sujet, version, self.fournisseur, self.model,
+                            VERSION_PROMPTS, parametres)
+
+    def _generer(self, fonction, sujet, version, rafraichir=False, **parametres):
+        """
+        Texte genere par Claude, lu dans le cache si la meme requete y est.
+
+        sujet / version : contact concerne et sa date_modification (None pour
+        un ensemble de contacts, deja decrit par le prompt). rafraichir=True
+        ignore le cache et remplace l'entree. Retourne (texte, depuis_cache,
+        usage), usage valant None pour une reponse lue dans le cache.
+        """
+        parametres.setdefault("max_tokens", self.max_tokens)
+        cle = self._cle(fonction, sujet, version, parametres)
+        if cle is not None and not rafraichir:
+            texte = self.cache.lire(cle)
+            if texte is not None:
+                return texte, True, None
+
+        response = self._appeler(**parametres)
+        texte = response.content[0].text
+        if cle is not None:
+            self.cache.ecrire(cle, fonction, sujet, texte)
+        return texte, False, _usage(response)
+
+    def _flux(self, fonction, sujet, version, rafraichir=False, **parametres):
+        """
+        Comme _generer, mais au fil de la generation : produit des evenements
+        {"type": "texte", "texte"} puis {"type": "fin", "cached", "usage"},
+        ou {"type": "erreur", "message"} ("occupe": True si refuse).
+
+        fonction=None : pas de cache. Fermer le generateur (client deconnecte)
+        ferme le flux de l'API, ce qui interrompt la generation.
+        """
+        if not self.is_configured():
+            yield {"type": "erreur", "message": "API Claude non configuree"}
+            return
+        parametres.setdefault("max_tokens", self.max_tokens)
+        cle = self._cle(fonction, sujet, version, parametres) if fonction else None
+        if cle is not None:
+            texte = None if rafraichir else self.cache.lire(cle)
+            if texte is not None:
+                yield {"type": "texte", "texte": texte}
+                yield {"type": "fin", "cached": True, "usage": None, "model": self.model}
+                return
+
+        morceaux = []
+        try:
+            with self._appel_borne():
+                with self.client.messages.stream(model=self.model, **parametres) as flux:
+                    for texte in flux.text_stream:
+                        morceaux.append(texte)
+                        yield {"type": "texte", "texte": texte}
+                    message = flux.get_final_message()
+        except ClaudeOccupe as e:
+            yield dict(self._occupe(e), type="erreur")
+            return
+        except Exception as e:
+            yield {"type": "erreur", "message": f"Erreur: {str(e)}"}
+            return
+
+        usage = _usage(message)
+        self._compter_tokens(usage)
+        if cle is not None:
+            self.cache.ecrire(cle, fonction, sujet, "".join(morceaux))
+        yield {"type": "fin", "cached": False, "usage": usage, "model": self.model}
+
+    @staticmethod
+    def _occupe(e):
+        """Reponse d'erreur quand le limiteur refuse l'appel."""
+        return {"success": False, "message": str(e), "occupe": True}
 
     def is_configured(self):
         """Verifie si l'API est configuree et disponible."""
-        return bool(self.api_key and self.client)
+        if self.fournisseur == "stub":
+            return True
+        return bool(self.api_key and ANTHROPIC_AVAILABLE)
 
     def update_api_key(self, new_key):
         """Met a jour la cle API dynamiquement."""
         self.api_key = new_key
-        if new_key and ANTHROPIC_AVAILABLE:
-            self.client = anthropic.Anthropic(api_key=new_key)
-        else:
-            self.client = None
+        self._client = None
 
     def test_connection(self):
         """Teste la connexion a l'API Claude."""
+        if self.fournisseur == "stub":
+            try:
+                self._appeler(max_tokens=50, messages=[{"role": "user", "content": "OK ?"}])
+            except ClaudeOccupe as e:
+                return self._occupe(e)
+            return {
+                "success": True,
+                "message": "Fournisseur simule (CLAUDE_PROVIDER=stub)",
+                "model": self.model
+            }
+
         if not ANTHROPIC_AVAILABLE:
             return {
                 "success": False,
@@ -55,9 +357,9 @@ class ClaudeIntegration:
                 "message": "Cle API non configuree. Ajoutez-la dans les parametres."
             }
 
+        anthropic = _anthropic()
         try:
-            response = self.client.messages.create(
-                model=self.model,
+            response = self._appeler(
                 max_tokens=50,
                 messages=[{"role": "user", "content": "Reponds uniquement 'OK' pour confirmer la connexion."}]
             )
@@ -66,6 +368,8 @@ class ClaudeIntegration:
                 "message": "Connexion reussie !",
                 "model": self.model
             }
+        except ClaudeOccupe as e:
+            return self._occupe(e)
         except anthropic.AuthenticationError:
             return {
                 "success": False,
@@ -82,111 +386,128 @@ class ClaudeIntegration:
                 "message": f"Erreur de connexion: {str(e)}"
             }
 
-    def generate_briefing(self, contact, master_profile=None):
-        """Genere un briefing intelligent pour un contact."""
-        if not self.is_configured():
-            return {"success": False, "message": "API Claude non configuree"}
-
+    def _parametres_briefing(self, contact, master_profile=None):
+        """Prompt systeme et message d'un briefing."""
         # Construire le contexte du contact
         infos = contact.get("informations", {}) or {}
         notes = contact.get("notes", []) or []
 
         notes_text = ""
         if notes:
-            recent_notes = notes[-10:]  # 10 dernieres notes
+            recent_notes = notes[-NOTES_BRIEFING_IA:]
             notes_text = "\n".join(
                 f"- [{n.get('date', 'N/A')}] {n.get('contenu', '')}"
                 for n in recent_notes
             )
 
-        master_context = ""
-        if master_profile:
-            master_infos = master_profile.get("informations", {}) or {}
-            master_context = f"""
-Profil de l'utilisateur (vous) :
-- Nom: {master_profile.get('prenom', '')} {master_profile.get('nom', '')}
-- Informations: {json.dumps(master_infos, ensure_ascii=False)}
-"""
-
-        prompt = f"""Tu es un assistant CRM personnel. Genere un briefing concis et utile pour preparer une rencontre avec ce contact.
-
-{master_context}
-
-Contact :
+        contexte_contact = f"""Contact :
 - Nom: {contact.get('prenom', '')} {contact.get('nom', '')}
 - Categorie: {contact.get('categorie', 'autre')}
 - Informations: {json.dumps(infos, ensure_ascii=False)}
 
 Notes recentes :
-{notes_text if notes_text else "Aucune note enregistree."}
+{notes_text if notes_text else "Aucune note enregistree."}"""
 
-Genere un briefing structure avec :
-1. **Resume du contact** (qui est cette personne, relation)
-2. **Points cles a aborder** (sujets de conversation pertinents)
-3. **Promesses ou suivis en attente** (extraits des notes)
-4. **Suggestions** (comment renforcer la relation)
+        return {
+            "system": self._systeme(PROMPT_BRIEFING, master_profile),
+            "messages": [{"role": "user", "content": contexte_contact}],
+        }
 
-Sois concis, pratique et bienveillant. Reponds en francais."""
+    def generate_briefing(self, contact, master_profile=None, rafraichir=False):
+        """
+        Genere un briefing intelligent pour un contact.
+
+        Servi depuis le cache tant que le contact, ses notes et le profil
+        master n'ont pas change (rafraichir=True force un nouvel appel).
+        """
+        if not self.is_configured():
+            return {"success": False, "message": "API Claude non configuree"}
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                messages=[{"role": "user", "content": prompt}]
+            texte, depuis_cache, usage = self._generer(
+                "briefing", contact.get("id"), contact.get("date_modification"),
+                rafraichir=rafraichir, **self._parametres_briefing(contact, master_profile)
             )
             return {
                 "success": True,
-                "briefing": response.content[0].text,
-                "model": self.model
+                "briefing": texte,
+                "model": self.model,
+                "cached": depuis_cache,
+                "usage": usage
             }
+        except ClaudeOccupe as e:
+            return self._occupe(e)
         except Exception as e:
             return {"success": False, "message": f"Erreur: {str(e)}"}
 
+    def stream_briefing(self, contact, master_profile=None, rafraichir=False):
+        """Briefing au fil de la generation (evenements, voir _flux)."""
+        return self._flux(
+            "briefing", contact.get("id"), contact.get("date_modification"),
+            rafraichir=rafraichir, **self._parametres_briefing(contact, master_profile)
+        )
+
+    def requete_briefing(self, contact, master_profile=None):
+        """
+        Cle du cache et parametres complets (modele compris) du briefing
+        d'un contact : ceux qu'utiliserait generate_briefing().
+        """
+        parametres = dict(self._parametres_briefing(contact, master_profile),
+                          max_tokens=self.max_tokens)
+        cle = self._cle("briefing", contact.get("id"), contact.get("date_modification"),
+                        parametres)
+        return cle, dict(parametres, model=self.model)
+
+    def enregistrer_briefing(self, cle, contact_id, message):
+        """Met en cache un briefing genere hors de generate_briefing (lot)."""
+        self._compter_tokens(_usage(message))
+        if self.cache is not None:
+            self.cache.ecrire(cle, "briefing", contact_id, message.content[0].text)
+
+    def _parametres_assistant(self, question, contacts_context=None, master_profile=None):
+        """
+        Prompt systeme et message de l'assistant : contexte des contacts
+        pertinents pour la question, puis la question.
+        """
+        contenu = []
+        if contacts_context:
+            contenu.append(_bloc(f"Contexte contacts:\n{contacts_context}"))
+        contenu.append(_bloc(f"Question: {question}"))
+        return {
+            "system": self._systeme(PROMPT_ASSISTANT, master_profile),
+            "messages": [{"role": "user", "content": contenu}],
+        }
+
     def ask_assistant(self, question, contacts_context=None, master_profile=None):
         """Assistant conversationnel pour questions sur les contacts."""
         if not self.is_configured():
             return {"success": False, "message": "API Claude non configuree"}
 
-        system_prompt = """Tu es un assistant CRM personnel intelligent. Tu aides l'utilisateur a gerer ses contacts et relations.
-Tu peux :
-- Repondre aux questions sur les contacts
-- Donner des conseils relationnels
-- Suggerer des actions (appeler, envoyer un message, planifier un meeting)
-- Aider a rediger des messages
-
-Sois concis, pratique et bienveillant. Reponds en francais."""
-
-        context_parts = []
-        if master_profile:
-            master_infos = master_profile.get("informations", {}) or {}
-            context_parts.append(
-                f"Profil utilisateur: {master_profile.get('prenom', '')} {master_profile.get('nom', '')} - {json.dumps(master_infos, ensure_ascii=False)}"
-            )
-
-        if contacts_context:
-            context_parts.append(f"Contexte contacts:\n{contacts_context}")
-
-        user_message = question
-        if context_parts:
-            user_message = "\n\n".join(context_parts) + f"\n\nQuestion: {question}"
-
         try:
-            response = self.client.messages.create(
-                model=self.model,
+            response = self._appeler(
                 max_tokens=self.max_tokens,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_message}]
+                **self._parametres_assistant(question, contacts_context, master_profile)
             )
             return {
                 "success": True,
                 "response": response.content[0].text,
-                "model": self.model
+                "model": self.model,
+                "usage": _usage(response)
             }
+        except ClaudeOccupe as e:
+            return self._occupe(e)
         except Exception as e:
             return {"success": False, "message": f"Erreur: {str(e)}"}
 
-    def generate_dashboard_suggestions(self, contacts, master_profile=None):
-        """Genere des suggestions proactives pour le dashboard."""
+    def stream_assistant(self, question, contacts_context=None, master_profile=None):
+        """Reponse de l'assistant au fil de la generation (sans cache)."""
+        return self._flux(
+            None, None, None,
+            **self._parametres_assistant(question, contacts_context, master_profile)
+        )
+
+    def generate_dashboard_suggestions(self, contacts, master_profile=None, rafraichir=False):
+        """Genere des suggestions proactives pour le dashboard (en cache, comme les briefings)."""
         if not self.is_configured():
             return {"success": False, "message": "API Claude non configuree"}
 
@@ -221,13 +542,12 @@ Reponds UNIQUEMENT avec un JSON valide (array d'objets avec titre, description,
 Pas de markdown, pas de texte avant ou apres le JSON."""
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
+            texte, depuis_cache, _ = self._generer(
+                "suggestions", None, None, rafraichir=rafraichir,
                 messages=[{"role": "user", "content": prompt}]
             )
 
-            text = response.content[0].text.strip()
+            text = texte.strip()
             # Extraire le JSON meme s'il est entoure de texte
             start = text.find("[")
             end = text.rfind("]") + 1
@@ -238,9 +558,12 @@ Pas de markdown, pas de texte avant ou apres le JSON."""
 
             return {
                 "success": True,
-                "suggestions": suggestions
+                "suggestions": suggestions,
+                "cached": depuis_cache
             }
         except json.JSONDecodeError:
             return {"success": True, "suggestions": []}
+        except ClaudeOccupe as e:
+            return self._occupe(e)
         except Exception as e:
             return {"success": False, "message": f"Erreur: {str(e)}"}
@@ -0,0 +1,154 @@
+"""
+claude_stub.py - Fournisseur Claude simule (CLAUDE_PROVIDER=stub).
+
+Imite la partie du client anthropic utilisee par le CRM (messages.create,
+messages.stream, messages.batches) sans reseau, sans cle et sans le module
+anthropic : de quoi developper et tester les fonctionnalites IA hors ligne.
+Les textes sont fabriques a partir de la requete ; les tokens sont estimes
+a 4 caracteres par token.
+"""
+
+import itertools
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+_ids = itertools.count(1)
+
+
+def _tokens(donnees):
+    """Estimation grossiere : 4 caracteres par token."""
+    return len(json.dumps(donnees, ensure_ascii=False)) // 4
+
+
+def _texte(parametres):
+    """Texte simule, au format attendu par la fonctionnalite appelee."""
+    messages = parametres.get("messages", [])
+    prompt = json.dumps(messages, ensure_ascii=False)
+    if "UNIQUEMENT avec un JSON" in prompt:
+        return json.dumps([{
+            "titre": "Relancer un contact",
+            "description": "Suggestion simulee (CLAUDE_PROVIDER=stub).",
+            "type": "relance",
+        }], ensure_ascii=False)
+
+    contenu = messages[-1].get("content", "") if messages else ""
+    if isinstance(contenu, list):
+        contenu = contenu[-1].get("text", "")
+    # Premiere ligne porteuse d'une valeur ("- Nom: ...", "Question: ...")
+    sujet = next((l.strip(" -") for l in contenu.splitlines()
+                  if l.strip() and not l.rstrip().endswith(":")), "")
+    return (f"Reponse simulee ({sujet[:80]}). Pistes : rappeler le "
+            "dernier sujet aborde, proposer un cafe et noter les promesses faites "
+            "lors du precedent rendez-vous.")
+
+
+def _message(parametres):
+    """Message complet, avec les memes attributs qu'une reponse anthropic."""
+    texte = _texte(parametres)
+    return SimpleNamespace(
+        id=f"msg_stub_{next(_ids)}",
+        type="message",
+        role="assistant",
+        model=parametres.get("model", "stub"),
+        content=[SimpleNamespace(type="text", text=texte)],
+        stop_reason="end_turn",
+        usage=SimpleNamespace(
+            input_tokens=_tokens([parametres.get("system"), parametres.get("messages")]),
+            output_tokens=len(texte) // 4,
+            cache_read_input_tokens=0,
+            cache_creation_input_tokens=0,
+        ),
+    )
+
+
+class _Flux:
+    """Equivalent de MessageStream : text_stream puis get_final_message()."""
+
+    def __init__(self, message, intervalle):
+        self._message = message
+        self._intervalle = intervalle
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        for i, mot in enumerate(self._message.content[0].text.split(" ")):
+            time.sleep(self._intervalle)
+            yield mot if i == 0 else " " + mot
+
+    def get_final_message(self):
+        return self._message
+
+
+class _Lots:
+    """
+    Equivalent de messages.batches : le lot est traite des sa creation et
+    ses resultats restent en memoire (processus courant uniquement).
+    """
+
+    def __init__(self, messages):
+        self._messages = messages
+        self._resultats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lot(identifiant, nombre):
+        return SimpleNamespace(
+            id=identifiant, type="message_batch", processing_status="ended",
+            request_counts=SimpleNamespace(processing=0, succeeded=nombre, errored=0,
+                                           canceled=0, expired=0),
+        )
+
+    def create(self, requests):
+        resultats = [
+            SimpleNamespace(
+                custom_id=requete["custom_id"],
+                result=SimpleNamespace(type="succeeded",
+                                       message=self._messages.create(**requete["params"])),
+            )
+            for requete in requests
+        ]
+        identifiant = f"msgbatch_stub_{next(_ids)}"
+        with self._lock:
+            self._resultats[identifiant] = resultats
+        return self._lot(identifiant, len(resultats))
+
+    def retrieve(self, message_batch_id):
+        with self._lock:
+            resultats = self._resultats[message_batch_id]
+        return self._lot(message_batch_id, len(resultats))
+
+    def results(self, message_batch_id):
+        with self._lock:
+            return iter(self._resultats[message_batch_id])
+
+
+class _Messages:
+    def __init__(self, latence, intervalle):
+        self._latence = latence
+        self._intervalle = intervalle
+        self.batches = _Lots(self)
+
+    def create(self, **parametres):
+        time.sleep(self._latence)
+        return _message(parametres)
+
+    def stream(self, **parametres):
+        time.sleep(self._latence)
+        return _Flux(_message(parametres), self._intervalle)
+
+
+class ClientSimule:
+    """
+    Client sans reseau : 'latence' secondes avant chaque reponse, puis
+    'intervalle' secondes entre deux mots d'une reponse en streaming.
+    """
+
+    def __init__(self, latence=0.0, intervalle=0.0):
+        self.messages = _Messages(latence, intervalle)
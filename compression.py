@@ -0,0 +1,99 @@
+"""
+compression.py - Compression gzip/brotli des reponses HTTP.
+
+Les listes de contacts embarquent toutes les informations et notes : une
+fois compressees elles pesent 5 a 10 fois moins sur le reseau. L'encodage
+est negocie avec Accept-Encoding (brotli si le module est installe, sinon
+gzip) et seules les reponses au-dessus de COMPRESSION_MIN_SIZE octets sont
+compressees. Les reponses en streaming (export) ne sont pas touchees.
+"""
+
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependance optionnelle
+    brotli = None
+
+
+# Types de contenu qui gagnent a etre compresses
+TYPES_COMPRESSIBLES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def _compressible(response):
+    """Indique si le type de la reponse se compresse bien."""
+    mimetype = response.mimetype or ""
+    return any(mimetype.startswith(t) for t in TYPES_COMPRESSIBLES)
+
+
+def _choisir_encodage():
+    """Encodage prefere par le client parmi ceux disponibles, ou None."""
+    accept = request.accept_encodings
+    qualite_br = accept.quality("br") if brotli is not None else 0
+    qualite_gzip = accept.quality("gzip")
+    if qualite_br > 0 and qualite_br >= qualite_gzip:
+        return "br"
+    if qualite_gzip > 0:
+        return "gzip"
+    return None
+
+
+def compresser(response, taille_min=1024, niveau_gzip=6, qualite_brotli=5):
+    """Compresse la reponse si le client l'accepte et si elle est assez grosse."""
+    if not _compressible(response):
+        return response
+    # La reponse depend de Accept-Encoding, meme quand elle n'est pas compressee
+    response.vary.add("Accept-Encoding")
+
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.is_streamed or response.direct_passthrough
+            or "Content-Encoding" in response.headers):
+        return response
+
+    encodage = _choisir_encodage()
+    if encodage is None:
+        return response
+
+    donnees = response.get_data()
+    if len(donnees) < taille_min:
+        return response
+
+    if encodage == "br":
+        compresse = brotli.compress(donnees, quality=qualite_brotli)
+    else:
+        compresse = gzip.compress(donnees, compresslevel=niveau_gzip)
+    if len(compresse) >= len(donnees):
+        return response
+
+    response.set_data(compresse)
+    response.headers["Content-Encoding"] = encodage
+    # Les octets envoyes different de la version non compressee : l'ETag
+    # devient faible, sans autre changement de valeur (If-None-Match compare
+    # en faible ; le PUT accepte les ETags faibles dans If-Match).
+    etag, faible = response.get_etag()
+    if etag and not faible:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Active la compression des reponses pour l'application."""
+    if not app.config.get("ENABLE_COMPRESSION", True):
+        return
+
+    @app.after_request
+    def compresser_reponse(response):
+        return compresser(
+            response,
+            taille_min=app.config.get("COMPRESSION_MIN_SIZE", 1024),
+            niveau_gzip=app.config.get("COMPRESSION_GZIP_LEVEL", 6),
+            qualite_brotli=app.config.get("COMPRESSION_BROTLI_QUALITY", 5),
+        )
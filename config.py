@@ -18,6 +18,43 @@ class Config:
     # Base de donnees
     DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join('data', 'crm.db')
 
+    # Attente du verrou d'ecriture SQLite (busy_timeout) en millisecondes
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+    # Group commit : les ecritures concurrentes sont regroupees dans une seule
+    # transaction, au plus WRITE_QUEUE_MAX_BATCH operations ou apres
+    # WRITE_QUEUE_MAX_DELAY_MS millisecondes d'attente
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', 'True').lower() == 'true'
+    WRITE_QUEUE_MAX_DELAY_MS = int(os.environ.get('WRITE_QUEUE_MAX_DELAY_MS', 2))
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 64))
+
+    # Cache des contacts decodes, par processus (0 entree = desactive)
+    CONTACT_CACHE_MAX_ENTRIES = int(os.environ.get('CONTACT_CACHE_MAX_ENTRIES', 1000))
+    CONTACT_CACHE_MAX_BYTES = int(os.environ.get('CONTACT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+    # Cles de 'informations' indexees et filtrables (?ville=Lyon sur /api/search)
+    CHAMPS_INFORMATIONS_INDEXES = [
+        cle.strip() for cle in os.environ.get(
+            'CHAMPS_INFORMATIONS_INDEXES', 'societe,ville,poste,email,anniversaire'
+        ).split(',') if cle.strip()
+    ]
+
+    # Serialisation JSON des reponses : auto (orjson si installe), orjson ou stdlib
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+    # Compression gzip/brotli des reponses de plus de COMPRESSION_MIN_SIZE octets
+    ENABLE_COMPRESSION = os.environ.get('ENABLE_COMPRESSION', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+    # Metriques de performance (GET /api/metrics, format Prometheus)
+    ENABLE_METRICS = os.environ.get('ENABLE_METRICS', 'True').lower() == 'true'
+
+    # Journal des requetes SQL lentes, avec leur plan (GET /admin/slow-queries)
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'True').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 50))
+
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
 
@@ -41,6 +78,40 @@ class Config:
     CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY', '')
     CLAUDE_MODEL = os.environ.get('CLAUDE_MODEL', 'claude-sonnet-4-5-20250929')
     CLAUDE_MAX_TOKENS = int(os.environ.get('CLAUDE_MAX_TOKENS', 1024))
+    # Serveur de l'API (proxy, serveur simule des tests) ; vide : api.anthropic.com
+    CLAUDE_BASE_URL = os.environ.get('CLAUDE_BASE_URL') or None
+    CLAUDE_TIMEOUT = float(os.environ.get('CLAUDE_TIMEOUT', 60))
+    CLAUDE_MAX_RETRIES = int(os.environ.get('CLAUDE_MAX_RETRIES', 2))
+    # 'anthropic', ou 'stub' : reponses simulees sans reseau ni cle
+    # (claude_stub.py), apres CLAUDE_STUB_LATENCY secondes
+    CLAUDE_PROVIDER = os.environ.get('CLAUDE_PROVIDER', 'anthropic').lower()
+    CLAUDE_STUB_LATENCY = float(os.environ.get('CLAUDE_STUB_LATENCY', 0))
+    # Appels Claude simultanes par worker, appels en attente au-dela (puis 503)
+    # et attente maximale d'une place (s). Garder CONCURRENT + QUEUE < threads
+    # gunicorn pour que le CRUD ait toujours des threads libres.
+    CLAUDE_MAX_CONCURRENT = int(os.environ.get('CLAUDE_MAX_CONCURRENT', 2))
+    CLAUDE_MAX_QUEUE = int(os.environ.get('CLAUDE_MAX_QUEUE', 2))
+    CLAUDE_QUEUE_TIMEOUT = float(os.environ.get('CLAUDE_QUEUE_TIMEOUT', 10))
+    # Cache persistant des reponses de Claude (briefings, suggestions)
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'True').lower() == 'true'
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH') or os.path.join(
+        os.path.dirname(DATABASE_PATH), 'ai_cache.db'
+    )
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 86400))
+    AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 1000))
+    AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 10 * 1024 * 1024))
+    # Contexte de l'assistant : contacts classes selon la question (bm25),
+    # resumes dans la limite d'un budget de tokens (~4 caracteres par token)
+    ASSISTANT_CONTEXT_TOKENS = int(os.environ.get('ASSISTANT_CONTEXT_TOKENS', 1000))
+    ASSISTANT_CONTEXT_MAX_CONTACTS = int(os.environ.get('ASSISTANT_CONTEXT_MAX_CONTACTS', 20))
+    # Pre-generation des briefings (briefings_batch.py) : 'pool' (appels
+    # normaux, N threads) ou 'batch' (API Message Batches, attente du lot).
+    # Garder WORKERS < CLAUDE_MAX_CONCURRENT pour laisser une place aux
+    # requetes interactives du worker.
+    BRIEFING_PREFETCH_MODE = os.environ.get('BRIEFING_PREFETCH_MODE', 'pool').lower()
+    BRIEFING_PREFETCH_WORKERS = int(os.environ.get('BRIEFING_PREFETCH_WORKERS', 1))
+    BRIEFING_PREFETCH_LIMIT = int(os.environ.get('BRIEFING_PREFETCH_LIMIT', 20))
+    BRIEFING_BATCH_POLL_INTERVAL = float(os.environ.get('BRIEFING_BATCH_POLL_INTERVAL', 30))
     ENABLE_AI_FEATURES = os.environ.get('ENABLE_AI_FEATURES', 'True').lower() == 'true'
 
     @staticmethod
@@ -7,9 +7,25 @@ import json
 from datetime import datetime
 from typing import Dict, List
 
+# Nombre de notes recentes lues pour un briefing (affichage des notes recentes)
+NOTES_BRIEFING_MAX = 50
 
-def get_contact_briefing(contact: Dict) -> Dict:
-    """Genere un briefing complet pour un contact."""
+# Expressions qui signalent une promesse dans une note
+MOTS_PROMESSES = ['je devais', 'je dois', 'promis', 'a faire', 'todo', 'rappel',
+                  'je lui ai promis', 'je vais lui', "je m'engage"]
+
+# Nombre de promesses affichees dans un briefing
+PROMESSES_MAX = 5
+
+
+def get_contact_briefing(contact: Dict, promesses: List[Dict] = None) -> Dict:
+    """
+    Genere un briefing complet pour un contact.
+
+    promesses : notes contenant une promesse, les plus recentes d'abord
+    (database.get_notes_promesses), cherchees dans tout l'historique ; a
+    defaut, elles sont extraites des notes chargees dans le contact.
+    """
     info = contact.get('informations', {})
     if isinstance(info, str):
         info = json.loads(info)
@@ -39,7 +55,10 @@ def get_contact_briefing(contact: Dict) -> Dict:
         'vie_perso': info.get('vie_perso', {}),
         'sujets_conversation': info.get('sujets_conversation', []),
         'dernier_contact': info.get('dernier_contact', {}),
-        'promesses_en_attente': _extract_promesses(notes),
+        'promesses_en_attente': (
+            _format_recent_notes(promesses[:PROMESSES_MAX]) if promesses is not None
+            else _extract_promesses(notes)
+        ),
         'a_suivre': info.get('dernier_contact', {}).get('a_suivre', []),
         'notes_recentes': _format_recent_notes(notes[-5:][::-1] if notes else []),
         'info_complementaire': info.get('info_complementaire', ''),
@@ -52,12 +71,10 @@ def get_contact_briefing(contact: Dict) -> Dict:
 def _extract_promesses(notes: List[Dict]) -> List[Dict]:
     """Extrait les promesses non tenues des notes."""
     promesses = []
-    keywords = ['je devais', 'je dois', 'promis', 'a faire', 'todo', 'rappel',
-                'je lui ai promis', 'je vais lui', "je m'engage"]
 
     for note in reversed(notes):
         contenu = note.get('contenu', '').lower()
-        for keyword in keywords:
+        for keyword in MOTS_PROMESSES:
             if keyword in contenu:
                 promesses.append({
                     'date': _format_date(note.get('date', '')),
@@ -65,7 +82,7 @@ def _extract_promesses(notes: List[Dict]) -> List[Dict]:
                 })
                 break
 
-    return promesses[:5]
+    return promesses[:PROMESSES_MAX]
 
 
 def _format_recent_notes(notes: List[Dict]) -> List[Dict]:
@@ -5,62 +5,718 @@ Ce fichier contient toutes les fonctions pour interagir avec la base de donnees
 - Creation des tables
 - Ajout, modification, suppression de contacts
 - Recherche de contacts
-- Gestion des notes
+- Gestion des notes (table 'notes', une ligne par note)
+- Migrations du schema (PRAGMA user_version)
 """
 
 import sqlite3
 import json
 import os
+import re
+import base64
+import random
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime
 
+from config import Config
+from models import valider_contact, ValidationError
+from cache import CacheLRU
+import metrics
+from write_queue import WriteQueue
+
+
+# Connexion SQLite du thread courant (une par thread et par processus)
+_local = threading.local()
+
+# Connexions heritees d'un processus parent (fork gunicorn) : on ne doit ni
+# les reutiliser ni les fermer dans l'enfant, on les garde donc referencees.
+_connexions_heritees = []
+
+# Profil master memorise pour le processus, valide par compteur_modifications()
+_cache_master = {"jeton": None, "id": None, "profil": None}
+
+# Contacts decodes memorises pour le processus, valides par compteur_modifications()
+_cache_contacts = CacheLRU(
+    max_entrees=Config.CONTACT_CACHE_MAX_ENTRIES,
+    max_octets=Config.CONTACT_CACHE_MAX_BYTES,
+)
+
+# Champs d'un contact tels qu'exposes par l'API (ordre d'affichage)
+CHAMPS_CONTACT = [
+    "id", "nom", "prenom", "categorie", "informations", "notes",
+    "date_creation", "date_modification", "version",
+]
+
+# Taille de page maximale pour list_contacts()
+LIMITE_PAGE_MAX = 500
+
+# Nombre de contacts inseres par transaction dans create_contacts_bulk()
+TAILLE_LOT_IMPORT = 1000
+
+# Reprises d'une ecriture quand la base reste verrouillee au-dela du
+# busy_timeout (delai double a chaque tentative, avec un peu d'aleatoire)
+TENTATIVES_ECRITURE = 5
+DELAI_REPRISE_INITIAL = 0.01
+
 
 def _get_db_path():
     """Retourne le chemin de la base de donnees depuis la config ou le defaut."""
     return os.environ.get('DATABASE_PATH', os.path.join('data', 'crm.db'))
 
 
-def get_connection():
-    """Cree et retourne une connexion a la base de donnees SQLite."""
-    db_path = _get_db_path()
+def _open_connection(db_path):
+    """Ouvre une connexion SQLite et applique les PRAGMAs une seule fois."""
     db_dir = os.path.dirname(db_path)
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    # isolation_level=None : les transactions sont gerees par transaction()
+    # timeout : busy_timeout de SQLite, attente du verrou d'ecriture
+    # factory : connexion qui compte les requetes si les metriques sont actives
+    conn = sqlite3.connect(
+        db_path, isolation_level=None,
+        timeout=Config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        factory=metrics.classe_connexion()
+    )
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
 
-def init_db():
-    """Initialise la base de donnees en creant la table 'contacts'."""
+def get_connection():
+    """
+    Retourne la connexion SQLite du thread courant.
+
+    La connexion est ouverte a la premiere utilisation puis reutilisee par
+    toutes les fonctions de ce module. Elle est recreee apres un fork
+    (workers gunicorn) ou si DATABASE_PATH change. Ne pas la fermer :
+    utiliser close_connection() si besoin.
+    """
+    db_path = _get_db_path()
+    pid = os.getpid()
+    conn = getattr(_local, "conn", None)
+
+    if conn is not None and _local.pid != pid:
+        _connexions_heritees.append(conn)
+        conn = None
+    elif conn is not None and _local.db_path != db_path:
+        conn.close()
+        conn = None
+
+    if conn is None:
+        conn = _open_connection(db_path)
+        _local.conn = conn
+        _local.pid = pid
+        _local.db_path = db_path
+        _local.profondeur = 0
+    return conn
+
+
+def close_connection():
+    """Ferme la connexion du thread courant (elle sera rouverte a la demande)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
+def release_connection():
+    """
+    Fin de requete : annule une transaction restee ouverte par erreur.
+
+    La connexion elle-meme est conservee pour la requete suivante.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        return
+    if conn.in_transaction:
+        conn.execute("ROLLBACK")
+    _local.profondeur = 0
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Execute un bloc dans une transaction sur la connexion du thread.
+
+    Les appels imbriques partagent la transaction la plus externe (via des
+    SAVEPOINT) : seul le bloc de plus haut niveau fait COMMIT, et une erreur
+    dans un bloc interne n'annule que ce bloc. immediate=True prend le verrou
+    d'ecriture des le debut : a utiliser pour toute ecriture, sinon SQLite
+    peut repondre "database is locked" sans attendre quand deux ecrivains
+    passent d'un verrou de lecture a un verrou d'ecriture.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    niveau = _local.profondeur
+    if niveau == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    else:
+        conn.execute(f"SAVEPOINT sp_{niveau}")
+    _local.profondeur = niveau + 1
+
+    try:
+        yield conn
+    except BaseException:
+        _local.profondeur = niveau
+        if niveau == 0:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        else:
+            conn.execute(f"ROLLBACK TO sp_{niveau}")
+            conn.execute(f"RELEASE sp_{niveau}")
+        raise
+    else:
+        _local.profondeur = niveau
+        if niveau == 0:
+            try:
+                conn.execute("COMMIT")
+            except BaseException:
+                # COMMIT refuse (verrou) : ne pas laisser la transaction ouverte
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        else:
+            conn.execute(f"RELEASE sp_{niveau}")
+
+
+def compteur_modifications():
+    """
+    Numero de modification de la base : change des qu'une ecriture a ete
+    commitee, par ce processus ou par un autre (autre worker gunicorn).
+
+    Incremente par les triggers de la table 'modifications'. Sert a valider
+    les caches du processus sans relire les contacts.
+    """
+    conn = get_connection()
+    return conn.execute(
+        "SELECT compteur FROM modifications WHERE id = 1"
+    ).fetchone()[0]
+
+
+def _verrou_occupe(erreur):
+    """Indique si l'erreur SQLite vient d'une base verrouillee par un autre ecrivain."""
+    message = str(erreur).lower()
+    return isinstance(erreur, sqlite3.OperationalError) and (
+        "locked" in message or "busy" in message
+    )
+
+
+def _avec_reprises(operation):
+    """
+    Execute operation(conn) dans une transaction d'ecriture.
+
+    Si la base reste verrouillee malgre le busy_timeout, la transaction est
+    rejouee avec un delai croissant (TENTATIVES_ECRITURE fois au plus).
+    Dans une transaction deja ouverte, l'operation s'y execute directement :
+    c'est alors au bloc externe de gerer l'echec.
+    """
+    get_connection()
+    if _local.profondeur > 0:
+        with transaction(immediate=True) as conn:
+            return operation(conn)
+
+    delai = DELAI_REPRISE_INITIAL
+    for tentative in range(TENTATIVES_ECRITURE):
+        try:
+            with transaction(immediate=True) as conn:
+                return operation(conn)
+        except sqlite3.OperationalError as e:
+            if not _verrou_occupe(e) or tentative == TENTATIVES_ECRITURE - 1:
+                raise
+            print(f"[DB] Base verrouillee, nouvelle tentative dans {delai * 1000:.0f} ms")
+        time.sleep(delai * (1 + random.random()))
+        delai *= 2
+
+
+def _executer_lot(operations):
+    """
+    Execute un lot d'ecritures de la file dans une seule transaction.
 
+    Chaque operation a son propre SAVEPOINT : une erreur (contact inexistant,
+    conflit de version...) n'annule qu'elle et est rendue a son appelant.
+    Retourne la liste des couples (resultat, exception).
+    """
+    def executer(conn):
+        resultats = []
+        for operation in operations:
+            try:
+                with transaction() as conn_operation:
+                    resultats.append((operation(conn_operation), None))
+            except Exception as e:
+                resultats.append((None, e))
+        return resultats
+
+    return _avec_reprises(executer)
+
+
+# File de group commit partagee par les threads du processus
+_file_ecriture = WriteQueue(
+    _executer_lot,
+    delai_max_ms=Config.WRITE_QUEUE_MAX_DELAY_MS,
+    taille_lot_max=Config.WRITE_QUEUE_MAX_BATCH,
+)
+
+
+def _ecrire(operation):
+    """
+    Execute operation(conn) dans une transaction d'ecriture et retourne son
+    resultat (ou leve son exception).
+
+    Passe par la file de group commit si elle est activee, sauf si le thread
+    est deja dans une transaction : l'operation doit alors en faire partie.
+    Le retour n'a lieu qu'apres le COMMIT du lot qui contient l'operation.
+
+    Les requetes SQL de l'operation, executees par le thread de la file, sont
+    comptees pour la requete HTTP qui l'a soumise ; le BEGIN, les SAVEPOINT
+    et le COMMIT du lot, partages, ne sont attribues a aucune.
+    """
+    get_connection()
+    if not Config.WRITE_QUEUE_ENABLED or _local.profondeur > 0:
+        return _avec_reprises(operation)
+    if not metrics.ACTIVE:
+        return _file_ecriture.soumettre(operation)
+
+    executees = [0]
+
+    def operation_mesuree(conn):
+        avant = metrics.sql_thread()
+        try:
+            return operation(conn)
+        finally:
+            executees[0] += metrics.sql_thread() - avant
+
+    try:
+        return _file_ecriture.soumettre(operation_mesuree)
+    finally:
+        metrics.attribuer_sql(executees[0])
+
+
+def _migration_notes(cursor):
+    """
+    Deplace les notes de la colonne JSON contacts.notes vers la table notes.
+
+    La colonne contacts.notes est conservee (vide) pour compatibilite mais
+    n'est plus lue ni ecrite.
+    """
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS contacts (
+        CREATE TABLE IF NOT EXISTS notes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            prenom TEXT DEFAULT '',
-            categorie TEXT DEFAULT 'autre',
-            informations TEXT DEFAULT '{}',
-            notes TEXT DEFAULT '[]',
-            date_creation TEXT NOT NULL,
-            date_modification TEXT NOT NULL
+            contact_id INTEGER NOT NULL
+                REFERENCES contacts(id) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            contenu TEXT NOT NULL
         )
     """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notes_contact_date
+        ON notes(contact_id, date)
+    """)
 
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_contacts_nom
-        ON contacts(nom)
+        INSERT INTO notes (contact_id, date, contenu)
+        SELECT c.id,
+               COALESCE(json_extract(n.value, '$.date'), c.date_modification),
+               COALESCE(json_extract(n.value, '$.contenu'), '')
+        FROM contacts c, json_each(c.notes) n
+        WHERE c.notes NOT IN ('', '[]')
+        ORDER BY c.id, n.key
     """)
+    migrees = cursor.rowcount
+    cursor.execute("UPDATE contacts SET notes = '[]' WHERE notes != '[]'")
+
+    # Ajouter une note met a jour la date de modification du contact
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_contacts_categorie
-        ON contacts(categorie)
+        CREATE TRIGGER IF NOT EXISTS trg_notes_insert
+        AFTER INSERT ON notes
+        BEGIN
+            UPDATE contacts SET date_modification = NEW.date
+            WHERE id = NEW.contact_id;
+        END
     """)
 
-    conn.commit()
-    conn.close()
+    if migrees > 0:
+        print(f"[DB] Migration : {migrees} note(s) deplacee(s) vers la table notes")
+
+
+# Texte indexe pour un contact : valeurs scalaires des informations (sans les
+# cles) et contenu des notes. Utilise par la migration et par les triggers.
+_FTS_INFORMATIONS_SQL = """
+    (SELECT COALESCE(group_concat(value, ' '), '') FROM json_tree({infos})
+     WHERE type IN ('text', 'integer', 'real'))
+"""
+_FTS_NOTES_SQL = """
+    (SELECT COALESCE(group_concat(contenu, ' '), '') FROM notes
+     WHERE contact_id = {contact_id})
+"""
+
+# Poids bm25 des colonnes nom, prenom, informations, notes de contacts_fts
+# (notes : vide depuis _migration_notes_fts) ; les notes, indexees dans
+# notes_fts, gardent un poids de 1
+_FTS_POIDS = "10.0, 10.0, 4.0, 1.0"
+
+
+def _migration_recherche_fts(cursor):
+    """
+    Cree l'index plein texte contacts_fts (FTS5) et ses triggers.
+
+    Sans FTS5 (SQLite compile sans), la recherche reste en LIKE.
+    """
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+                nom, prenom, informations, notes,
+                tokenize = "unicode61 remove_diacritics 2",
+                prefix = '2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"[DB] FTS5 indisponible ({e}) : recherche en LIKE")
+        return
+
+    infos_new = _FTS_INFORMATIONS_SQL.format(infos="NEW.informations")
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_contacts_fts_insert
+        AFTER INSERT ON contacts
+        BEGIN
+            INSERT INTO contacts_fts (rowid, nom, prenom, informations, notes)
+            VALUES (NEW.id, NEW.nom, NEW.prenom, {infos_new}, '');
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_contacts_fts_update
+        AFTER UPDATE OF nom, prenom, informations ON contacts
+        BEGIN
+            UPDATE contacts_fts
+            SET nom = NEW.nom, prenom = NEW.prenom, informations = {infos_new}
+            WHERE rowid = NEW.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_contacts_fts_delete
+        AFTER DELETE ON contacts
+        BEGIN
+            DELETE FROM contacts_fts WHERE rowid = OLD.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_fts_insert
+        AFTER INSERT ON notes
+        BEGIN
+            UPDATE contacts_fts SET notes = notes || ' ' || NEW.contenu
+            WHERE rowid = NEW.contact_id;
+        END
+    """)
+    # Pas de reindexation quand les notes partent avec leur contact (cascade)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_fts_delete
+        AFTER DELETE ON notes
+        WHEN EXISTS (SELECT 1 FROM contacts WHERE id = OLD.contact_id)
+        BEGIN
+            UPDATE contacts_fts
+            SET notes = {_FTS_NOTES_SQL.format(contact_id="OLD.contact_id")}
+            WHERE rowid = OLD.contact_id;
+        END
+    """)
+
+    cursor.execute(f"""
+        INSERT INTO contacts_fts (rowid, nom, prenom, informations, notes)
+        SELECT c.id, c.nom, c.prenom,
+               {_FTS_INFORMATIONS_SQL.format(infos="c.informations")},
+               {_FTS_NOTES_SQL.format(contact_id="c.id")}
+        FROM contacts c
+    """)
+
+
+def _migration_index_pagination(cursor):
+    """Index (nom, prenom, id) pour la pagination par curseur."""
+    cursor.execute("DROP INDEX IF EXISTS idx_contacts_nom")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contacts_nom_prenom
+        ON contacts(nom, prenom, id)
+    """)
+
+
+def _migration_index_date_modification(cursor):
+    """Index sur date_modification pour les exports incrementaux (since=)."""
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contacts_date_modification
+        ON contacts(date_modification)
+    """)
+
+
+def _migration_profil_master(cursor):
+    """
+    Table profil_master (une ligne au plus) pour retrouver le profil master
+    par cle primaire au lieu d'un LIKE sur toute la table contacts.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS profil_master (
+            contact_id INTEGER PRIMARY KEY
+                REFERENCES contacts(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO profil_master (contact_id)
+        SELECT MIN(id) FROM contacts
+        WHERE json_extract(informations, '$.type') = 'profil_master'
+        HAVING MIN(id) IS NOT NULL
+    """)
+
+
+def _migration_version(cursor):
+    """
+    Colonne version, incrementee a chaque modification du contact (y compris
+    l'ajout d'une note). Sert d'ETag et de controle de concurrence optimiste.
+    """
+    cursor.execute(
+        "ALTER TABLE contacts ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+    )
+    cursor.execute("DROP TRIGGER IF EXISTS trg_notes_insert")
+    cursor.execute("""
+        CREATE TRIGGER trg_notes_insert
+        AFTER INSERT ON notes
+        BEGIN
+            UPDATE contacts
+            SET date_modification = NEW.date, version = version + 1
+            WHERE id = NEW.contact_id;
+        END
+    """)
+
+
+def _migration_compteur_modifications(cursor):
+    """
+    Table 'modifications' : un compteur global incremente par trigger a chaque
+    ecriture sur contacts, notes et profil_master.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS modifications (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            compteur INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO modifications (id, compteur) VALUES (1, 0)")
+    for table in ("contacts", "notes", "profil_master"):
+        for evenement in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_modif_{evenement.lower()}
+                AFTER {evenement} ON {table}
+                BEGIN
+                    UPDATE modifications SET compteur = compteur + 1 WHERE id = 1;
+                END
+            """)
+
+
+# Colonnes dont la modification fait avancer contacts.seq (toutes sauf seq,
+# que le trigger met lui-meme a jour) : a completer si une colonne est ajoutee
+_COLONNES_SEQ = "nom, prenom, categorie, informations, notes, " \
+                "date_creation, date_modification, version"
+
+
+def _migration_sequence_modifications(cursor):
+    """
+    Synchronisation incrementale : colonne contacts.seq et table des
+    contacts supprimes (tombstones).
+
+    seq recoit la valeur du compteur de modifications a chaque ecriture du
+    contact ; une suppression laisse une ligne dans contacts_supprimes. Un
+    client qui connait le compteur N n'a qu'a lire seq > N des deux cotes.
+    """
+    for evenement in ("insert", "update", "delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_contacts_modif_{evenement}")
+
+    cursor.execute(
+        "ALTER TABLE contacts ADD COLUMN seq INTEGER NOT NULL DEFAULT 0"
+    )
+    # Contacts existants : seq distincts (la pagination de get_changes coupe
+    # entre deux seq) et > 0, le compteur repart au-dela
+    cursor.execute("UPDATE contacts SET seq = id")
+    cursor.execute("""
+        UPDATE modifications
+        SET compteur = MAX(compteur, (SELECT COALESCE(MAX(id), 0) FROM contacts)) + 1
+        WHERE id = 1
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_seq ON contacts(seq)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contacts_supprimes (
+            id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            date_suppression TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contacts_supprimes_seq
+        ON contacts_supprimes(seq)
+    """)
+
+    marquer = """
+        UPDATE modifications SET compteur = compteur + 1 WHERE id = 1;
+        UPDATE contacts SET seq = (SELECT compteur FROM modifications WHERE id = 1)
+        WHERE id = NEW.id;
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER trg_contacts_modif_insert
+        AFTER INSERT ON contacts
+        BEGIN {marquer} END
+    """)
+    # Limite aux colonnes de _COLONNES_SEQ : l'UPDATE de seq ne se redeclenche pas
+    cursor.execute(f"""
+        CREATE TRIGGER trg_contacts_modif_update
+        AFTER UPDATE OF {_COLONNES_SEQ} ON contacts
+        BEGIN {marquer} END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_contacts_modif_delete
+        AFTER DELETE ON contacts
+        BEGIN
+            UPDATE modifications SET compteur = compteur + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO contacts_supprimes (id, seq, date_suppression)
+            VALUES (
+                OLD.id,
+                (SELECT compteur FROM modifications WHERE id = 1),
+                strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+            );
+        END
+    """)
+
+
+def _migration_notes_fts(cursor):
+    """
+    Indexe les notes dans leur propre table FTS5 (notes_fts : une ligne par
+    note, contenu externe lu dans la table notes).
+
+    La colonne notes de contacts_fts concatenait toutes les notes du contact :
+    chaque ajout reindexait tout son historique, sous le verrou d'ecriture.
+    Elle est videe et n'est plus alimentee.
+    """
+    cursor.execute("DROP TRIGGER IF EXISTS trg_notes_fts_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_notes_fts_delete")
+    existe = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'"
+    ).fetchone()
+    if existe is None:
+        # FTS5 indisponible : recherche en LIKE
+        return
+    cursor.execute("UPDATE contacts_fts SET notes = '' WHERE notes != ''")
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            contenu,
+            content = 'notes', content_rowid = 'id',
+            tokenize = "unicode61 remove_diacritics 2",
+            prefix = '2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_fts_insert
+        AFTER INSERT ON notes
+        BEGIN
+            INSERT INTO notes_fts (rowid, contenu) VALUES (NEW.id, NEW.contenu);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_fts_delete
+        AFTER DELETE ON notes
+        BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, contenu)
+            VALUES ('delete', OLD.id, OLD.contenu);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_notes_fts_update
+        AFTER UPDATE OF contenu ON notes
+        BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, contenu)
+            VALUES ('delete', OLD.id, OLD.contenu);
+            INSERT INTO notes_fts (rowid, contenu) VALUES (NEW.id, NEW.contenu);
+        END
+    """)
+    cursor.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+
+# Migrations appliquees dans l'ordre ; PRAGMA user_version = nombre appliquees
+_MIGRATIONS = [
+    _migration_notes,
+    _migration_recherche_fts,
+    _migration_index_pagination,
+    _migration_index_date_modification,
+    _migration_profil_master,
+    _migration_version,
+    _migration_compteur_modifications,
+    _migration_sequence_modifications,
+    _migration_notes_fts,
+]
+
+
+def _expression_information(cle, colonne="informations"):
+    """
+    Expression SQL de la valeur d'une cle de 'informations' (cle validee).
+
+    Les index n'acceptent que la colonne non qualifiee ; les requetes qui
+    joignent contacts_fts doivent la qualifier (contacts.informations).
+    """
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", cle):
+        raise ValueError(f"Cle d'information invalide : '{cle}'")
+    return f"json_extract({colonne}, '$.{cle}')"
+
+
+def _synchroniser_index_informations(cursor):
+    """
+    Cree un index d'expression par cle de Config.CHAMPS_INFORMATIONS_INDEXES
+    (et supprime ceux des cles retirees de la config).
+    """
+    cles = Config.CHAMPS_INFORMATIONS_INDEXES
+    existants = {
+        row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_info_%'"
+        )
+    }
+    voulus = {f"idx_info_{cle}": cle for cle in cles}
+
+    for nom in existants - set(voulus):
+        cursor.execute(f"DROP INDEX {nom}")
+    for nom, cle in voulus.items():
+        if nom not in existants:
+            cursor.execute(
+                f"CREATE INDEX {nom} ON contacts({_expression_information(cle)} COLLATE NOCASE)"
+            )
+
+
+def init_db():
+    """Initialise la base de donnees (table 'contacts' puis migrations)."""
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nom TEXT NOT NULL,
+                prenom TEXT DEFAULT '',
+                categorie TEXT DEFAULT 'autre',
+                informations TEXT DEFAULT '{}',
+                notes TEXT DEFAULT '[]',
+                date_creation TEXT NOT NULL,
+                date_modification TEXT NOT NULL
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_contacts_categorie
+            ON contacts(categorie)
+        """)
+
+        # Lue dans la transaction : deux workers ne migrent pas en meme temps
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for numero, migration in enumerate(_MIGRATIONS[version:], start=version + 1):
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {numero}")
+
+        _synchroniser_index_informations(cursor)
+
     print(f"[DB] Base de donnees initialisee : {_get_db_path()}")
 
 
@@ -71,55 +727,229 @@ def create_contact(nom, prenom="", categorie="autre", informations=None):
 
     maintenant = datetime.now().isoformat()
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO contacts (nom, prenom, categorie, informations, notes,
-                              date_creation, date_modification)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
+    valeurs = (
         nom,
         prenom,
         categorie.lower(),
         json.dumps(informations, ensure_ascii=False),
-        json.dumps([]),
         maintenant,
         maintenant
-    ))
+    )
+
+    def inserer(conn):
+        cursor = conn.execute("""
+            INSERT INTO contacts (nom, prenom, categorie, informations,
+                                  date_creation, date_modification)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, valeurs)
+        return cursor.lastrowid
 
-    contact_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    contact_id = _ecrire(inserer)
+    contact = get_contact(contact_id)
 
     print(f"[DB] Contact cree : {prenom} {nom} (ID: {contact_id})")
-    return get_contact(contact_id)
+    return contact
+
+
+def set_master_profile(contact_id):
+    """Designe le contact comme profil master (remplace le precedent)."""
+    def designer(conn):
+        conn.execute("DELETE FROM profil_master")
+        conn.execute(
+            "INSERT INTO profil_master (contact_id) VALUES (?)", (contact_id,)
+        )
 
+    _ecrire(designer)
+    _cache_master["jeton"] = None
 
-def get_contact(contact_id):
-    """Recupere un contact par son ID."""
+
+def _charger_master():
+    """Met a jour le cache du profil master si une ecriture a eu lieu."""
     conn = get_connection()
-    cursor = conn.cursor()
+    jeton = compteur_modifications()
+    if _cache_master["jeton"] == jeton and not conn.in_transaction:
+        return _cache_master
 
-    cursor.execute("SELECT * FROM contacts WHERE id = ?", (contact_id,))
-    row = cursor.fetchone()
-    conn.close()
+    row = conn.execute("SELECT contact_id FROM profil_master LIMIT 1").fetchone()
+    master_id = row["contact_id"] if row else None
+    etat = {
+        "jeton": jeton,
+        "id": master_id,
+        "profil": get_contact(master_id) if master_id else None,
+    }
+    # Dans une transaction, l'etat lu peut ne jamais etre commite
+    if not conn.in_transaction:
+        _cache_master.update(etat)
+    return etat
 
-    if row is None:
-        return None
 
-    return _row_to_dict(row)
+def get_master_profile_id():
+    """ID du profil master, ou None s'il n'existe pas encore."""
+    return _charger_master()["id"]
 
 
-def update_contact(contact_id, **kwargs):
-    """Met a jour un contact existant."""
-    contact = get_contact(contact_id)
+def get_master_profile():
+    """
+    Profil master (contact complet), ou None.
+
+    Le dictionnaire retourne est partage par le cache : ne pas le modifier.
+    """
+    return _charger_master()["profil"]
+
+
+def create_contacts_bulk(contacts, taille_lot=TAILLE_LOT_IMPORT):
+    """
+    Cree plusieurs contacts d'un coup (import d'un carnet d'adresses).
+
+    Tous les elements sont d'abord valides avec valider_contact() ; les
+    elements invalides sont ignores et signales. Les contacts valides sont
+    ensuite inseres par lots (executemany), une transaction par lot.
+
+    Retourne {"ids": [...], "erreurs": [{"index": i, "erreur": "..."}]},
+    ou index est la position de l'element dans la liste recue.
+    """
+    ids = []
+    erreurs = []
+    valides = []
+    maintenant = datetime.now().isoformat()
+
+    def executer(conn, lot):
+        conn.executemany("""
+            INSERT INTO contacts (nom, prenom, categorie, informations,
+                                  date_creation, date_modification)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [valeurs for _, valeurs in lot])
+        # Sous le verrou d'ecriture, les ids AUTOINCREMENT du lot se suivent
+        return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def inserer(lot):
+        # Hors file de group commit : un lot d'import est deja une transaction
+        try:
+            dernier = _avec_reprises(lambda conn: executer(conn, lot))
+        except sqlite3.Error as e:
+            erreurs.extend(
+                {"index": index, "erreur": f"Erreur base de donnees : {e}"}
+                for index, _ in lot
+            )
+            return
+        ids.extend(range(dernier - len(lot) + 1, dernier + 1))
+
+    for index, item in enumerate(contacts):
+        if not isinstance(item, dict):
+            erreurs.append({"index": index, "erreur": "Chaque contact doit etre un objet JSON."})
+            continue
+        try:
+            valide = valider_contact(
+                nom=item.get("nom", ""),
+                prenom=item.get("prenom", ""),
+                categorie=item.get("categorie", "autre"),
+                informations=item.get("informations")
+            )
+        except ValidationError as e:
+            erreurs.append({"index": index, "erreur": str(e)})
+            continue
+
+        valides.append((index, (
+            valide["nom"],
+            valide["prenom"],
+            valide["categorie"],
+            json.dumps(valide["informations"], ensure_ascii=False),
+            maintenant,
+            maintenant
+        )))
+
+    # Validation terminee avant la premiere ecriture : un element invalide
+    # n'interrompt pas un import dont des lots seraient deja commites
+    for debut in range(0, len(valides), taille_lot):
+        inserer(valides[debut:debut + taille_lot])
+    erreurs.sort(key=lambda erreur: erreur["index"])
+
+    print(f"[DB] Import en lot : {len(ids)} contact(s) cree(s), {len(erreurs)} erreur(s)")
+    return {"ids": ids, "erreurs": erreurs}
+
+
+def _taille_contact(contact):
+    """Estimation grossiere de la memoire occupee par un contact decode."""
     if contact is None:
+        return 64
+    brut = contact.json_brut("informations") or ""
+    taille = 512 + 4 * len(brut) + len(contact["nom"]) + len(contact["prenom"] or "")
+    for note in contact["notes"]:
+        taille += 160 + len(note["contenu"])
+    return taille
+
+
+def _lire_contact(conn, contact_id, notes_limit):
+    """Lit un contact et ses notes dans la base (sans cache)."""
+    row = conn.execute(
+        "SELECT * FROM contacts WHERE id = ?", (contact_id,)
+    ).fetchone()
+
+    if row is None:
         return None
 
+    return _row_to_dict(row, get_notes(contact_id, limit=notes_limit))
+
+
+def get_contact(contact_id, notes_limit=None):
+    """
+    Recupere un contact par son ID.
+
+    notes_limit : ne charge que les N notes les plus recentes (toutes par defaut).
+
+    Hors transaction, le contact est servi par le cache du processus tant
+    qu'aucune ecriture n'a ete commitee : le dictionnaire retourne peut etre
+    partage, ne pas le modifier.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    if conn.in_transaction:
+        # Peut voir des ecritures non commitees : ni lecture ni remplissage du cache
+        return _lire_contact(conn, contact_id, notes_limit)
+
+    cle = (contact_id, notes_limit)
+    trouve, contact = _cache_contacts.lire(cle, compteur_modifications())
+    if trouve:
+        return contact
+
+    # Compteur et contact lus dans le meme instantane
+    with transaction():
+        jeton = compteur_modifications()
+        contact = _lire_contact(conn, contact_id, notes_limit)
+    _cache_contacts.ecrire(cle, contact, _taille_contact(contact), jeton)
+    return contact
+
+
+def get_contact_validateurs(contact_id):
+    """
+    Version et date de modification d'un contact (ETag / Last-Modified),
+    sans charger ses informations ni ses notes. None s'il n'existe pas.
+    """
+    row = get_connection().execute(
+        "SELECT id, version, date_modification FROM contacts WHERE id = ?",
+        (contact_id,)
+    ).fetchone()
+    return dict(row) if row is not None else None
+
+
+def stats_cache():
+    """Compteurs des caches de contacts du processus (hits, misses, taille)."""
+    return {"pid": os.getpid(), "contacts": _cache_contacts.stats()}
+
+
+def update_contact(contact_id, version_attendue=None, **kwargs):
+    """
+    Met a jour un contact existant en une seule requete UPDATE.
 
+    'informations' est fusionne dans SQLite cle par cle avec json_set, comme
+    un dict.update() : chaque cle envoyee remplace entierement la valeur
+    existante (objets imbriques compris, null est enregistre tel quel), les
+    autres cles sont conservees. Deux mises a jour concurrentes ne perdent
+    donc pas leurs cles respectives.
+
+    version_attendue : si fournie, la mise a jour n'a lieu que si le contact
+    est toujours a cette version (sinon ConflitVersion est levee).
+    Retourne le contact mis a jour, ou None s'il n'existe pas.
+    """
     champs_autorises = ["nom", "prenom", "categorie", "informations"]
     updates = []
     values = []
@@ -127,137 +957,767 @@ def update_contact(contact_id, **kwargs):
     for champ, valeur in kwargs.items():
         if champ in champs_autorises:
             if champ == "informations":
-                infos_existantes = contact["informations"]
-                if isinstance(valeur, dict):
-                    infos_existantes.update(valeur)
-                    valeur = json.dumps(infos_existantes, ensure_ascii=False)
-                else:
-                    valeur = json.dumps(valeur, ensure_ascii=False)
-            elif champ == "categorie":
+                if not isinstance(valeur, dict):
+                    updates.append("informations = ?")
+                    values.append(json.dumps(valeur, ensure_ascii=False))
+                elif valeur:
+                    chemins = ", ".join(["?, json(?)"] * len(valeur))
+                    updates.append(
+                        f"informations = json_set(COALESCE(informations, '{{}}'), {chemins})"
+                    )
+                    for cle, contenu in valeur.items():
+                        if '"' in cle:
+                            raise ValidationError(
+                                f"Cle d'information invalide : '{cle}' (guillemet)."
+                            )
+                        values.extend([f'$."{cle}"', json.dumps(contenu, ensure_ascii=False)])
+                continue
+            if champ == "categorie":
                 valeur = valeur.lower()
             updates.append(f"{champ} = ?")
             values.append(valeur)
 
     if not updates:
-        conn.close()
+        contact = get_contact(contact_id)
+        if contact is not None and version_attendue is not None \
+                and contact["version"] != version_attendue:
+            raise ConflitVersion(contact["version"])
         return contact
 
     updates.append("date_modification = ?")
     values.append(datetime.now().isoformat())
+    updates.append("version = version + 1")
 
+    query = f"UPDATE contacts SET {', '.join(updates)} WHERE id = ?"
     values.append(contact_id)
+    if version_attendue is not None:
+        query += " AND version = ?"
+        values.append(version_attendue)
+    query += " RETURNING *"
 
-    query = f"UPDATE contacts SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, values)
-    conn.commit()
-    conn.close()
+    def modifier(conn):
+        row = conn.execute(query, values).fetchone()
+        if row is None:
+            existant = conn.execute(
+                "SELECT version FROM contacts WHERE id = ?", (contact_id,)
+            ).fetchone()
+            if existant is None:
+                return None
+            raise ConflitVersion(existant["version"])
+        return row
+
+    row = _ecrire(modifier)
+    if row is None:
+        return None
+    contact = _row_to_dict(row, get_notes(contact_id))
 
     print(f"[DB] Contact mis a jour (ID: {contact_id})")
-    return get_contact(contact_id)
+    return contact
 
 
 def delete_contact(contact_id):
     """Supprime un contact par son ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    def supprimer(conn):
+        cursor = conn.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+        return cursor.rowcount > 0
 
-    cursor.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
-    supprime = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    supprime = _ecrire(supprimer)
 
     if supprime:
         print(f"[DB] Contact supprime (ID: {contact_id})")
     return supprime
 
 
-def search_contacts(query=None, categorie=None):
-    """Recherche des contacts par nom/prenom et/ou categorie."""
+def _fts_disponible(conn):
+    """Indique si l'index contacts_fts existe (resultat positif memorise)."""
+    if getattr(_local, "fts_conn", None) is conn:
+        return True
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'"
+    ).fetchone()
+    if row is not None:
+        _local.fts_conn = conn
+    return row is not None
+
+
+def _mots_fts(texte):
+    """
+    Transforme une saisie libre en termes FTS5.
+
+    Chaque mot devient un prefixe ("dup" trouve "Dupont"). Les accents et la
+    casse sont ignores par le tokenizer.
+    """
+    return [f'"{mot}"*' for mot in re.findall(r"\w+", texte)]
+
+
+def _pertinence_sql(termes, tous_requis):
+    """
+    Sous-requete (id, score) des contacts qui correspondent aux termes FTS5.
+
+    Score bm25 (plus petit = plus pertinent) : celui de la fiche
+    (contacts_fts) plus celui de la meilleure note (notes_fts).
+    tous_requis : chaque terme doit se trouver dans la fiche ou dans une
+    note du contact ; sinon un seul suffit. Retourne (sql, parametres).
+    """
+    un_terme = " OR ".join(termes)
+    # MATERIALIZED : bm25() doit etre evalue dans la requete FTS elle-meme,
+    # pas dans l'agregat ou l'union qui l'englobe
+    sql = f"""
+        WITH fiches AS MATERIALIZED (
+            SELECT rowid AS id, bm25(contacts_fts, {_FTS_POIDS}) AS score
+            FROM contacts_fts WHERE contacts_fts MATCH ?
+        ), notes_trouvees AS MATERIALIZED (
+            SELECT notes.contact_id AS id, bm25(notes_fts) AS score
+            FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+            WHERE notes_fts MATCH ?
+        )
+        SELECT id, SUM(score) AS score FROM (
+            SELECT id, score FROM fiches
+            UNION ALL
+            SELECT id, MIN(score) FROM notes_trouvees GROUP BY id
+        )
+        GROUP BY id
+    """
+    parametres = [un_terme, un_terme]
+    if tous_requis and len(termes) > 1:
+        sql += " HAVING " + " AND ".join("""id IN (
+            SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?
+            UNION
+            SELECT notes.contact_id FROM notes_fts
+            JOIN notes ON notes.id = notes_fts.rowid
+            WHERE notes_fts MATCH ?
+        )""" for _ in termes)
+        for terme in termes:
+            parametres.extend([terme, terme])
+    return sql, parametres
+
+
+# Mots trop frequents pour classer des contacts (compares sans accents)
+MOTS_VIDES = frozenset("""
+    au aux avec ce ces cet cette comment combien dans de des doit dois dont du
+    elle elles en est et etre faire fait faut il ils je la le les leur leurs lui
+    ma me mes moi mon ne nos notre nous on ou par pas peut peux plus pour pourquoi
+    qu quand que quel quelle quelles quels qui quoi sa sans se ses son sont sur
+    ta te tes ton tous tout toute toutes tu un une vos votre vous
+""".split())
+
+
+def _mots_fts_pertinence(texte):
+    """
+    Termes FTS5 pour classer des contacts selon une question libre.
+
+    Mots vides retires, un seul mot suffit (OR) et bm25 favorise les contacts
+    qui en contiennent le plus. Les mots longs sont tronques a 6 lettres pour
+    tenir lieu de racine ("relancer" trouve aussi "relance").
+    """
+    mots = []
+    for mot in re.findall(r"\w+", texte.lower()):
+        mot = unicodedata.normalize("NFKD", mot).encode("ascii", "ignore").decode()
+        if len(mot) >= 2 and mot not in MOTS_VIDES:
+            mots.append(mot[:6])
+    return [f'"{mot}"*' for mot in dict.fromkeys(mots)]
+
+
+def _encoder_curseur(valeurs):
+    """Encode la position de la derniere ligne d'une page en curseur opaque."""
+    brut = json.dumps(valeurs, ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(brut).decode("ascii")
+
+
+def _decoder_curseur(curseur):
+    """Decode un curseur ; leve ValueError s'il est invalide."""
+    try:
+        valeurs = json.loads(base64.urlsafe_b64decode(curseur.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Curseur invalide.") from e
+    if not isinstance(valeurs, list) or not valeurs:
+        raise ValueError("Curseur invalide.")
+    return valeurs
+
+
+def _valider_champs(fields):
+    """Retourne la liste des champs demandes (tous par defaut)."""
+    if not fields:
+        return list(CHAMPS_CONTACT)
+    inconnus = [f for f in fields if f not in CHAMPS_CONTACT]
+    if inconnus:
+        raise ValueError(
+            f"Champ(s) inconnu(s) : {', '.join(inconnus)}. "
+            f"Champs disponibles : {', '.join(CHAMPS_CONTACT)}"
+        )
+    return [c for c in CHAMPS_CONTACT if c in fields or c == "id"]
+
+
+def list_contacts(query=None, categorie=None, limit=None, cursor=None, fields=None,
+                  filtres=None):
+    """
+    Liste des contacts, avec recherche, pagination et projection.
+
+    - query / categorie / filtres : memes filtres que search_contacts()
+    - limit / cursor : pagination par curseur (keyset) ; l'ordre est
+      (nom, prenom, id), ou (pertinence, id) pour une recherche texte
+    - fields : liste des champs a retourner ; sans 'notes', la table des
+      notes n'est pas lue
+
+    Retourne (contacts, next_cursor) ; next_cursor vaut None en fin de liste.
+    Leve ValueError si le curseur, la limite ou un champ est invalide.
+    """
+    champs = _valider_champs(fields)
+    if limit is not None and not 1 <= limit <= LIMITE_PAGE_MAX:
+        raise ValueError(f"La limite doit etre comprise entre 1 et {LIMITE_PAGE_MAX}.")
+
     conn = get_connection()
-    cursor = conn.cursor()
+
+    colonnes = [c for c in champs if c != "notes"]
+    for colonne in ("nom", "prenom"):
+        if colonne not in colonnes:
+            colonnes.append(colonne)
+    select = ", ".join(f"contacts.{c}" for c in colonnes)
 
     conditions = []
     values = []
+    sql = f"SELECT {select} FROM contacts"
 
-    if query:
-        conditions.append(
-            "(nom LIKE ? OR prenom LIKE ? OR informations LIKE ?)"
-        )
-        motif = f"%{query}%"
-        values.extend([motif, motif, motif])
+    termes = _mots_fts(query) if query else []
+    par_pertinence = bool(termes) and _fts_disponible(conn)
+    if par_pertinence:
+        score = "pertinence.score"
+        pertinence, values = _pertinence_sql(termes, tous_requis=True)
+        sql = (f"SELECT {select}, {score} AS score FROM ({pertinence}) AS pertinence"
+               " JOIN contacts ON contacts.id = pertinence.id")
+        ordre = " ORDER BY score, contacts.id"
+    else:
+        if query:
+            conditions.append(
+                "(nom LIKE ? OR prenom LIKE ? OR informations LIKE ?)"
+            )
+            motif = f"%{query}%"
+            values.extend([motif, motif, motif])
+        ordre = " ORDER BY nom, prenom, contacts.id"
 
     if categorie:
         conditions.append("categorie = ?")
         values.append(categorie.lower())
 
-    sql = "SELECT * FROM contacts"
+    for cle, valeur in (filtres or {}).items():
+        if cle not in Config.CHAMPS_INFORMATIONS_INDEXES:
+            raise ValueError(
+                f"Filtre non disponible : '{cle}'. "
+                f"Filtres disponibles : {', '.join(Config.CHAMPS_INFORMATIONS_INDEXES)}"
+            )
+        # Meme expression et collation que l'index idx_info_<cle>
+        conditions.append(
+            f"{_expression_information(cle, 'contacts.informations')} = ? COLLATE NOCASE"
+        )
+        values.append(valeur)
+
+    if cursor:
+        valeurs = _decoder_curseur(cursor)
+        if par_pertinence and valeurs[0] == "r" and len(valeurs) == 3:
+            conditions.append(f"({score}, contacts.id) > (?, ?)")
+        elif not par_pertinence and valeurs[0] == "n" and len(valeurs) == 4:
+            conditions.append("(nom, prenom, contacts.id) > (?, ?, ?)")
+        else:
+            raise ValueError("Curseur invalide.")
+        values.extend(valeurs[1:])
+
     if conditions:
         sql += " WHERE " + " AND ".join(conditions)
-    sql += " ORDER BY nom, prenom"
+    sql += ordre
+    if limit is not None:
+        # Une ligne de plus pour savoir s'il reste une page
+        sql += " LIMIT ?"
+        values.append(limit + 1)
 
-    cursor.execute(sql, values)
-    rows = cursor.fetchall()
-    conn.close()
+    rows = conn.execute(sql, values).fetchall()
 
-    return [_row_to_dict(row) for row in rows]
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        dernier = rows[-1]
+        if par_pertinence:
+            next_cursor = _encoder_curseur(["r", dernier["score"], dernier["id"]])
+        else:
+            next_cursor = _encoder_curseur(
+                ["n", dernier["nom"], dernier["prenom"], dernier["id"]]
+            )
+
+    notes = None
+    if "notes" in champs:
+        if query or categorie or filtres or limit is not None:
+            notes = _get_notes_par_contact([row["id"] for row in rows])
+        else:
+            notes = _get_notes_par_contact()
+
+    contacts = [
+        _row_to_dict(row, notes.get(row["id"], []) if notes is not None else None, champs)
+        for row in rows
+    ]
+    return contacts, next_cursor
+
+
+def search_contacts(query=None, categorie=None, filtres=None):
+    """
+    Recherche des contacts par texte, categorie et/ou informations.
+
+    Le texte est cherche dans le nom, le prenom, les valeurs des informations
+    et les notes via l'index FTS5, resultats classes par pertinence (bm25).
+    Sans texte, les contacts sont tries par nom puis prenom.
+
+    filtres : {cle: valeur} sur les cles de Config.CHAMPS_INFORMATIONS_INDEXES
+    (egalite insensible a la casse, resolue par index).
+    """
+    contacts, _ = list_contacts(query=query, categorie=categorie, filtres=filtres)
+    return contacts
 
 
 def get_all_contacts():
     """Recupere tous les contacts, tries par nom puis prenom."""
+    contacts, _ = list_contacts()
+    return contacts
+
+
+def ids_contacts_recents(limite):
+    """IDs des contacts modifies le plus recemment (hors profil master)."""
+    rows = get_connection().execute("""
+        SELECT id FROM contacts
+        WHERE id NOT IN (SELECT contact_id FROM profil_master)
+        ORDER BY date_modification DESC, id DESC
+        LIMIT ?
+    """, (limite,)).fetchall()
+    return [row["id"] for row in rows]
+
+
+def _notes_recentes_par_contact(contact_ids, limite):
+    """
+    {contact_id: notes} avec les 'limite' notes les plus recentes de chaque
+    contact, en ordre chronologique (une seule requete).
+    """
+    rows = get_connection().execute(f"""
+        SELECT contact_id, date, contenu FROM (
+            SELECT contact_id, date, contenu, id,
+                   ROW_NUMBER() OVER (PARTITION BY contact_id
+                                      ORDER BY date DESC, id DESC) AS rang
+            FROM notes
+            WHERE contact_id IN ({', '.join('?' * len(contact_ids))})
+        )
+        WHERE rang <= ?
+        ORDER BY contact_id, date, id
+    """, list(contact_ids) + [limite]).fetchall()
+    resultat = {}
+    for row in rows:
+        resultat.setdefault(row["contact_id"], []).append(
+            {"date": row["date"], "contenu": row["contenu"]}
+        )
+    return resultat
+
+
+def contacts_pertinents(texte, limite, notes_limit=None):
+    """
+    Contacts les plus pertinents pour un texte libre (question posee a
+    l'assistant), du plus au moins pertinent, hors profil master.
+
+    Classement bm25 sur le nom, le prenom, les valeurs des informations et
+    les notes ; s'il y a moins de 'limite' resultats, la liste est completee
+    par les contacts modifies le plus recemment. Seuls ces contacts et leurs
+    notes_limit notes les plus recentes sont lus.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
+    termes = _mots_fts_pertinence(texte)
+    ids = []
+    if termes and _fts_disponible(conn):
+        pertinence, parametres = _pertinence_sql(termes, tous_requis=False)
+        rows = conn.execute(f"""
+            SELECT id FROM ({pertinence})
+            WHERE id NOT IN (SELECT contact_id FROM profil_master)
+            ORDER BY score, id
+            LIMIT ?
+        """, parametres + [limite]).fetchall()
+        ids = [row["id"] for row in rows]
+    if len(ids) < limite:
+        deja = set(ids)
+        ids.extend(i for i in ids_contacts_recents(limite) if i not in deja)
+        ids = ids[:limite]
+    if not ids:
+        return []
+
+    rows = conn.execute(
+        f"SELECT * FROM contacts WHERE id IN ({', '.join('?' * len(ids))})", ids
+    ).fetchall()
+    par_id = {row["id"]: row for row in rows}
+    if notes_limit is None:
+        notes = _get_notes_par_contact(ids)
+    else:
+        notes = _notes_recentes_par_contact(ids, notes_limit)
+    return [_row_to_dict(par_id[i], notes.get(i, [])) for i in ids if i in par_id]
+
+
+def ids_contacts_avec_suivi(mots, limite):
+    """
+    IDs des contacts dont une note contient l'un des mots (prefixes), les
+    plus recemment modifies d'abord (hors profil master).
+
+    Sert a reperer les promesses et suivis en attente ("promis", "relancer").
+    """
+    conn = get_connection()
+    if _fts_disponible(conn):
+        requete = " OR ".join(f'"{mot}"*' for mot in mots)
+        rows = conn.execute("""
+            SELECT contacts.id FROM contacts
+            WHERE contacts.id IN (
+                SELECT notes.contact_id FROM notes_fts
+                JOIN notes ON notes.id = notes_fts.rowid
+                WHERE notes_fts MATCH ?
+            )
+              AND contacts.id NOT IN (SELECT contact_id FROM profil_master)
+            ORDER BY contacts.date_modification DESC, contacts.id DESC
+            LIMIT ?
+        """, (requete, limite)).fetchall()
+    else:
+        conditions = " OR ".join("notes.contenu LIKE ?" for _ in mots)
+        rows = conn.execute(f"""
+            SELECT DISTINCT contacts.id, contacts.date_modification FROM notes
+            JOIN contacts ON contacts.id = notes.contact_id
+            WHERE ({conditions})
+              AND contacts.id NOT IN (SELECT contact_id FROM profil_master)
+            ORDER BY contacts.date_modification DESC, contacts.id DESC
+            LIMIT ?
+        """, [f"%{mot}%" for mot in mots] + [limite]).fetchall()
+    return [row["id"] for row in rows]
+
+
+def get_changes(since=0, limit=None):
+    """
+    Changements depuis le jeton 'since' (synchronisation incrementale).
+
+    Le jeton est le compteur de modifications lu lors de la synchronisation
+    precedente (0 : tout recuperer). Retourne :
+    - modifies : contacts crees ou modifies depuis, par ordre de modification
+    - supprimes : ids des contacts supprimes depuis
+    - token : jeton a renvoyer au prochain appel
+    - complet : False si limit a coupe la liste (rappeler avec token)
+    - reinitialise : True si le jeton est inconnu de cette base ; les
+      changements sont alors complets depuis 0 et le client doit oublier
+      ses donnees locales
+
+    Leve ValueError si since ou limit est invalide.
+    """
+    if isinstance(since, str):
+        if not since.isdigit():
+            raise ValueError("Jeton de synchronisation invalide.")
+        since = int(since)
+    if limit is not None and not 1 <= limit <= LIMITE_PAGE_MAX:
+        raise ValueError(f"La limite doit etre comprise entre 1 et {LIMITE_PAGE_MAX}.")
+
+    with transaction() as conn:
+        compteur = compteur_modifications()
+        reinitialise = since > compteur
+        if reinitialise:
+            since = 0
+
+        sql = "SELECT * FROM contacts WHERE seq > ? ORDER BY seq"
+        params = [since]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows = conn.execute(sql, params).fetchall()
+
+        complet = limit is None or len(rows) <= limit
+        if complet:
+            borne = compteur
+        else:
+            rows = rows[:limit]
+            borne = rows[-1]["seq"]
+
+        supprimes = [] if since == 0 else [
+            row["id"] for row in conn.execute(
+                "SELECT id FROM contacts_supprimes WHERE seq > ? AND seq <= ? ORDER BY seq",
+                (since, borne)
+            )
+        ]
+        notes = _get_notes_par_contact([row["id"] for row in rows]) if rows else {}
+
+    return {
+        "modifies": [_row_to_dict(row, notes.get(row["id"], [])) for row in rows],
+        "supprimes": supprimes,
+        "token": str(borne),
+        "complet": complet,
+        "reinitialise": reinitialise,
+    }
 
-    cursor.execute("SELECT * FROM contacts ORDER BY nom, prenom")
-    rows = cursor.fetchall()
-    conn.close()
 
-    return [_row_to_dict(row) for row in rows]
+def iter_contacts_export(since=None):
+    """
+    Parcourt tous les contacts (avec leurs notes) sans les charger en memoire.
+
+    Utilise une connexion dediee et une seule transaction de lecture : les
+    contacts et les notes sont lus par deux curseurs dans le meme ordre de
+    contacts et assembles au fil de l'eau. La memoire reste constante quelle
+    que soit la taille de la table.
+
+    since : ne retourne que les contacts modifies apres cette date ISO, par
+    date de modification croissante (parcours de idx_contacts_date_modification,
+    sans lire le reste de la table) ; sinon les contacts sont tries par id.
+    """
+    conn = _open_connection(_get_db_path())
+    try:
+        conn.execute("BEGIN")
+
+        if since:
+            filtre = " WHERE contacts.date_modification > ?"
+            ordre = "contacts.date_modification, contacts.id"
+            params = (since,)
+        else:
+            filtre = ""
+            ordre = "contacts.id"
+            params = ()
+
+        contacts = conn.execute(
+            f"SELECT * FROM contacts{filtre} ORDER BY {ordre}", params
+        )
+        notes = conn.execute(f"""
+            SELECT notes.contact_id, notes.date, notes.contenu FROM contacts
+            JOIN notes ON notes.contact_id = contacts.id{filtre}
+            ORDER BY {ordre}, notes.date, notes.id
+        """, params)
+
+        # Meme instantane et meme ordre : les notes du contact courant sont
+        # toujours les suivantes du second curseur
+        note = notes.fetchone()
+        for row in contacts:
+            notes_contact = []
+            while note is not None and note["contact_id"] == row["id"]:
+                notes_contact.append({"date": note["date"], "contenu": note["contenu"]})
+                note = notes.fetchone()
+            yield _row_to_dict(row, notes_contact)
+    finally:
+        conn.close()
 
 
 def add_note(contact_id, contenu):
-    """Ajoute une note chronologique a un contact."""
-    contact = get_contact(contact_id)
-    if contact is None:
-        return None
+    """
+    Ajoute une note chronologique a un contact.
 
-    notes = contact["notes"]
-    notes.append({
-        "date": datetime.now().isoformat(),
-        "contenu": contenu
-    })
+    Un simple INSERT dans la table notes ; le trigger trg_notes_insert met a
+    jour la date de modification du contact.
+    """
+    valeurs = (contact_id, datetime.now().isoformat(), contenu)
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    def inserer(conn):
+        conn.execute(
+            "INSERT INTO notes (contact_id, date, contenu) VALUES (?, ?, ?)",
+            valeurs
+        )
 
-    cursor.execute("""
-        UPDATE contacts
-        SET notes = ?, date_modification = ?
-        WHERE id = ?
-    """, (
-        json.dumps(notes, ensure_ascii=False),
-        datetime.now().isoformat(),
-        contact_id
-    ))
-
-    conn.commit()
-    conn.close()
+    try:
+        _ecrire(inserer)
+    except sqlite3.IntegrityError:
+        # Cle etrangere : le contact n'existe pas
+        return None
 
     print(f"[DB] Note ajoutee au contact (ID: {contact_id})")
     return get_contact(contact_id)
 
 
-def _row_to_dict(row):
-    """Convertit une ligne SQLite en dictionnaire Python."""
-    return {
-        "id": row["id"],
-        "nom": row["nom"],
-        "prenom": row["prenom"],
-        "categorie": row["categorie"],
-        "informations": json.loads(row["informations"]),
-        "notes": json.loads(row["notes"]),
-        "date_creation": row["date_creation"],
-        "date_modification": row["date_modification"]
-    }
+def get_notes(contact_id, limit=None):
+    """
+    Retourne les notes d'un contact en ordre chronologique.
+
+    limit : ne retourne que les N plus recentes.
+    """
+    conn = get_connection()
+    if limit is None:
+        rows = conn.execute("""
+            SELECT date, contenu FROM notes
+            WHERE contact_id = ?
+            ORDER BY date, id
+        """, (contact_id,)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT date, contenu FROM notes
+            WHERE contact_id = ?
+            ORDER BY date DESC, id DESC
+            LIMIT ?
+        """, (contact_id, limit)).fetchall()
+        rows.reverse()
+
+    return [{"date": row["date"], "contenu": row["contenu"]} for row in rows]
+
+
+def get_notes_promesses(contact_id, mots, limit=None):
+    """
+    Notes d'un contact qui contiennent l'un des mots (insensible a la casse
+    ASCII), les plus recentes d'abord, dans tout l'historique.
+
+    Lit les notes du contact par l'index (contact_id, date), sans les
+    charger cote Python.
+    """
+    conditions = " OR ".join("contenu LIKE ?" for _ in mots)
+    sql = f"""
+        SELECT date, contenu FROM notes
+        WHERE contact_id = ? AND ({conditions})
+        ORDER BY date DESC, id DESC
+    """
+    params = [contact_id] + [f"%{mot}%" for mot in mots]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    rows = get_connection().execute(sql, params).fetchall()
+    return [{"date": row["date"], "contenu": row["contenu"]} for row in rows]
+
+
+def _get_notes_par_contact(contact_ids=None):
+    """
+    Charge en une passe les notes de plusieurs contacts.
+
+    Retourne {contact_id: [notes...]} ; tous les contacts si contact_ids est None.
+    """
+    conn = get_connection()
+    resultat = {}
+
+    if contact_ids is None:
+        lots = [None]
+    else:
+        # Reste sous la limite de parametres SQLite
+        lots = [contact_ids[i:i + 500] for i in range(0, len(contact_ids), 500)]
+
+    for lot in lots:
+        sql = "SELECT contact_id, date, contenu FROM notes"
+        params = []
+        if lot is not None:
+            sql += f" WHERE contact_id IN ({', '.join('?' * len(lot))})"
+            params = lot
+        sql += " ORDER BY contact_id, date, id"
+
+        for row in conn.execute(sql, params):
+            resultat.setdefault(row["contact_id"], []).append(
+                {"date": row["date"], "contenu": row["contenu"]}
+            )
+
+    return resultat
+
+
+class ConflitVersion(Exception):
+    """Le contact a ete modifie depuis la version attendue par l'appelant."""
+
+    def __init__(self, version_actuelle):
+        super().__init__(
+            f"Le contact a ete modifie entre-temps (version actuelle : {version_actuelle})."
+        )
+        self.version_actuelle = version_actuelle
+
+
+# Valeur provisoire d'un champ JSON pas encore decode
+_NON_DECODE = object()
+
+
+class ContactLazy(dict):
+    """
+    Contact dont la colonne JSON 'informations' n'est decodee qu'a la
+    premiere lecture.
+
+    C'est un dict ordinaire pour l'appelant (acces, iteration, jsonify) ; une
+    liste dont on ne lit que les noms ou les ids ne paie pas le json.loads.
+    Le texte JSON brut reste accessible via json_brut() tant que le champ
+    n'a pas ete decode.
+    """
+
+    __slots__ = ("_bruts",)
+
+    def __init__(self, valeurs, bruts):
+        super().__init__(valeurs)
+        self._bruts = bruts
+        for champ in bruts:
+            dict.__setitem__(self, champ, _NON_DECODE)
+
+    def _decoder(self, champ):
+        if dict.get(self, champ) is _NON_DECODE:
+            dict.__setitem__(self, champ, json.loads(self._bruts[champ]))
+
+    def _decoder_tout(self):
+        for champ in self._bruts:
+            self._decoder(champ)
+
+    def json_brut(self, champ):
+        """Texte JSON du champ s'il n'a pas encore ete decode, sinon None."""
+        if dict.get(self, champ) is _NON_DECODE:
+            return self._bruts[champ]
+        return None
+
+    def __getitem__(self, champ):
+        self._decoder(champ)
+        return dict.__getitem__(self, champ)
+
+    def get(self, champ, defaut=None):
+        self._decoder(champ)
+        return dict.get(self, champ, defaut)
+
+    def pop(self, champ, *defaut):
+        self._decoder(champ)
+        return dict.pop(self, champ, *defaut)
+
+    def setdefault(self, champ, defaut=None):
+        self._decoder(champ)
+        return dict.setdefault(self, champ, defaut)
+
+    # items()/values() servent aussi a json.dumps ; __iter__ redefini force
+    # dict(contact) et {**contact} a passer par __getitem__.
+    def items(self):
+        self._decoder_tout()
+        return dict.items(self)
+
+    def values(self):
+        self._decoder_tout()
+        return dict.values(self)
+
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def copy(self):
+        self._decoder_tout()
+        return dict(dict.items(self))
+
+    def __eq__(self, autre):
+        self._decoder_tout()
+        return dict.__eq__(self, autre)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._decoder_tout()
+        return dict.__repr__(self)
+
+
+def _row_to_dict(row, notes, champs=None):
+    """
+    Convertit une ligne SQLite (et ses notes) en contact (ContactLazy).
+
+    champs : ne garder que ces champs (tous par defaut).
+    """
+    valeurs = {}
+    bruts = {}
+    for champ in champs or CHAMPS_CONTACT:
+        if champ == "notes":
+            valeurs["notes"] = notes
+        elif champ == "informations":
+            valeurs["informations"] = None
+            bruts["informations"] = row["informations"]
+        else:
+            valeurs[champ] = row[champ]
+    return ContactLazy(valeurs, bruts)
+
+
+# Latences et erreurs des fonctions publiques (metrics.py, si ENABLE_METRICS).
+# Fait en fin de module : les "from database import ..." recoivent les
+# versions mesurees, et les appels internes passent aussi par elles.
+metrics.instrumenter_module(globals(), [
+    "init_db", "create_contact", "create_contacts_bulk", "set_master_profile",
+    "get_master_profile_id", "get_master_profile", "get_contact",
+    "get_contact_validateurs", "update_contact", "delete_contact",
+    "list_contacts", "search_contacts", "get_all_contacts", "get_changes",
+    "add_note", "get_notes", "get_notes_promesses", "contacts_pertinents", "ids_contacts_recents",
+    "ids_contacts_avec_suivi",
+])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,22 @@
+"""
+gunicorn.conf.py - Configuration gunicorn (chargee automatiquement).
+
+Workers 'gthread' : chaque worker sert plusieurs requetes a la fois avec un
+pool de threads. Un appel a Claude (plusieurs secondes d'attente reseau)
+n'immobilise qu'un thread, pas tout le worker, et claude_integration.py
+borne le nombre de threads qu'il peut occuper (CLAUDE_MAX_CONCURRENT +
+CLAUDE_MAX_QUEUE) pour que le CRUD garde toujours des threads libres.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Un worker gthread continue de signaler qu'il est vivant pendant les appels
+# longs : ce delai ne coupe que les workers reellement bloques
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,103 @@
+"""
+json_provider.py - Serialisation JSON des reponses Flask.
+
+orjson est utilise s'il est installe (plusieurs fois plus rapide que le
+module json sur les grosses listes de contacts), sinon le provider par
+defaut de Flask. Le choix se fait avec JSON_PROVIDER = auto | orjson | stdlib.
+"""
+
+from flask.json.provider import DefaultJSONProvider, _default
+
+from database import ContactLazy
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependance optionnelle
+    orjson = None
+
+
+def _contact_orjson(contact):
+    """
+    Contact -> dict pour orjson.
+
+    Si orjson sait inserer du JSON deja encode (orjson.Fragment, >= 3.9),
+    'informations' est recopie tel quel depuis la base, sans json.loads.
+    """
+    if orjson is not None and hasattr(orjson, "Fragment"):
+        brut = contact.json_brut("informations")
+        if brut is not None:
+            valeurs = {
+                champ: dict.__getitem__(contact, champ)
+                for champ in contact if champ != "informations"
+            }
+            valeurs["informations"] = orjson.Fragment(brut)
+            return valeurs
+    return dict(contact.items())
+
+
+def _defaut_orjson(obj):
+    """Types non geres nativement par orjson avec OPT_PASSTHROUGH_*."""
+    if isinstance(obj, ContactLazy):
+        return _contact_orjson(obj)
+    # Sous-classes des types de base (passees a default par OPT_PASSTHROUGH_SUBCLASS)
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, list):
+        return list(obj)
+    if isinstance(obj, str):
+        return str(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    # Dates, UUID, dataclasses... : memes conversions que Flask
+    return _default(obj)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Provider JSON base sur orjson, compatible avec celui de Flask.
+
+    Les cles sont triees et les dates converties comme par Flask, pour que
+    les reponses ne changent pas de forme selon le provider.
+    """
+
+    def _options(self):
+        options = (
+            orjson.OPT_PASSTHROUGH_SUBCLASS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_NON_STR_KEYS
+        )
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj):
+        """Serialise obj en JSON (bytes UTF-8)."""
+        return orjson.dumps(obj, default=_defaut_orjson, option=self._options())
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Evite l'aller-retour bytes -> str -> bytes de DefaultJSONProvider
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype
+        )
+
+
+def choisir_provider(nom="auto"):
+    """Classe de provider JSON pour JSON_PROVIDER (auto, orjson ou stdlib)."""
+    nom = (nom or "auto").lower()
+    if nom == "stdlib":
+        return DefaultJSONProvider
+    if orjson is None:
+        if nom == "orjson":
+            print("[JSON] orjson n'est pas installe, utilisation du module json")
+        return DefaultJSONProvider
+    return OrjsonProvider
@@ -0,0 +1,291 @@
+"""
+metrics.py - Metriques de performance au format Prometheus.
+
+Collecte, par processus :
+- pour chaque route Flask : nombre de requetes par statut, latences
+  (histogramme), erreurs 5xx et nombre de requetes SQL par requete HTTP ;
+- pour chaque fonction de database.py : latences et erreurs ;
+- le nombre total de requetes SQL ;
+- les appels a l'API Claude (resultat, duree, tokens dont cache).
+
+Exposees par GET /api/metrics (format texte Prometheus). Desactivable avec
+ENABLE_METRICS=False : rien n'est alors enveloppe ni compte. Chaque worker
+gunicorn a ses propres compteurs.
+
+La connexion instrumentee chronometre aussi chaque requete SQL pour le
+journal des requetes lentes (slow_queries.py).
+"""
+
+import bisect
+import functools
+import sqlite3
+import threading
+import time
+
+import slow_queries
+from config import Config
+
+
+ACTIVE = Config.ENABLE_METRICS
+
+# Bornes des histogrammes (secondes, puis nombre de requetes SQL)
+BORNES_DUREE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_SQL = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Compteur:
+    """Compteur Prometheus, une valeur par combinaison de labels."""
+
+    type_prometheus = "counter"
+
+    def __init__(self, nom, aide, labels):
+        self.nom = nom
+        self.aide = aide
+        self.labels = labels
+        self._valeurs = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valeurs_labels, n=1):
+        with self._lock:
+            self._valeurs[valeurs_labels] = self._valeurs.get(valeurs_labels, 0) + n
+
+    def lignes(self):
+        with self._lock:
+            valeurs = sorted(self._valeurs.items())
+        for labels, valeur in valeurs:
+            yield f"{self.nom}{_labels(self.labels, labels)} {valeur}"
+
+
+class Histogramme:
+    """Histogramme Prometheus (buckets cumules, _sum et _count)."""
+
+    type_prometheus = "histogram"
+
+    def __init__(self, nom, aide, labels, bornes):
+        self.nom = nom
+        self.aide = aide
+        self.labels = labels
+        self.bornes = bornes
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valeur, *valeurs_labels):
+        index = bisect.bisect_left(self.bornes, valeur)
+        with self._lock:
+            serie = self._series.get(valeurs_labels)
+            if serie is None:
+                # [compte par bucket (+ inf), somme, total]
+                serie = self._series[valeurs_labels] = [[0] * (len(self.bornes) + 1), 0.0, 0]
+            serie[0][index] += 1
+            serie[1] += valeur
+            serie[2] += 1
+
+    def lignes(self):
+        with self._lock:
+            series = sorted(
+                (labels, (list(serie[0]), serie[1], serie[2]))
+                for labels, serie in self._series.items()
+            )
+        for labels, (buckets, somme, total) in series:
+            cumul = 0
+            for borne, nombre in zip(self.bornes + (float("inf"),), buckets):
+                cumul += nombre
+                le = "+Inf" if borne == float("inf") else repr(borne)
+                yield (f"{self.nom}_bucket"
+                       f"{_labels(self.labels + ('le',), labels + (le,))} {cumul}")
+            yield f"{self.nom}_sum{_labels(self.labels, labels)} {somme:.6f}"
+            yield f"{self.nom}_count{_labels(self.labels, labels)} {total}"
+
+
+def _labels(noms, valeurs):
+    """Bloc {nom="valeur",...} avec echappement Prometheus."""
+    if not noms:
+        return ""
+    paires = []
+    for nom, valeur in zip(noms, valeurs):
+        valeur = str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        paires.append(f'{nom}="{valeur}"')
+    return "{" + ",".join(paires) + "}"
+
+
+# --- Metriques de l'application ---
+
+requetes_http = Compteur(
+    "crm_http_requests_total", "Requetes HTTP traitees", ("route", "method", "status"))
+erreurs_http = Compteur(
+    "crm_http_errors_total", "Requetes HTTP terminees en erreur 5xx", ("route", "method"))
+duree_http = Histogramme(
+    "crm_http_request_duration_seconds", "Duree de traitement des requetes HTTP",
+    ("route", "method"), BORNES_DUREE)
+sql_par_requete = Histogramme(
+    "crm_http_sql_statements", "Requetes SQL executees par requete HTTP",
+    ("route", "method"), BORNES_SQL)
+duree_db = Histogramme(
+    "crm_db_function_duration_seconds", "Duree des fonctions de database.py",
+    ("fonction",), BORNES_DUREE)
+erreurs_db = Compteur(
+    "crm_db_function_errors_total", "Exceptions levees par les fonctions de database.py",
+    ("fonction",))
+requetes_sql = Compteur(
+    "crm_sql_statements_total", "Requetes SQL executees", ())
+appels_ia = Compteur(
+    "crm_ai_calls_total", "Appels a l'API Claude (ok, erreur, refuse, annule)", ("resultat",))
+duree_ia = Histogramme(
+    "crm_ai_call_duration_seconds", "Duree des appels a l'API Claude, attente comprise",
+    (), BORNES_DUREE + (30.0, 60.0))
+tokens_ia = Compteur(
+    "crm_ai_tokens_total",
+    "Tokens de l'API Claude (input, output, cache_read, cache_write)", ("type",))
+
+METRIQUES = [requetes_http, erreurs_http, duree_http, sql_par_requete,
+             duree_db, erreurs_db, requetes_sql, appels_ia, duree_ia, tokens_ia]
+
+# Nombre de requetes SQL du thread courant (remis a zero a chaque requete HTTP)
+_thread = threading.local()
+
+
+def _compter_sql(n=1):
+    requetes_sql.inc(n=n)
+    _thread.sql = getattr(_thread, "sql", 0) + n
+
+
+def sql_thread():
+    """Nombre de requetes SQL comptees pour le thread courant."""
+    return getattr(_thread, "sql", 0)
+
+
+def attribuer_sql(n):
+    """
+    Ajoute a la requete HTTP du thread courant n requetes SQL executees pour
+    elle par un autre thread (file d'ecritures groupees). Le total global
+    les a deja comptees.
+    """
+    _thread.sql = getattr(_thread, "sql", 0) + n
+
+
+# --- Connexion SQLite instrumentee ---
+
+def _apres_sql(conn, sql, parametres, debut):
+    """Compte une requete SQL et la journalise si elle a depasse le seuil."""
+    if ACTIVE:
+        _compter_sql()
+    if slow_queries.ACTIF:
+        duree = time.perf_counter() - debut
+        if duree >= slow_queries.SEUIL:
+            slow_queries.enregistrer(conn, sql, parametres, duree)
+
+
+class CurseurMesure(sqlite3.Cursor):
+    """
+    Curseur qui compte et chronometre ses requetes.
+
+    Pour un SELECT, execute() ne couvre que la premiere etape (jusqu'a la
+    premiere ligne) : un tri ou un parcours complet y est deja paye, mais
+    pas la lecture des lignes suivantes par fetchall().
+    """
+
+    def execute(self, sql, parametres=()):
+        debut = time.perf_counter()
+        try:
+            return super().execute(sql, parametres)
+        finally:
+            _apres_sql(self.connection, sql, parametres, debut)
+
+    def executemany(self, sql, parametres):
+        if not isinstance(parametres, (list, tuple)):
+            parametres = list(parametres)
+        debut = time.perf_counter()
+        try:
+            return super().executemany(sql, parametres)
+        finally:
+            # Le plan et le journal utilisent le premier jeu de parametres
+            _apres_sql(self.connection, sql, parametres[0] if parametres else (), debut)
+
+
+class ConnexionMesuree(sqlite3.Connection):
+    """
+    Connexion dont toutes les requetes passent par CurseurMesure.
+
+    Connection.execute() n'appelle pas cursor() : il faut aussi le redefinir.
+    """
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or CurseurMesure)
+
+    def execute(self, sql, parametres=()):
+        return self.cursor().execute(sql, parametres)
+
+    def executemany(self, sql, parametres):
+        return self.cursor().executemany(sql, parametres)
+
+
+def classe_connexion():
+    """Classe de connexion a passer a sqlite3.connect(factory=...)."""
+    return ConnexionMesuree if ACTIVE or slow_queries.ACTIF else sqlite3.Connection
+
+
+# --- Fonctions de database.py ---
+
+def mesurer_fonction(fonction):
+    """Enveloppe une fonction pour mesurer sa duree et compter ses erreurs."""
+    nom = fonction.__name__
+
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        debut = time.perf_counter()
+        try:
+            return fonction(*args, **kwargs)
+        except Exception:
+            erreurs_db.inc(nom)
+            raise
+        finally:
+            duree_db.observe(time.perf_counter() - debut, nom)
+
+    return enveloppe
+
+
+def instrumenter_module(espace, noms):
+    """Remplace les fonctions 'noms' de l'espace de noms d'un module (globals())."""
+    if not ACTIVE:
+        return
+    for nom in noms:
+        espace[nom] = mesurer_fonction(espace[nom])
+
+
+# --- Routes Flask ---
+
+def init_metrics(app):
+    """Mesure toutes les routes de l'application (si ENABLE_METRICS)."""
+    if not ACTIVE:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def debut_mesure():
+        g.debut_mesure = time.perf_counter()
+        _thread.sql = 0
+
+    @app.after_request
+    def fin_mesure(response):
+        debut = g.pop("debut_mesure", None)
+        if debut is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else "(aucune)"
+        methode = request.method
+        duree_http.observe(time.perf_counter() - debut, route, methode)
+        sql_par_requete.observe(getattr(_thread, "sql", 0), route, methode)
+        requetes_http.inc(route, methode, str(response.status_code))
+        if response.status_code >= 500:
+            erreurs_http.inc(route, methode)
+        return response
+
+
+def exposition():
+    """Toutes les metriques au format texte Prometheus (version 0.0.4)."""
+    lignes = []
+    for metrique in METRIQUES:
+        lignes.append(f"# HELP {metrique.nom} {metrique.aide}")
+        lignes.append(f"# TYPE {metrique.nom} {metrique.type_prometheus}")
+        lignes.extend(metrique.lignes())
+    return "\n".join(lignes) + "\n"
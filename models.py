@@ -15,15 +15,24 @@ class ValidationError(Exception):
     pass
 
 
+def _verifier_texte(**champs):
+    """Leve ValidationError si un champ fourni (non None) n'est pas du texte."""
+    for champ, valeur in champs.items():
+        if valeur is not None and not isinstance(valeur, str):
+            raise ValidationError(f"Le champ '{champ}' doit etre du texte.")
+
+
 def valider_contact(nom, prenom="", categorie="autre", informations=None):
     """
     Verifie que les donnees d'un contact sont valides.
 
     Regles :
+    - Nom, prenom et categorie doivent etre du texte
     - Le nom ne doit pas etre vide
     - La categorie doit etre dans la liste autorisee
     - Les informations doivent etre un dictionnaire (ou None)
     """
+    _verifier_texte(nom=nom, prenom=prenom, categorie=categorie)
     if not nom or not nom.strip():
         raise ValidationError("Le nom est obligatoire.")
 
@@ -50,6 +59,53 @@ def valider_contact(nom, prenom="", categorie="autre", informations=None):
     }
 
 
+def valider_modification(donnees):
+    """
+    Verifie les champs fournis pour une mise a jour partielle d'un contact.
+
+    Memes regles que valider_contact(), mais seuls les champs presents sont
+    controles et retournes (les autres ne seront pas modifies).
+    """
+    valide = {}
+    _verifier_texte(**{
+        champ: donnees[champ] for champ in ("nom", "prenom", "categorie")
+        if champ in donnees
+    })
+
+    if "nom" in donnees:
+        nom = donnees["nom"]
+        if not nom or not nom.strip():
+            raise ValidationError("Le nom est obligatoire.")
+        valide["nom"] = nom.strip()
+
+    if "prenom" in donnees:
+        valide["prenom"] = donnees["prenom"].strip() if donnees["prenom"] else ""
+
+    if "categorie" in donnees:
+        categorie = (donnees["categorie"] or "").lower().strip()
+        if categorie not in CATEGORIES_VALIDES:
+            raise ValidationError(
+                f"Categorie invalide : '{categorie}'. "
+                f"Categories autorisees : {', '.join(CATEGORIES_VALIDES)}"
+            )
+        valide["categorie"] = categorie
+
+    if "informations" in donnees:
+        informations = donnees["informations"]
+        if informations is not None and not isinstance(informations, dict):
+            raise ValidationError(
+                "Les informations doivent etre un dictionnaire (cle: valeur)."
+            )
+        if informations is not None:
+            if any('"' in str(cle) for cle in informations):
+                raise ValidationError(
+                    "Les cles des informations ne peuvent pas contenir de guillemet."
+                )
+            valide["informations"] = informations
+
+    return valide
+
+
 def valider_note(contenu):
     """Verifie qu'une note n'est pas vide."""
     if not contenu or not contenu.strip():
@@ -17,7 +17,8 @@ from flask import (
     Blueprint, request, redirect, url_for,
     render_template, session, flash, jsonify
 )
-from database import create_contact, get_connection, get_contact
+import database
+from database import create_contact, get_master_profile_id, set_master_profile, transaction
 
 
 onboarding_bp = Blueprint(
@@ -32,29 +33,12 @@ onboarding_bp = Blueprint(
 
 def is_first_time_user():
     """Verifie si un profil master existe deja dans la DB."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM contacts WHERE informations LIKE '%\"type\": \"profil_master\"%'"
-    )
-    row = cursor.fetchone()
-    conn.close()
-    return row is None
+    return get_master_profile_id() is None
 
 
 def get_master_profile():
-    """Recupere le profil master depuis la DB."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM contacts WHERE informations LIKE '%\"type\": \"profil_master\"%'"
-    )
-    row = cursor.fetchone()
-    conn.close()
-
-    if row is None:
-        return None
-    return get_contact(row["id"])
+    """Recupere le profil master depuis la DB (mis en cache par processus)."""
+    return database.get_master_profile()
 
 
 def _sanitize(text):
@@ -207,12 +191,14 @@ def create_master_profile(profile_data):
         "source_enrichissement": profile_data.get("source", "manuel"),
     }
 
-    contact = create_contact(
-        nom=profile_data.get("nom", ""),
-        prenom=profile_data.get("prenom", ""),
-        categorie="autre",
-        informations=informations
-    )
+    with transaction(immediate=True):
+        contact = create_contact(
+            nom=profile_data.get("nom", ""),
+            prenom=profile_data.get("prenom", ""),
+            categorie="autre",
+            informations=informations
+        )
+        set_master_profile(contact["id"])
 
     return contact
 
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Latence du CRUD pendant des appels IA lents (serveur Anthropic simule).
+
+Demarre mock_anthropic.py et un gunicorn configure par gunicorn.conf.py (un
+worker), mesure GET /api/contacts/<id> au repos, puis pendant que N requetes
+POST /api/claude/assistant attendent la reponse simulee. Avec --sync, le
+meme test tourne sur un worker 'sync' pour comparaison.
+
+Usage :
+    python scripts/bench_ai_concurrency.py --ai 6 --latency 3
+    python scripts/bench_ai_concurrency.py --sync
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import mock_anthropic  # noqa: E402
+
+
+def _port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _requete(url, donnees=None, timeout=60):
+    """(statut, corps JSON, duree en s) d'une requete HTTP."""
+    corps = json.dumps(donnees).encode() if donnees is not None else None
+    requete = urllib.request.Request(
+        url, data=corps, headers={"Content-Type": "application/json"}
+    )
+    debut = time.perf_counter()
+    try:
+        with urllib.request.urlopen(requete, timeout=timeout) as r:
+            statut, contenu = r.status, r.read()
+    except urllib.error.HTTPError as e:
+        statut, contenu = e.code, e.read()
+    return statut, json.loads(contenu or b"null"), time.perf_counter() - debut
+
+
+def _latences(url, duree=None, nombre=None):
+    """Latences (ms) de GET successifs, pendant 'duree' s ou 'nombre' fois."""
+    latences = []
+    fin = time.monotonic() + duree if duree else None
+    while (fin and time.monotonic() < fin) or (nombre and len(latences) < nombre):
+        latences.append(_requete(url)[2] * 1000)
+    return latences
+
+
+def _resume(latences):
+    latences = sorted(latences)
+    p95 = latences[min(int(len(latences) * 0.95), len(latences) - 1)]
+    return (f"{len(latences):>5} req  p50 {statistics.median(latences):>8.1f} ms  "
+            f"p95 {p95:>8.1f} ms  max {latences[-1]:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CRUD pendant des appels IA")
+    parser.add_argument("--ai", type=int, default=6, help="requetes IA simultanees")
+    parser.add_argument("--latency", type=float, default=3.0, help="latence simulee (s)")
+    parser.add_argument("--sync", action="store_true", help="worker 'sync' (reference)")
+    args = parser.parse_args()
+
+    mock = mock_anthropic.demarrer(latence=args.latency)
+    port = _port_libre()
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_PATH": os.path.join(tempfile.mkdtemp(), "bench_ai.db"),
+        "FLASK_ENV": "production",
+        "CLAUDE_API_KEY": "cle-simulee",
+        "CLAUDE_BASE_URL": f"http://127.0.0.1:{mock.server_port}",
+        "CLAUDE_MAX_RETRIES": "0",
+    })
+    commande = [sys.executable, "-m", "gunicorn", "app:app", "-c", "gunicorn.conf.py",
+                "--bind", f"127.0.0.1:{port}", "--workers", "1"]
+    if args.sync:
+        commande += ["--worker-class", "sync", "--threads", "1"]
+    serveur = subprocess.Popen(commande, cwd=RACINE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                _requete(f"{base}/api/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            sys.exit("gunicorn n'a pas demarre")
+
+        _, cree, _ = _requete(f"{base}/api/contacts",
+                              {"nom": "Martin", "prenom": "Claire", "categorie": "pro"})
+        url_contact = f"{base}/api/contacts/{cree['contact']['id']}"
+        # Premier appel IA hors mesure : import d'anthropic et creation du client
+        _requete(f"{base}/api/claude/test")
+
+        print(f"Worker {'sync' if args.sync else 'gthread'}, {args.ai} requete(s) IA "
+              f"simultanee(s), latence simulee {args.latency} s")
+        print(f"  CRUD au repos          {_resume(_latences(url_contact, nombre=50))}")
+
+        statuts = []
+
+        def appel_ia():
+            statut, _, duree = _requete(f"{base}/api/claude/assistant",
+                                        {"question": "Qui relancer cette semaine ?"})
+            statuts.append((statut, duree))
+
+        threads = [threading.Thread(target=appel_ia) for _ in range(args.ai)]
+        for t in threads:
+            t.start()
+        time.sleep(0.2)
+        pendant = _latences(url_contact, duree=args.latency * 0.8)
+        for t in threads:
+            t.join()
+
+        print(f"  CRUD pendant l'IA      {_resume(pendant)}")
+        for statut in sorted({s for s, _ in statuts}):
+            durees = [d for s, d in statuts if s == statut]
+            print(f"  IA : {len(durees)} reponse(s) {statut}, "
+                  f"durees {', '.join(f'{d:.1f}' for d in sorted(durees))} s")
+    finally:
+        serveur.terminate()
+        serveur.wait()
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de database.py sur des bases synthetiques.
+
+Pour chaque taille (1k, 10k, 100k contacts par defaut), une base temporaire
+est remplie par synthetic_data.py puis chaque fonction est mesuree :
+operations par seconde, latences p50/p95/p99 et pic memoire (tracemalloc,
+mesure a part pour ne pas fausser les temps). Les resultats sont ecrits en
+JSON avec le commit courant, et --compare affiche l'ecart avec un run
+precedent.
+
+Usage :
+    python scripts/bench_database.py
+    python scripts/bench_database.py --sizes 1000,10000 --compare bench_results/ancien.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RACINE))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.chdir(RACINE)
+
+import synthetic_data  # noqa: E402
+
+# Temps consacre a chaque fonction (secondes) et bornes du nombre d'appels
+DUREE_PAR_FONCTION = 2.0
+APPELS_MIN = 5
+APPELS_MAX = 5000
+
+
+def _cas(database, ids, rng):
+    """
+    Fonctions mesurees : nom -> fonction sans argument (une operation).
+
+    Les arguments sont tires au hasard a chaque appel avec une graine fixe.
+    """
+    conn = database.get_connection()
+    lignes = conn.execute("SELECT * FROM contacts LIMIT 1000").fetchall()
+    notes = database._get_notes_par_contact([row["id"] for row in lignes])
+
+    def row_to_dict():
+        # Conversion d'une ligne et decodage de 'informations'
+        row = rng.choice(lignes)
+        contact = database._row_to_dict(row, notes.get(row["id"], []))
+        return contact["informations"]
+
+    return {
+        "search_contacts(texte)": lambda: database.search_contacts(
+            rng.choice(synthetic_data.NOMS)),
+        "search_contacts(prefixe)": lambda: database.search_contacts(
+            rng.choice(synthetic_data.VILLES)[:3]),
+        "search_contacts(categorie+ville)": lambda: database.search_contacts(
+            categorie="pro", filtres={"ville": rng.choice(synthetic_data.VILLES)}),
+        "list_contacts(page 50)": lambda: database.list_contacts(limit=50),
+        "get_all_contacts": database.get_all_contacts,
+        "get_contact": lambda: database.get_contact(rng.choice(ids)),
+        "add_note": lambda: database.add_note(
+            rng.choice(ids), "Note de benchmark : relancer la semaine prochaine."),
+        "update_contact": lambda: database.update_contact(
+            rng.choice(ids), informations={"ville": rng.choice(synthetic_data.VILLES)}),
+        "_row_to_dict": row_to_dict,
+    }
+
+
+def _percentile(valeurs, p):
+    """Percentile p (0-100) d'une liste triee, par interpolation lineaire."""
+    if len(valeurs) == 1:
+        return valeurs[0]
+    position = (len(valeurs) - 1) * p / 100
+    bas = int(position)
+    haut = min(bas + 1, len(valeurs) - 1)
+    return valeurs[bas] + (valeurs[haut] - valeurs[bas]) * (position - bas)
+
+
+def mesurer(fonction):
+    """Latences et debit d'une fonction, puis pic memoire d'un appel."""
+    fonction()  # chauffe (connexion, caches SQLite)
+    durees = []
+    debut = time.perf_counter()
+    while len(durees) < APPELS_MAX:
+        t0 = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - t0)
+        if len(durees) >= APPELS_MIN and time.perf_counter() - debut > DUREE_PAR_FONCTION:
+            break
+    total = time.perf_counter() - debut
+
+    tracemalloc.start()
+    fonction()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durees.sort()
+    return {
+        "appels": len(durees),
+        "ops_par_sec": round(len(durees) / total, 1),
+        "p50_ms": round(_percentile(durees, 50) * 1000, 3),
+        "p95_ms": round(_percentile(durees, 95) * 1000, 3),
+        "p99_ms": round(_percentile(durees, 99) * 1000, 3),
+        "pic_memoire_kio": round(pic / 1024, 1),
+    }
+
+
+def benchmark_taille(taille, graine, notes_moyennes, filtre):
+    """Remplit une base de 'taille' contacts et mesure chaque fonction."""
+    import database
+
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), f"bench_{taille}.db")
+    database.close_connection()
+
+    debut = time.perf_counter()
+    ids = synthetic_data.remplir_base(taille, graine, notes_moyennes)
+    remplissage = time.perf_counter() - debut
+    nb_notes = database.get_connection().execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+    print(f"\n== {taille} contacts, {nb_notes} notes (remplissage {remplissage:.1f} s)")
+    print(f"  {'fonction':<34} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'pic Kio':>9}")
+
+    resultats = {}
+    for nom, fonction in _cas(database, ids, random.Random(graine)).items():
+        if filtre and filtre not in nom:
+            continue
+        r = mesurer(fonction)
+        resultats[nom] = r
+        print(f"  {nom:<34} {r['ops_par_sec']:>10} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+              f"{r['p99_ms']:>9} {r['pic_memoire_kio']:>9}")
+
+    database.close_connection()
+    return {"contacts": taille, "notes": nb_notes,
+            "remplissage_s": round(remplissage, 2), "fonctions": resultats}
+
+
+def _commit_courant():
+    """Hash court du commit courant (ou 'inconnu' hors depot git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+
+
+def comparer(resultats, fichier_reference):
+    """Affiche le rapport ops/s et p95 entre ce run et un run precedent."""
+    with open(fichier_reference, encoding="utf-8") as f:
+        reference = json.load(f)
+    print(f"\nComparaison avec {fichier_reference} (commit {reference.get('commit')})")
+    print(f"  {'taille / fonction':<44} {'ops/s':>10} {'p95':>10}")
+    anciennes = {str(t["contacts"]): t for t in reference["tailles"]}
+    for taille in resultats["tailles"]:
+        ancienne = anciennes.get(str(taille["contacts"]))
+        if ancienne is None:
+            continue
+        for nom, r in taille["fonctions"].items():
+            a = ancienne["fonctions"].get(nom)
+            if not a:
+                continue
+            debit = r["ops_par_sec"] / a["ops_par_sec"] if a["ops_par_sec"] else 0
+            latence = r["p95_ms"] / a["p95_ms"] if a["p95_ms"] else 0
+            print(f"  {str(taille['contacts']) + ' / ' + nom:<44} "
+                  f"{debit:>9.2f}x {latence:>9.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de database.py")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="tailles de base, separees par des virgules")
+    parser.add_argument("--seed", type=int, default=42, help="graine aleatoire")
+    parser.add_argument("--notes", type=int, default=8, help="notes par contact en moyenne")
+    parser.add_argument("--only", help="ne mesurer que les fonctions contenant ce texte")
+    parser.add_argument("--output", help="fichier JSON de resultats "
+                        "(defaut : bench_results/database-<commit>-<date>.json)")
+    parser.add_argument("--compare", help="fichier JSON d'un run precedent")
+    args = parser.parse_args()
+
+    # Les traces [DB] de database.py noieraient les resultats
+    import database
+    database.print = lambda *a, **k: None
+
+    commit = _commit_courant()
+    resultats = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "graine": args.seed,
+        "tailles": [
+            benchmark_taille(int(taille), args.seed, args.notes, args.only)
+            for taille in args.sizes.split(",") if taille.strip()
+        ],
+    }
+
+    sortie = args.output or os.path.join(
+        "bench_results", f"database-{commit}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(sortie) or ".", exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2, ensure_ascii=False)
+    print(f"\nResultats enregistres dans {sortie}")
+
+    if args.compare:
+        comparer(resultats, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la serialisation JSON et de la compression des reponses.
+
+Cree une base temporaire de N contacts (10 000 par defaut) avec quelques
+notes, puis mesure pour GET /api/contacts :
+- le temps de serialisation avec le module json (Flask) et avec orjson ;
+- la taille envoyee sans compression, en gzip et en brotli.
+
+Usage : python scripts/bench_json.py [nombre_de_contacts] [--repetitions N]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RACINE))
+os.chdir(RACINE)
+
+# Base jetable, configuration de production (JSON compact)
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("FLASK_ENV", "production")
+
+import app as application  # noqa: E402
+import database  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from json_provider import OrjsonProvider, orjson  # noqa: E402
+from compression import brotli  # noqa: E402
+
+REPETITIONS = 5
+
+
+def remplir(nombre):
+    """Insere des contacts realistes (informations imbriquees, notes)."""
+    contacts = [{
+        "nom": f"Nom{i}",
+        "prenom": f"Prenom{i}",
+        "categorie": ("pro", "ami", "famille", "autre")[i % 4],
+        "informations": {
+            "societe": f"Societe {i % 300}",
+            "poste": "Responsable des achats",
+            "ville": ("Lyon", "Paris", "Nantes", "Lille")[i % 4],
+            "email": f"contact{i}@example.com",
+            "telephone": f"06 12 34 {i % 100:02d} {i % 97:02d}",
+            "vie_perso": {"enfants": i % 3, "hobbies": ["velo", "cuisine"]},
+            "sujets_conversation": ["projet de demenagement", "voyage au Japon"],
+        },
+    } for i in range(nombre)]
+    ids = database.create_contacts_bulk(contacts)["ids"]
+    with database.transaction(immediate=True) as conn:
+        conn.executemany(
+            "INSERT INTO notes (contact_id, date, contenu) VALUES (?, ?, ?)",
+            [(contact_id, f"2026-0{1 + n}-15T10:00:00",
+              f"Echange {n} : point sur le projet, relancer dans deux semaines.")
+             for contact_id in ids for n in range(3)]
+        )
+
+
+def chronometrer(fonction, preparer=None):
+    """
+    Meilleur temps sur REPETITIONS executions, en millisecondes.
+
+    preparer() (non chronometre) fournit l'argument de fonction.
+    """
+    meilleur = None
+    for _ in range(REPETITIONS):
+        argument = preparer() if preparer else None
+        debut = time.perf_counter()
+        resultat = fonction(argument) if preparer else fonction()
+        duree = (time.perf_counter() - debut) * 1000
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    return meilleur, resultat
+
+
+def main():
+    global REPETITIONS
+    parser = argparse.ArgumentParser(description="Serialisation JSON et compression")
+    parser.add_argument("contacts", nargs="?", type=int, default=10000,
+                        help="nombre de contacts (defaut : 10000)")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS,
+                        help="executions par mesure, le meilleur temps est garde")
+    args = parser.parse_args()
+    nombre = args.contacts
+    REPETITIONS = args.repetitions
+    print(f"Preparation de {nombre} contacts...")
+    remplir(nombre)
+
+    flask_app = application.app
+    duree, contacts = chronometrer(database.get_all_contacts)
+    print(f"Lecture de {len(contacts)} contacts : {duree:.1f} ms\n")
+
+    providers = [("json (Flask)", DefaultJSONProvider)]
+    if orjson is not None:
+        providers.append((f"orjson {orjson.__version__}", OrjsonProvider))
+    else:
+        print("orjson n'est pas installe : seul le module json est mesure\n")
+
+    print("Serialisation de la liste complete")
+    corps = None
+    with flask_app.app_context():
+        for nom, classe in providers:
+            provider = classe(flask_app)
+            # Contacts relus avant chaque mesure : le decodage paresseux de
+            # 'informations' fait partie de la serialisation
+            duree, reponse = chronometrer(
+                lambda contacts: provider.response({
+                    "contacts": contacts, "total": len(contacts)
+                }),
+                preparer=database.get_all_contacts
+            )
+            corps = reponse.get_data()
+            print(f"  {nom:<20} {duree:8.1f} ms  {len(corps) / 1024:9.0f} Kio")
+
+    print("\nOctets sur le reseau (dernier provider)")
+    print(f"  {'identite':<20} {len(corps) / 1024:9.0f} Kio")
+    niveau = flask_app.config["COMPRESSION_GZIP_LEVEL"]
+    duree, compresse = chronometrer(lambda: gzip.compress(corps, compresslevel=niveau))
+    print(f"  {'gzip ' + str(niveau):<20} {len(compresse) / 1024:9.0f} Kio  {duree:8.1f} ms")
+    if brotli is not None:
+        qualite = flask_app.config["COMPRESSION_BROTLI_QUALITY"]
+        duree, compresse = chronometrer(lambda: brotli.compress(corps, quality=qualite))
+        print(f"  {'brotli ' + str(qualite):<20} {len(compresse) / 1024:9.0f} Kio  {duree:8.1f} ms")
+    else:
+        print("  brotli               (module non installe)")
+
+    print("\nRequete complete GET /api/contacts (Accept-Encoding: gzip)")
+    client = flask_app.test_client()
+    duree, reponse = chronometrer(
+        lambda: client.get("/api/contacts", headers={"Accept-Encoding": "gzip"})
+    )
+    print(f"  {reponse.headers.get('Content-Encoding', 'identite'):<20} "
+          f"{len(reponse.data) / 1024:9.0f} Kio  {duree:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
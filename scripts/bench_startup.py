@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Temps de demarrage de l'application (demarrage a froid d'un worker).
+
+Lance plusieurs interpreteurs neufs qui importent le module (app par defaut)
+avec python -X importtime, sur une base temporaire. Affiche la duree totale
+(mediane), le temps d'import du module et les paquets qui coutent le plus
+(temps propre cumule par paquet de premier niveau).
+
+Usage :
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --module database --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+
+
+def _importtime(sortie_erreur):
+    """Lignes de -X importtime -> liste (module, propre_us, cumule_us)."""
+    modules = []
+    for ligne in sortie_erreur.splitlines():
+        if not ligne.startswith("import time:") or "self [us]" in ligne:
+            continue
+        propre, cumule, nom = ligne[len("import time:"):].split("|")
+        modules.append((nom.strip(), int(propre), int(cumule)))
+    return modules
+
+
+def lancer(module, env):
+    """Un demarrage a froid : duree totale (s) et temps d'import par module."""
+    debut = time.perf_counter()
+    resultat = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=RACINE, env=env, capture_output=True, text=True
+    )
+    duree = time.perf_counter() - debut
+    if resultat.returncode != 0:
+        sys.exit(f"Echec de l'import de {module} :\n{resultat.stderr[-2000:]}")
+    return duree, _importtime(resultat.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de demarrage de l'application")
+    parser.add_argument("--module", default="app", help="module importe (defaut : app)")
+    parser.add_argument("--runs", type=int, default=5, help="nombre de demarrages")
+    parser.add_argument("--top", type=int, default=10, help="paquets les plus lents affiches")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "startup.db")
+    env.setdefault("FLASK_ENV", "production")
+
+    # Premier lancement non compte : cree la base et compile les .pyc
+    lancer(args.module, env)
+
+    # Reference : interpreteur seul
+    durees_vide = [lancer("sys", env)[0] for _ in range(args.runs)]
+
+    durees, imports, paquets = [], [], {}
+    for _ in range(args.runs):
+        duree, modules = lancer(args.module, env)
+        durees.append(duree)
+        imports.append(next((c for nom, _, c in modules if nom == args.module), 0))
+        for nom, propre, _ in modules:
+            racine = nom.split(".")[0]
+            paquets.setdefault(racine, []).append(propre)
+
+    print(f"Demarrage a froid de '{args.module}' ({args.runs} lancements, mediane)")
+    print(f"  interpreteur seul      {statistics.median(durees_vide) * 1000:>9.1f} ms")
+    print(f"  total                  {statistics.median(durees) * 1000:>9.1f} ms")
+    print(f"  import {args.module:<15} {statistics.median(imports) / 1000:>9.1f} ms")
+    print(f"\n  {'paquet':<24} {'ms':>9}")
+    couts = sorted(
+        ((sum(valeurs) / args.runs, nom) for nom, valeurs in paquets.items()),
+        reverse=True
+    )
+    for cout, nom in couts[:args.top]:
+        print(f"  {nom:<24} {cout / 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Serveur local qui imite l'API Messages d'Anthropic (POST /v1/messages).
+
+Repond apres un delai configurable avec un texte simule, sans cle ni reseau :
+de quoi tester les routes IA et leur comportement sous charge. L'application
+l'utilise avec CLAUDE_BASE_URL=http://127.0.0.1:<port>.
+
+Avec "stream": true, la reponse est envoyee mot par mot en server-sent events
+(format de l'API), un mot toutes les 'intervalle' secondes ; un client qui
+se deconnecte en cours de route est compte dans stats["flux_interrompus"].
+
+Le cache de prompts est simule : le prefixe qui precede le dernier bloc
+marque cache_control est compte en cache_creation_input_tokens la premiere
+fois, puis en cache_read_input_tokens. Comme l'API reelle, un prefixe de
+moins de 1024 tokens (2048 pour les modeles Haiku) n'est pas mis en cache :
+il est compte en input_tokens.
+
+Usage :
+    python scripts/mock_anthropic.py --port 8099 --latency 3
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ids = itertools.count(1)
+stats = {"requetes": 0, "flux": 0, "flux_interrompus": 0}
+_prefixes_en_cache = set()
+_lock = threading.Lock()
+
+# Longueur minimale d'un prefixe mis en cache par l'API (tokens)
+PREFIXE_CACHE_MIN = 1024
+PREFIXE_CACHE_MIN_HAIKU = 2048
+
+
+def _tokens(donnees):
+    """Estimation grossiere : 4 caracteres par token."""
+    return len(json.dumps(donnees, ensure_ascii=False)) // 4
+
+
+def _usage(corps):
+    """Tokens d'entree, dont le prefixe lu ou ecrit dans le cache simule."""
+    system = corps.get("system") or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    blocs = list(system)
+    for message in corps.get("messages", []):
+        contenu = message.get("content")
+        if isinstance(contenu, str):
+            contenu = [{"type": "text", "text": contenu}]
+        blocs.extend(contenu)
+
+    fin_prefixe = max(
+        (i + 1 for i, bloc in enumerate(blocs) if bloc.get("cache_control")), default=0
+    )
+    minimum = (PREFIXE_CACHE_MIN_HAIKU if "haiku" in corps.get("model", "")
+               else PREFIXE_CACHE_MIN)
+    tokens_prefixe = _tokens(blocs[:fin_prefixe]) if fin_prefixe else 0
+    if tokens_prefixe < minimum:
+        # Trop court : l'API l'ignore sans erreur
+        fin_prefixe = tokens_prefixe = 0
+    prefixe = json.dumps(blocs[:fin_prefixe], sort_keys=True)
+    lu = ecrit = 0
+    if fin_prefixe:
+        with _lock:
+            if prefixe in _prefixes_en_cache:
+                lu = tokens_prefixe
+            else:
+                _prefixes_en_cache.add(prefixe)
+                ecrit = tokens_prefixe
+    return {
+        "input_tokens": _tokens(blocs) - tokens_prefixe,
+        "cache_creation_input_tokens": ecrit,
+        "cache_read_input_tokens": lu,
+    }
+
+
+def _texte_reponse(corps):
+    """Texte simule, au format attendu par la fonctionnalite appelee."""
+    prompt = json.dumps(corps.get("messages", []), ensure_ascii=False)
+    if "UNIQUEMENT avec un JSON" in prompt:
+        return json.dumps([{
+            "titre": "Relancer un contact",
+            "description": "Reponse simulee par mock_anthropic.py.",
+            "type": "relance",
+        }], ensure_ascii=False)
+    return (f"Reponse simulee ({len(prompt)} caracteres recus). Voici quelques pistes "
+            "pour preparer l'echange : rappeler le dernier sujet aborde, proposer un "
+            "cafe et noter les promesses faites lors du precedent rendez-vous.")
+
+
+class GestionnaireMessages(BaseHTTPRequestHandler):
+    """POST /v1/messages : message complet apres 'latence' secondes."""
+
+    latence = 1.0
+    intervalle = 0.05
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _repondre(self, statut, donnees):
+        corps = json.dumps(donnees).encode("utf-8")
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def do_POST(self):
+        longueur = int(self.headers.get("Content-Length") or 0)
+        corps = json.loads(self.rfile.read(longueur) or b"{}")
+        if self.path.rstrip("/") != "/v1/messages":
+            self._repondre(404, {"type": "error", "error": {
+                "type": "not_found_error", "message": self.path}})
+            return
+
+        with _lock:
+            stats["requetes"] += 1
+        time.sleep(self.latence)
+        texte = _texte_reponse(corps)
+        message = {
+            "id": f"msg_mock_{next(_ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": corps.get("model", "mock"),
+            "content": [{"type": "text", "text": texte}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": dict(_usage(corps), output_tokens=len(texte) // 4),
+        }
+        if corps.get("stream"):
+            self._streamer(message)
+        else:
+            self._repondre(200, message)
+
+    def _evenement(self, donnees):
+        self.wfile.write(f"event: {donnees['type']}\ndata: {json.dumps(donnees)}\n\n".encode())
+        self.wfile.flush()
+
+    def _streamer(self, message):
+        """Envoie le message en evenements SSE, mot par mot."""
+        texte = message["content"][0]["text"]
+        debut = dict(message, content=[], stop_reason=None,
+                     usage=dict(message["usage"], output_tokens=1))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        with _lock:
+            stats["flux"] += 1
+        try:
+            self._evenement({"type": "message_start", "message": debut})
+            self._evenement({"type": "content_block_start", "index": 0,
+                             "content_block": {"type": "text", "text": ""}})
+            for i, mot in enumerate(texte.split(" ")):
+                time.sleep(self.intervalle)
+                self._evenement({"type": "content_block_delta", "index": 0, "delta": {
+                    "type": "text_delta", "text": mot if i == 0 else " " + mot}})
+            self._evenement({"type": "content_block_stop", "index": 0})
+            self._evenement({"type": "message_delta",
+                             "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                             "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+            self._evenement({"type": "message_stop"})
+        except (BrokenPipeError, ConnectionResetError):
+            with _lock:
+                stats["flux_interrompus"] += 1
+
+
+def demarrer(port=0, latence=1.0, intervalle=0.05):
+    """Demarre le serveur dans un thread ; retourne le serveur (server_port)."""
+    gestionnaire = type("Gestionnaire", (GestionnaireMessages,),
+                        {"latence": latence, "intervalle": intervalle})
+    serveur = ThreadingHTTPServer(("127.0.0.1", port), gestionnaire)
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur Anthropic simule")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=1.0,
+                        help="delai avant chaque reponse (secondes)")
+    parser.add_argument("--interval", type=float, default=0.05,
+                        help="delai entre deux mots d'une reponse en streaming")
+    args = parser.parse_args()
+
+    serveur = demarrer(args.port, args.latency, args.interval)
+    print(f"API Anthropic simulee sur http://127.0.0.1:{serveur.server_port} "
+          f"(latence {args.latency} s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        serveur.shutdown()
+
+
+if __name__ == "__main__":
+    main()
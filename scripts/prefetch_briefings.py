@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Pre-genere les briefings IA d'une selection de contacts (a lancer par cron,
+par exemple chaque matin avant les rendez-vous).
+
+Les briefings sont ecrits dans le cache des reponses IA : la fiche du
+contact les affiche ensuite sans attendre Claude. Utilise la configuration
+de l'application (.env, variables d'environnement) ; CLAUDE_PROVIDER=stub
+pour essayer sans cle ni reseau.
+
+Usage :
+    python scripts/prefetch_briefings.py --selection recents --selection suivis
+    python scripts/prefetch_briefings.py --ids 3,8,12 --mode batch
+    CLAUDE_PROVIDER=stub python scripts/prefetch_briefings.py --limit 50
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from briefings_batch import MODES, SELECTIONS, PregenerationBriefings, selectionner  # noqa: E402
+from claude_integration import ClaudeIntegration  # noqa: E402
+from database import init_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generation des briefings IA")
+    parser.add_argument("--selection", action="append", choices=SELECTIONS,
+                        help="contacts a preparer (defaut : recents), repetable")
+    parser.add_argument("--ids", help="liste d'IDs separes par des virgules")
+    parser.add_argument("--limit", type=int, help="contacts par selection")
+    parser.add_argument("--mode", choices=MODES, help="defaut : BRIEFING_PREFETCH_MODE")
+    parser.add_argument("--workers", type=int, help="threads du mode pool")
+    args = parser.parse_args()
+
+    init_db()
+    if args.ids:
+        contact_ids = [int(i) for i in args.ids.split(",") if i.strip()]
+    else:
+        contact_ids = selectionner(args.selection or ["recents"], args.limit)
+
+    pregeneration = PregenerationBriefings(ClaudeIntegration(), workers=args.workers,
+                                           mode=args.mode)
+    try:
+        resume = pregeneration.executer(contact_ids)
+    except ValueError as e:
+        sys.exit(f"Pre-generation impossible : {e}")
+    print(json.dumps(resume, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
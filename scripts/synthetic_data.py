@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Generateur de donnees synthetiques pour le CRM (contacts a la francaise).
+
+Produit des contacts realistes et reproductibles (graine) : noms et prenoms
+francais, informations pro et perso imbriquees, et un historique de notes
+etale dans le temps. Sert aux benchmarks et aux demonstrations.
+
+Usage :
+    python scripts/synthetic_data.py 10000 --seed 42 --db data/demo.db
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+if str(RACINE) not in sys.path:
+    sys.path.insert(0, str(RACINE))
+
+NOMS = [
+    "Martin", "Bernard", "Thomas", "Petit", "Robert", "Richard", "Durand",
+    "Dubois", "Moreau", "Laurent", "Simon", "Michel", "Lefebvre", "Leroy",
+    "Roux", "David", "Bertrand", "Morel", "Fournier", "Girard", "Bonnet",
+    "Dupont", "Lambert", "Fontaine", "Rousseau", "Vincent", "Muller",
+    "Lefevre", "Faure", "Andre", "Mercier", "Blanc", "Guerin", "Boyer",
+    "Garnier", "Chevalier", "Francois", "Legrand", "Gauthier", "Garcia",
+    "Perrin", "Robin", "Clement", "Morin", "Nicolas", "Henry", "Roussel",
+    "Mathieu", "Gautier", "Masson", "Marchand", "Duval", "Denis", "Dumont",
+    "Lemaire", "Noel", "Meyer", "Dufour", "Meunier", "Brun", "Blanchard",
+]
+PRENOMS = [
+    "Marie", "Jean", "Pierre", "Michel", "Nathalie", "Isabelle", "Sophie",
+    "Philippe", "Nicolas", "Camille", "Julie", "Thomas", "Lea", "Manon",
+    "Antoine", "Chloe", "Lucas", "Emma", "Hugo", "Ines", "Louis", "Sarah",
+    "Gabriel", "Claire", "Julien", "Elodie", "Mathieu", "Aurelie", "Maxime",
+    "Celine", "Alexandre", "Pauline", "Francois", "Helene", "Benoit", "Anne",
+]
+VILLES = [
+    "Paris", "Lyon", "Marseille", "Toulouse", "Nice", "Nantes", "Strasbourg",
+    "Montpellier", "Bordeaux", "Lille", "Rennes", "Reims", "Grenoble",
+    "Dijon", "Angers", "Annecy", "Tours", "Brest", "Rouen", "Nancy",
+]
+SOCIETES = [
+    "Airbus", "Decathlon", "Michelin", "Orange", "Capgemini", "Doctolib",
+    "BlaBlaCar", "Ubisoft", "Danone", "Renault", "Thales", "Veolia",
+    "Credit Agricole", "SNCF", "Leroy Merlin", "Back Market", "Qonto",
+    "Alan", "Mirakl", "Contentsquare", "Cabinet Durand & Associes",
+]
+POSTES = [
+    "Directrice commerciale", "Chef de projet", "Developpeur", "DRH",
+    "Consultant", "Responsable marketing", "CTO", "Comptable",
+    "Product manager", "Architecte", "Juriste", "Fondateur",
+]
+HOBBIES = [
+    "velo", "randonnee", "cuisine", "photographie", "escalade", "jazz",
+    "lecture", "voile", "jardinage", "oenologie", "course a pied", "echecs",
+]
+SUJETS = [
+    "projet de demenagement", "voyage au Japon", "renovation de la maison",
+    "lancement d'une startup", "marathon de Paris", "rentree des enfants",
+    "nouveau poste", "formation en data", "mariage l'ete prochain",
+]
+MODELES_NOTES = [
+    "Dejeuner a {ville} : a parle de {sujet}.",
+    "Appel rapide, relancer sur {sujet} dans deux semaines.",
+    "Croise au salon, travaille toujours chez {societe}.",
+    "Promis de lui envoyer l'article sur {hobby}.",
+    "Cafe en visio : point sur {sujet}, tres motive.",
+    "Anniversaire souhaite, prevoir un cadeau autour de {hobby}.",
+    "Reunion chez {societe} : presentation du projet, bons retours.",
+]
+CATEGORIES = ["pro", "pro", "ami", "famille", "autre"]
+
+
+def _informations(rng, nom, prenom):
+    """Dictionnaire 'informations' plus ou moins rempli selon le contact."""
+    informations = {}
+    if rng.random() < 0.8:
+        societe = rng.choice(SOCIETES)
+        informations["societe"] = societe
+        informations["poste"] = rng.choice(POSTES)
+        domaine = societe.lower().replace(" ", "").replace("&", "")
+        informations["email"] = f"{prenom.lower()}.{nom.lower()}@{domaine}.fr"
+    if rng.random() < 0.7:
+        informations["ville"] = rng.choice(VILLES)
+    if rng.random() < 0.6:
+        informations["telephone"] = "06 " + " ".join(
+            f"{rng.randrange(100):02d}" for _ in range(4)
+        )
+    if rng.random() < 0.4:
+        informations["anniversaire"] = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}"
+    if rng.random() < 0.5:
+        informations["vie_perso"] = {
+            "enfants": rng.randint(0, 3),
+            "hobbies": rng.sample(HOBBIES, rng.randint(1, 3)),
+        }
+    if rng.random() < 0.3:
+        informations["sujets_conversation"] = rng.sample(SUJETS, 2)
+    return informations
+
+
+def generer_contacts(nombre, graine=42):
+    """Liste de contacts (dicts pour create_contacts_bulk), reproductible."""
+    rng = random.Random(graine)
+    contacts = []
+    for _ in range(nombre):
+        nom = rng.choice(NOMS)
+        prenom = rng.choice(PRENOMS)
+        contacts.append({
+            "nom": nom,
+            "prenom": prenom,
+            "categorie": rng.choice(CATEGORIES),
+            "informations": _informations(rng, nom, prenom),
+        })
+    return contacts
+
+
+def generer_notes(contact_id, informations, rng, moyenne=8, debut=None):
+    """
+    Historique de notes d'un contact : nombre tire autour de 'moyenne'
+    (quelques contacts tres suivis), dates croissantes sur deux ans.
+    """
+    debut = debut or datetime(2024, 1, 1)
+    nombre = min(int(rng.expovariate(1 / moyenne)), moyenne * 10) if moyenne else 0
+    date = debut + timedelta(days=rng.randint(0, 365))
+    notes = []
+    for _ in range(nombre):
+        date += timedelta(days=rng.randint(1, 60), minutes=rng.randint(0, 600))
+        contenu = rng.choice(MODELES_NOTES).format(
+            ville=informations.get("ville") or rng.choice(VILLES),
+            societe=informations.get("societe") or rng.choice(SOCIETES),
+            sujet=rng.choice(SUJETS),
+            hobby=rng.choice(HOBBIES),
+        )
+        notes.append((contact_id, date.isoformat(), contenu))
+    return notes
+
+
+def remplir_base(nombre, graine=42, notes_moyennes=8):
+    """
+    Remplit la base courante (DATABASE_PATH) avec des contacts et leurs notes.
+
+    Retourne la liste des ids crees.
+    """
+    import database
+
+    database.init_db()
+    contacts = generer_contacts(nombre, graine)
+    ids = database.create_contacts_bulk(contacts)["ids"]
+
+    rng = random.Random(graine + 1)
+    lot = []
+    for contact_id, contact in zip(ids, contacts):
+        lot.extend(generer_notes(contact_id, contact["informations"], rng, notes_moyennes))
+        if len(lot) >= 10000 or contact_id == ids[-1]:
+            with database.transaction(immediate=True) as conn:
+                conn.executemany(
+                    "INSERT INTO notes (contact_id, date, contenu) VALUES (?, ?, ?)",
+                    lot
+                )
+            lot = []
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genere une base de contacts synthetiques.")
+    parser.add_argument("nombre", type=int, help="nombre de contacts")
+    parser.add_argument("--seed", type=int, default=42, help="graine aleatoire (defaut : 42)")
+    parser.add_argument("--notes", type=int, default=8, help="notes par contact en moyenne")
+    parser.add_argument("--db", help="base a remplir (defaut : DATABASE_PATH ou data/crm.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["DATABASE_PATH"] = args.db
+    ids = remplir_base(args.nombre, args.seed, args.notes)
+    print(f"{len(ids)} contact(s) generes dans {os.environ.get('DATABASE_PATH', 'data/crm.db')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests de database.py sur une base temporaire.
+
+Usage :
+    python scripts/test_database.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+def _duree_insertion_note(contact_id, nombre=50):
+    """
+    Duree moyenne (ms) de la transaction d'ecriture d'une note (triggers
+    d'index compris), c'est-a-dire du temps passe sous le verrou d'ecriture.
+    """
+    debut = time.perf_counter()
+    for i in range(nombre):
+        with database.transaction(immediate=True) as conn:
+            conn.execute(
+                "INSERT INTO notes (contact_id, date, contenu) VALUES (?, ?, ?)",
+                (contact_id, "2025-01-01T00:00:00", f"Note mesuree {i}")
+            )
+    return (time.perf_counter() - debut) / nombre * 1000
+
+
+def test_cout_ajout_note():
+    print("1. Cout d'un ajout de note selon l'historique du contact...")
+    contact = database.create_contact("Historique", "Long")
+    a_vide = _duree_insertion_note(contact["id"])
+
+    # 20 000 notes inserees directement (les triggers d'index s'appliquent)
+    with database.transaction(immediate=True) as conn:
+        conn.executemany(
+            "INSERT INTO notes (contact_id, date, contenu) VALUES (?, ?, ?)",
+            ((contact["id"], f"2024-01-01T00:00:{i % 60:02d}", f"Ancienne note {i} sur le projet")
+             for i in range(20000))
+        )
+    avec_historique = _duree_insertion_note(contact["id"])
+
+    print(f"   0 note : {a_vide:.2f} ms, 20 000 notes : {avec_historique:.2f} ms")
+    assert avec_historique < a_vide * 3 + 1, "l'ajout d'une note depend de l'historique"
+
+
+def test_recherche_notes():
+    print("\n2. Recherche dans les notes (notes_fts)...")
+    contact = database.create_contact("Durand", "Alice", informations={"ville": "Lyon"})
+    database.add_note(contact["id"], "Parle de son voyage au Japon")
+
+    ids = [c["id"] for c in database.search_contacts("japon")]
+    assert contact["id"] in ids
+    # Mots repartis entre la fiche et une note : tous requis
+    ids = [c["id"] for c in database.search_contacts("durand japon")]
+    assert ids == [contact["id"]]
+    assert database.search_contacts("durand bresil") == []
+
+    database.delete_contact(contact["id"])
+    assert database.search_contacts("japon") == []
+    print("   OK")
+
+
+def test_fusion_informations():
+    print("\n3. Mise a jour de 'informations' (remplacement cle par cle)...")
+    contact = database.create_contact("Petit", "Marc", informations={
+        "ville": "Nantes", "adresse": {"rue": "Rue Crebillon", "cp": "44000"}, "tel": "0601"
+    })
+    modifie = database.update_contact(contact["id"], informations={
+        "adresse": {"rue": "Quai de la Fosse"}, "tel": None
+    })
+    # Les objets imbriques sont remplaces, null est conserve, les autres cles restent
+    assert modifie["informations"] == {
+        "ville": "Nantes", "adresse": {"rue": "Quai de la Fosse"}, "tel": None
+    }, modifie["informations"]
+    assert modifie["version"] == contact["version"] + 1
+    database.delete_contact(contact["id"])
+    print("   OK")
+
+
+def test_import_en_lot_invalide():
+    print("\n4. Import en lot avec des elements invalides...")
+    avant = len(database.get_all_contacts())
+    contacts = [{"nom": f"Import{i}"} for i in range(25)]
+    contacts[3] = {"nom": 5}
+    contacts.append({"nom": "Dernier", "prenom": ["x"]})
+    contacts.append("pas un objet")
+    resultat = database.create_contacts_bulk(contacts, taille_lot=10)
+    assert len(resultat["ids"]) == 24, resultat["ids"]
+    assert [e["index"] for e in resultat["erreurs"]] == [3, 25, 26], resultat["erreurs"]
+    assert len(database.get_all_contacts()) == avant + 24
+    for contact_id in resultat["ids"]:
+        database.delete_contact(contact_id)
+    print("   OK")
+
+
+if __name__ == "__main__":
+    database.init_db()
+    test_cout_ajout_note()
+    test_recherche_notes()
+    test_fusion_informations()
+    test_import_en_lot_invalide()
+    print("\nTests termines !")
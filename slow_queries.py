@@ -0,0 +1,132 @@
+"""
+slow_queries.py - Journal des requetes SQL lentes.
+
+Toute requete plus longue que SLOW_QUERY_THRESHOLD_MS est journalisee avec
+ses parametres, sa duree et son plan (EXPLAIN QUERY PLAN), qui signale les
+parcours complets de table (SCAN contacts). Les requetes sont regroupees par
+texte SQL pour lister les plus couteuses (GET /admin/slow-queries).
+
+Le chronometrage est fait par la connexion instrumentee de metrics.py. Les
+statistiques sont propres a chaque processus.
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import Config
+
+
+ACTIF = Config.SLOW_QUERY_LOG_ENABLED
+SEUIL = Config.SLOW_QUERY_THRESHOLD_MS / 1000
+
+# Nombre maximal de requetes distinctes conservees
+REQUETES_MAX = 200
+
+# Seules ces instructions ont un plan interessant (pas BEGIN, PRAGMA...)
+_EXPLICABLES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+# Parcours complet d'une table : "SCAN contacts" (sans index ; ni table
+# virtuelle FTS/json_each, ni "SCAN CONSTANT ROW")
+_SCAN_TABLE = re.compile(
+    r"^SCAN (?!CONSTANT ROW)(\w+)\b(?! USING (?:COVERING )?INDEX| VIRTUAL TABLE)"
+)
+
+_requetes = {}
+_lock = threading.Lock()
+
+
+def _normaliser(sql):
+    """Texte SQL sur une ligne, cle de regroupement."""
+    return " ".join(sql.split())
+
+
+def _apercu(parametres, longueur=200):
+    """Parametres lisibles et tronques (les notes peuvent etre longues)."""
+    texte = repr(parametres)
+    return texte if len(texte) <= longueur else texte[:longueur] + "..."
+
+
+def expliquer(conn, sql, parametres=()):
+    """
+    Plan d'execution d'une requete (lignes de EXPLAIN QUERY PLAN).
+
+    Execute avec un curseur non instrumente, pour ne pas se mesurer soi-meme.
+    """
+    if not sql.lstrip().upper().startswith(_EXPLICABLES):
+        return []
+    if not isinstance(parametres, (tuple, list, dict)):
+        parametres = ()
+    try:
+        lignes = sqlite3.Cursor(conn).execute(
+            f"EXPLAIN QUERY PLAN {sql}", parametres
+        ).fetchall()
+    except sqlite3.Error as e:
+        return [f"(plan indisponible : {e})"]
+    return [ligne[3] for ligne in lignes]
+
+
+def tables_parcourues(plan):
+    """Tables lues en entier d'apres un plan (ex. ['contacts'])."""
+    tables = []
+    for detail in plan:
+        m = _SCAN_TABLE.match(detail.strip())
+        if m and m.group(1) not in tables:
+            tables.append(m.group(1))
+    return tables
+
+
+def enregistrer(conn, sql, parametres, duree):
+    """Journalise une requete lente et met a jour ses statistiques."""
+    cle = _normaliser(sql)
+    with _lock:
+        entree = _requetes.get(cle)
+        plan_connu = entree is not None
+    # Le plan ne change pas d'un appel a l'autre : calcule une seule fois
+    plan = entree["plan"] if plan_connu else expliquer(conn, sql, parametres)
+    scans = tables_parcourues(plan)
+
+    with _lock:
+        entree = _requetes.get(cle)
+        if entree is None:
+            if len(_requetes) >= REQUETES_MAX:
+                # Oublie la requete la moins couteuse pour faire de la place
+                moindre = min(_requetes, key=lambda k: _requetes[k]["total_ms"])
+                del _requetes[moindre]
+            entree = _requetes[cle] = {
+                "sql": cle, "nombre": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "plan": plan, "scans": scans,
+            }
+        entree["nombre"] += 1
+        entree["total_ms"] += duree * 1000
+        entree["max_ms"] = max(entree["max_ms"], duree * 1000)
+        entree["derniers_parametres"] = _apercu(parametres)
+        entree["derniere_fois"] = datetime.now().isoformat(timespec="seconds")
+
+    alerte = f" [SCAN {', '.join(scans)}]" if scans else ""
+    print(f"[DB] Requete lente ({duree * 1000:.1f} ms){alerte} : {cle[:300]} "
+          f"-- parametres : {_apercu(parametres)}")
+    if not plan_connu:
+        for detail in plan:
+            print(f"[DB]   plan : {detail}")
+
+
+def top(limite=20, tri="total_ms"):
+    """Requetes lentes les plus couteuses (tri : total_ms, max_ms ou nombre)."""
+    if tri not in ("total_ms", "max_ms", "nombre"):
+        raise ValueError("Tri invalide : total_ms, max_ms ou nombre.")
+    with _lock:
+        entrees = [dict(e) for e in _requetes.values()]
+    entrees.sort(key=lambda e: e[tri], reverse=True)
+    for entree in entrees:
+        entree["moyenne_ms"] = round(entree["total_ms"] / entree["nombre"], 3)
+        entree["total_ms"] = round(entree["total_ms"], 3)
+        entree["max_ms"] = round(entree["max_ms"], 3)
+    return entrees[:limite]
+
+
+def reinitialiser():
+    """Oublie les statistiques accumulees."""
+    with _lock:
+        _requetes.clear()
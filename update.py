@@ -11,8 +11,6 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 
-import requests
-
 from config import Config
 
 
@@ -23,7 +21,6 @@ class UpdateManager:
         self.current_version = Config.APP_VERSION
         self.github_api = Config.GITHUB_API_URL
         self.backup_dir = Path("data/backups")
-        self.backup_dir.mkdir(parents=True, exist_ok=True)
 
     def check_for_updates(self):
         """
@@ -31,6 +28,9 @@ class UpdateManager:
 
         Essaie d'abord les releases GitHub, puis les commits en fallback.
         """
+        # Import a la demande : requests ralentit le demarrage de l'application
+        import requests
+
         try:
             response = requests.get(
                 f"{self.github_api}/releases/latest",
@@ -63,6 +63,8 @@ class UpdateManager:
 
     def _check_commits(self):
         """Fallback : verifie les commits si pas de releases."""
+        import requests
+
         try:
             response = requests.get(
                 f"{self.github_api}/commits/main",
@@ -125,6 +127,7 @@ class UpdateManager:
                     'message': 'Base de donnees introuvable'
                 }
 
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             backup_path = self.backup_dir / f"crm_backup_{timestamp}.db"
 
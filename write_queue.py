@@ -0,0 +1,113 @@
+"""
+write_queue.py - File d'ecritures groupees (group commit) pour SQLite.
+
+SQLite n'accepte qu'un ecrivain a la fois : quand plusieurs threads ajoutent
+des notes ou modifient des contacts en meme temps, chacun attend le verrou
+puis paie son propre COMMIT (et son fsync). La file regroupe ces ecritures :
+un thread dedie attend quelques millisecondes (ou N operations), execute
+tout le lot dans une seule transaction puis rend a chaque appelant son
+propre resultat (ou sa propre exception). Le thread n'attend que si le lot
+precedent regroupait deja plusieurs ecritures : un ecrivain isole ne paie
+pas le delai.
+
+Le module ne connait pas SQLite : database.py fournit la fonction qui
+execute un lot (transaction, SAVEPOINT par operation, reprises).
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteQueue:
+    """
+    File d'operations d'ecriture executees par lots dans un thread dedie.
+
+    executer_lot(operations) doit retourner, pour chaque operation, un couple
+    (resultat, exception). Le thread est demarre a la premiere soumission et
+    recree apres un fork (workers gunicorn).
+    """
+
+    def __init__(self, executer_lot, delai_max_ms=2, taille_lot_max=64):
+        self.executer_lot = executer_lot
+        self.delai_max = max(delai_max_ms, 0) / 1000
+        self.taille_lot_max = max(taille_lot_max, 1)
+        self._file = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._dernier_lot = 1
+        self.stats = {"lots": 0, "operations": 0}
+
+    def soumettre(self, operation):
+        """Ajoute une operation a la file et attend son resultat."""
+        self._demarrer()
+        futur = Future()
+        self._file.put((operation, futur))
+        return futur.result()
+
+    def _demarrer(self):
+        """Demarre le thread d'ecriture (une fois par processus)."""
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Apres un fork, la file du parent et son thread n'existent plus
+                self._file = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._boucle, name="crm-write-queue", daemon=True
+            )
+            self._pid = pid
+            self._thread.start()
+
+    def _collecter_lot(self):
+        """
+        Attend une operation puis regroupe celles deja en attente ; si le lot
+        precedent en contenait plusieurs (ecritures concurrentes), attend
+        aussi celles qui arrivent dans le delai.
+        """
+        lot = [self._file.get()]
+        attendre = self._dernier_lot > 1
+        echeance = time.monotonic() + self.delai_max
+        while len(lot) < self.taille_lot_max:
+            try:
+                # D'abord ce qui est deja en attente, sans dormir
+                lot.append(self._file.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            if not attendre:
+                break
+            reste = echeance - time.monotonic()
+            if reste <= 0:
+                break
+            try:
+                lot.append(self._file.get(timeout=reste))
+            except queue.Empty:
+                break
+        self._dernier_lot = len(lot)
+        return lot
+
+    def _boucle(self):
+        """Boucle du thread d'ecriture."""
+        while True:
+            lot = self._collecter_lot()
+            operations = [operation for operation, _ in lot]
+            try:
+                resultats = self.executer_lot(operations)
+            except BaseException as e:
+                # Le lot entier a echoue (verrou jamais obtenu, COMMIT refuse...)
+                resultats = [(None, e)] * len(lot)
+
+            self.stats["lots"] += 1
+            self.stats["operations"] += len(lot)
+            for (_, futur), (resultat, erreur) in zip(lot, resultats):
+                if erreur is not None:
+                    futur.set_exception(erreur)
+                else:
+                    futur.set_result(resultat)